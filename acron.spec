@@ -20,6 +20,8 @@ Authenticated crontab service
 Conflicts: python-acron-common
 Requires: gnupg2
 Requires: python3-PyYAML
+# Faster JSON serialization, used if available
+Recommends: python3-orjson
 Summary: Common files for the authenticated crontab service
 Group: Development/Languages
 %description common
@@ -41,6 +43,10 @@ Requires: python3dist(mod-wsgi)
 %endif
 Requires: python3-requests
 Requires: python3-memcached
+# Optional MessagePack responses
+Recommends: python3-msgpack
+# Schedule load histograms of /system/load and acron-load, capacity plans of acron-plan
+Recommends: python3-numpy
 Requires(pre): /usr/sbin/useradd
 Requires(postun): /usr/sbin/userdel
 Summary: Server side of the authenticated crontab service
@@ -179,6 +185,7 @@ install ./man/man1/* %{buildroot}%{_mandir}/man1/
 
 mkdir -p %{buildroot}%{_localstatedir}/log/acron/
 mkdir -p %{buildroot}%{_localstatedir}/log/acron_service/
+mkdir -p %{buildroot}%{_sharedstatedir}/acron_service/executor/
 
 mkdir -p %{buildroot}%{_localstatedir}/acron/creds/
 
@@ -186,6 +193,8 @@ pwd
 
 mkdir -p %{buildroot}%{_bindir}/
 install ./usr/bin/acrontab2acron %{buildroot}%{_bindir}
+install ./usr/bin/acron-load %{buildroot}%{_bindir}
+install ./usr/bin/acron-plan %{buildroot}%{_bindir}
 
 mkdir -p %{buildroot}%{_datadir}/acron/
 install ./usr/share/acron/acron_gpg_key.pub %{buildroot}%{_datadir}/acron/
@@ -298,7 +307,11 @@ fi
 %attr(0750, acron, acron) %dir %{_sysconfdir}/acron/server/
 %attr(0750, acron, acron) %dir %{_localstatedir}/log/acron/
 %attr(0750, apache, apache) %dir %{_localstatedir}/log/acron_service/
+%attr(0750, apache, apache) %dir %{_sharedstatedir}/acron_service/
+%attr(0750, apache, apache) %dir %{_sharedstatedir}/acron_service/executor/
 %attr(0750, acron, acron) %{_libexecdir}/acron/ssh_run
+%attr(0755, -, -) %{_bindir}/acron-load
+%attr(0755, -, -) %{_bindir}/acron-plan
 %attr(0644, root, root)%config %{_sysconfdir}/logrotate.d/*
 
 %files server-creds-file
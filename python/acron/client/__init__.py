@@ -11,12 +11,11 @@
 
 import sys
 import argparse
-import pkg_resources
+from acron.constants import ReturnCodes
 from acron.utils import (check_schedule, check_target,
                          check_command, check_description,
                          check_projects, check_user_id, check_job_id)
-from .auth import login
-from .cli import (add_creds_subparsers, add_jobs_subparsers,
+from .cli import (add_completion_subparsers, add_creds_subparsers, add_jobs_subparsers,
                   add_projects_subparsers, TITLE_COMMANDS,
                   METAVAR_COMMAND, HELP_DESCRIPTION)
 
@@ -29,19 +28,48 @@ __email__ = 'rodrigo.bermudez.schettino@cern.ch'
 __status__ = 'Development'
 
 
-def input_parser():
+def _version():
     '''
-    Get user input and set flags.
+    :returns: the version of the installed acron package
+    '''
+    # pylint: disable=import-outside-toplevel
+    try:
+        from importlib.metadata import version
+    except ImportError:
+        # Python < 3.8, pkg_resources takes long to import and is only used here
+        import pkg_resources
+        return pkg_resources.require('acron')[0].version
+    return version('acron')
 
-    :returns: a dictionary containing the user's parameters
+
+class VersionAction(argparse.Action):
+    '''
+    Like the version action of argparse, with the version looked up only when asked for.
+    '''
+
+    # pylint: disable=redefined-builtin
+    def __init__(self, option_strings, dest=argparse.SUPPRESS, default=argparse.SUPPRESS,
+                 help='show program\'s version number and exit'):
+        super().__init__(option_strings=option_strings, dest=dest, default=default,
+                         nargs=0, help=help)
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        parser.exit(message=_version() + '\n')
+
+
+def build_parser():
+    '''
+    Build the parser of the command line. The modules of the subcommands are only imported
+    by the subcommand run, see cli._lazy.
+
+    :returns: the ArgumentParser of the acron command
     '''
     # acron [--version] [--help]
     main_parser = argparse.ArgumentParser(
         description='Acron client. Please use the available subcommands.',
         epilog='For more information please check the man page, acron(1).')
     main_parser.add_argument(
-        '-v', '--version', action='version',
-        version=pkg_resources.require('acron')[0].version)
+        '-v', '--version', action=VersionAction)
     main_subparsers = main_parser.add_subparsers(
         title=TITLE_COMMANDS, metavar=METAVAR_COMMAND, help=HELP_DESCRIPTION)
     main_subparsers.required = True
@@ -49,8 +77,18 @@ def input_parser():
     add_creds_subparsers(main_subparsers)
     add_jobs_subparsers(main_subparsers)
     add_projects_subparsers(main_subparsers)
+    add_completion_subparsers(main_subparsers)
+
+    return main_parser
+
+
+def input_parser():
+    '''
+    Get user input and set flags.
 
-    return main_parser.parse_args()
+    :returns: a dictionary containing the user's parameters
+    '''
+    return build_parser().parse_args()
 
 
 def sanity_checks(args):
@@ -79,18 +117,22 @@ def sanity_checks(args):
 
     for input_name in inputs:
         if input_name in args and getattr(args, input_name) is not None:
-            try:
-                input_value = getattr(args, input_name)
-                # Example of how it evaluates:
-                #   check_target(args.target)
-                globals()[f'check_{input_name}'](input_value)
-            except AssertionError:
-                # The locals call should insert the value of the variable specified.
-                # Example:
-                #  For input_name=target it should return the value of target_error_msg
-                sys.stderr.write(f'''The {input_name} field has the wrong format.
+            input_values = getattr(args, input_name)
+            # Options given several values, like jobs show --job_id, are checked one by one
+            if not isinstance(input_values, list):
+                input_values = [input_values]
+            for input_value in input_values:
+                try:
+                    # Example of how it evaluates:
+                    #   check_target(args.target)
+                    globals()[f'check_{input_name}'](input_value)
+                except AssertionError:
+                    # The locals call should insert the value of the variable specified.
+                    # Example:
+                    #  For input_name=target it should return the value of target_error_msg
+                    sys.stderr.write(f'''The {input_name} field has the wrong format: {input_value}
     {locals()[f'{input_name}_error_msg']}''')
-                sys.exit(1)
+                    sys.exit(ReturnCodes.BAD_ARGS)
 
 
 def main():
@@ -101,5 +143,9 @@ def main():
     '''
     args = input_parser()
     sanity_checks(args)
+    # Imported once the arguments are valid, it loads the HTTP and Kerberos libraries
+    from .auth import login  # pylint: disable=import-outside-toplevel
+    from .utils import LOGIN_CACHE  # pylint: disable=import-outside-toplevel
+    LOGIN_CACHE.interactive = getattr(args, 'interactive', True)
     login()
     return args.func(args)
@@ -0,0 +1,321 @@
+#
+# (C) Copyright 2022 CERN
+#
+# This software is distributed under the terms of the GNU General Public Licence version 3
+# (GPL Version 3), copied verbatim in the file "COPYING" /copied verbatim below.
+#
+# In applying this licence, CERN does not waive the privileges and immunities granted to it
+# by virtue of its status as an Intergovernmental Organization or submit itself to any jurisdiction.
+#
+'''Declarative management of the jobs of a project from a desired-state file'''
+
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from acron.exceptions import AcronError, AbortError
+from acron.serialization import yaml_load
+from acron.utils import (check_command, check_description, check_job_id, check_schedule,
+                         check_target, fqdnify)
+from acron.constants import Endpoints, JobFields, MimeTypes, ReturnCodes
+from .config import CONFIG
+from .errors import ServerError
+from .jobs import _job_summary
+from .utils import confirm, send_request
+
+__author__ = 'Rodrigo Bermudez Schettino (CERN)'
+__credits__ = ['Rodrigo Bermudez Schettino (CERN)', 'Ulrich Schwickerath (CERN)']
+__maintainer__ = 'Rodrigo Bermudez Schettino (CERN)'
+__email__ = 'rodrigo.bermudez.schettino@cern.ch'
+__status__ = 'Development'
+
+
+# Actions of a plan
+ACTION_CREATE = 'create'
+ACTION_UPDATE = 'update'
+ACTION_ENABLE = 'enable'
+ACTION_DISABLE = 'disable'
+ACTION_DELETE = 'delete'
+
+# Description the server gives to the jobs created without one
+DEFAULT_DESCRIPTION = 'No description given'
+# Fields of a job sent to the server on creation or update
+DEFINITION_FIELDS = [JobFields.SCHEDULE, JobFields.TARGET, JobFields.COMMAND,
+                     JobFields.DESCRIPTION]
+# Keys required, respectively allowed, for a job in the desired-state file
+REQUIRED_KEYS = ['job_id', JobFields.SCHEDULE, JobFields.TARGET, JobFields.COMMAND]
+FILE_KEYS = ['job_id'] + DEFINITION_FIELDS + [JobFields.ENABLED]
+
+
+def _normalize_target(target):
+    '''
+    Bring a target to the form stored by the server.
+
+    :param target: the node given in the file
+    :returns:      the node, transformed and fully qualified like the server does
+    '''
+    target = CONFIG.get('TARGET_TRANSFORM', {}).get(target, target)
+    domain = CONFIG.get('DOMAIN')
+    if isinstance(domain, list):
+        domain = domain[0] if domain else None
+    return fqdnify(target, domain) if domain else target
+
+
+# pylint: disable=R0913
+def desired_job(job_id, schedule, target, command, description=None, enabled=True):
+    '''
+    Build and validate a desired job, normalized like the server stores it.
+
+    :param job_id:      the unique job identifier
+    :param schedule:    the schedule of the job, crontab format
+    :param target:      the node on which the job will be executed
+    :param command:     the command to launch on the target at the given schedule
+    :param description: the description of the job, optional
+    :param enabled:     False if the job has to be disabled
+    :raises AcronError: if a field has the wrong format
+    :returns:           a dictionary with the fields of JobFields
+    '''
+    job = {
+        JobFields.NAME: str(job_id),
+        JobFields.SCHEDULE: ' '.join(str(schedule).split()),
+        JobFields.TARGET: _normalize_target(str(target)),
+        JobFields.COMMAND: str(command),
+        JobFields.DESCRIPTION: str(description or DEFAULT_DESCRIPTION),
+        JobFields.ENABLED: bool(enabled),
+    }
+    try:
+        check_job_id(job[JobFields.NAME])
+        check_schedule(job[JobFields.SCHEDULE])
+        check_target(job[JobFields.TARGET])
+        check_command(job[JobFields.COMMAND])
+        check_description(job[JobFields.DESCRIPTION])
+    except AssertionError as error:
+        raise AcronError(f'Job {job_id} has a field with the wrong format.') from error
+    return job
+
+
+def load_desired_jobs(path):
+    '''
+    Read and validate a desired-state file. The file is either a list of jobs or a mapping
+    with the list of jobs under the jobs key. Every job needs a job_id, a schedule, a target
+    and a command, and may have a description and an enabled flag, true by default.
+
+    :param path:        the path to the file, - for the standard input
+    :raises AcronError: if the file cannot be read or is not well-formed
+    :returns:           a dictionary of the desired jobs, by job identifier
+    '''
+    try:
+        if path == '-':
+            document = yaml_load(sys.stdin)
+        else:
+            with open(path, 'r') as desired_file:
+                document = yaml_load(desired_file)
+    except (OSError, ValueError) as error:
+        raise AcronError(f'Cannot read {path}: {error}') from error
+    if isinstance(document, dict):
+        document = document.get('jobs')
+    if not isinstance(document, list):
+        raise AcronError(f'{path} must contain a list of jobs.')
+
+    desired = {}
+    for index, entry in enumerate(document):
+        if not isinstance(entry, dict):
+            raise AcronError(f'Job number {index + 1} is not a mapping.')
+        job_id = str(entry.get('job_id', ''))
+        unknown = set(entry) - set(FILE_KEYS)
+        if unknown:
+            raise AcronError(f'Job {job_id}: unknown keys {", ".join(sorted(unknown))}.')
+        missing = [key for key in REQUIRED_KEYS if not entry.get(key)]
+        if missing:
+            raise AcronError(f'Job number {index + 1}: missing {", ".join(missing)}.')
+        if job_id in desired:
+            raise AcronError(f'Job {job_id} is defined twice.')
+        desired[job_id] = desired_job(job_id, entry[JobFields.SCHEDULE], entry[JobFields.TARGET],
+                                      entry[JobFields.COMMAND], entry.get(JobFields.DESCRIPTION),
+                                      entry.get(JobFields.ENABLED, True))
+    return desired
+
+
+def fetch_current_jobs(project=None):
+    '''
+    Get the summaries of all the jobs of the project in a single request.
+
+    :param project:     the project, defaults to the one of the current user
+    :raises AbortError: if the jobs cannot be listed, after reporting why
+    :returns:           a dictionary of the current jobs, by job identifier
+    '''
+    params = {'fields': ','.join(JobFields.ALL)}
+    if project:
+        params['project'] = project
+    path = CONFIG['ACRON_SERVER_FULL_URL'] + Endpoints.JOBS_TRAILING_SLASH
+    response = send_request('GET', path, params=params, headers={'Accept': MimeTypes.JSON})
+    if response.status_code == 404 and not project:
+        # The personal project is initialised by the first job created
+        return {}
+    if response.status_code in [401, 403]:
+        ServerError.error_no_access_job()
+        raise AbortError
+    if response.status_code == 404:
+        ServerError.error_project_not_found()
+        raise AbortError
+    if response.status_code != 200:
+        ServerError.error_unknown(response.text)
+        raise AbortError
+    jobs = response.json()
+    if not isinstance(jobs, list):
+        return {}
+    return {job[JobFields.NAME]: job for job in map(_job_summary, jobs)}
+
+
+def compute_plan(desired, current, prune=False):
+    '''
+    Compute the minimal list of requests bringing the current jobs to the desired state.
+    Updating a job enables it on the server, so updated jobs meant to be disabled are
+    disabled again afterwards.
+
+    :param desired: the desired jobs, by job identifier
+    :param current: the current jobs, by job identifier
+    :param prune:   True to delete the current jobs missing from the desired ones
+    :returns:       tuple of the plan, a list of tuples of the job identifier, the list of
+                    actions and the changed fields, and of the identifiers of the jobs left
+                    as they are
+    '''
+    plan = []
+    unchanged = []
+    for job_id in sorted(desired):
+        job = desired[job_id]
+        if job_id not in current:
+            actions = [ACTION_CREATE] + ([] if job[JobFields.ENABLED] else [ACTION_DISABLE])
+            plan.append((job_id, actions, DEFINITION_FIELDS))
+            continue
+        changed = [field for field in DEFINITION_FIELDS
+                   if job[field] != current[job_id][field]]
+        if changed:
+            actions = [ACTION_UPDATE] + ([] if job[JobFields.ENABLED] else [ACTION_DISABLE])
+        elif job[JobFields.ENABLED] != current[job_id][JobFields.ENABLED]:
+            actions = [ACTION_ENABLE if job[JobFields.ENABLED] else ACTION_DISABLE]
+        else:
+            unchanged.append(job_id)
+            continue
+        plan.append((job_id, actions, changed))
+    if prune:
+        for job_id in sorted(set(current) - set(desired)):
+            plan.append((job_id, [ACTION_DELETE], []))
+    return plan, unchanged
+
+
+def _response_message(response):
+    '''
+    :param response: HTTP response from server
+    :returns:        the message of the server, or the status code if there is none
+    '''
+    try:
+        return response.json()['message']
+    except (ValueError, KeyError, TypeError):
+        return f'HTTP {response.status_code}'
+
+
+def _submit(step, desired, project):
+    '''
+    Send the requests of one step of the plan, stopping at the first failure.
+
+    :param step:    tuple of the job identifier, the list of actions and the changed fields
+    :param desired: the desired jobs, by job identifier
+    :param project: the project, defaults to the one of the current user
+    :returns:       tuple of the job identifier and the error message, None if successful
+    '''
+    job_id, actions, changed = step
+    path = CONFIG['ACRON_SERVER_FULL_URL'] + Endpoints.JOBS_TRAILING_SLASH
+    base_params = {'project': project} if project else {}
+    for action in actions:
+        params = dict(base_params)
+        if action == ACTION_CREATE:
+            params['job_id'] = job_id
+            params.update({field: desired[job_id][field] for field in changed})
+            response = send_request('POST', path, params=params)
+        elif action == ACTION_UPDATE:
+            params.update({field: desired[job_id][field] for field in changed})
+            response = send_request('PUT', path + job_id, params=params)
+        elif action == ACTION_DELETE:
+            response = send_request('DELETE', path + job_id, params=params)
+        else:
+            params['enable'] = action == ACTION_ENABLE
+            response = send_request('PATCH', path + job_id, params=params)
+        if response.status_code != 200:
+            return job_id, f'{action} failed: {_response_message(response)}'
+    return job_id, None
+
+
+def submit_plan(plan, desired, project=None, parallel=4):
+    '''
+    Send the requests of a plan, up to parallel jobs at the same time.
+
+    :param plan:     the steps of the plan, as returned by compute_plan
+    :param desired:  the desired jobs, by job identifier
+    :param project:  the project, defaults to the one of the current user
+    :param parallel: maximum number of jobs submitted at the same time
+    :returns:        an iterator over the tuples of job identifier and error message, None if
+                     successful, in the order of the plan
+    '''
+    with ThreadPoolExecutor(max_workers=max(1, parallel)) as pool:
+        yield from pool.map(lambda step: _submit(step, desired, project), plan)
+
+
+def _write_plan(plan, unchanged, unmanaged):
+    '''
+    Write the plan to the console.
+
+    :param plan:      the steps of the plan
+    :param unchanged: the identifiers of the jobs left as they are
+    :param unmanaged: the identifiers of the current jobs missing from the file, not pruned
+    '''
+    symbols = {ACTION_CREATE: '+', ACTION_UPDATE: '~', ACTION_DELETE: '-'}
+    for job_id, actions, changed in plan:
+        detail = f' ({", ".join(changed)})' if actions[0] == ACTION_UPDATE else ''
+        sys.stdout.write(f'{symbols.get(actions[0], "~")} {job_id}: '
+                         f'{", ".join(actions)}{detail}\n')
+    counts = {action: sum(action in actions for _, actions, _ in plan)
+              for action in [ACTION_CREATE, ACTION_UPDATE, ACTION_DELETE]}
+    sys.stdout.write(f'Plan: {counts[ACTION_CREATE]} to create, {counts[ACTION_UPDATE]} to '
+                     f'update, {counts[ACTION_DELETE]} to delete, '
+                     f'{len(plan) - sum(counts.values())} to enable or disable, '
+                     f'{len(unchanged)} unchanged.\n')
+    if unmanaged:
+        sys.stderr.write(f'{len(unmanaged)} job(s) not in the file left untouched, '
+                         'delete them with --prune.\n')
+
+
+def jobs_apply(parser_args):
+    '''
+    Bring the jobs of the project to the state described in a file: fetch the current jobs
+    once, compute the differences and only submit those, in parallel.
+
+    :param parser_args: dictionary containing the user input from the parser
+    :returns:           the API's return value
+    '''
+    try:
+        project = getattr(parser_args, 'project', None)
+        desired = load_desired_jobs(parser_args.file)
+        current = fetch_current_jobs(project)
+        plan, unchanged = compute_plan(desired, current, parser_args.prune)
+        unmanaged = [] if parser_args.prune else sorted(set(current) - set(desired))
+        _write_plan(plan, unchanged, unmanaged)
+        if parser_args.dry_run or not plan:
+            return ReturnCodes.OK
+        if (any(actions == [ACTION_DELETE] for _, actions, _ in plan) and
+                not parser_args.yes and not confirm('Are you sure you want to delete?')):
+            raise AbortError
+
+        return_code = ReturnCodes.OK
+        for job_id, error in submit_plan(plan, desired, project, parser_args.parallel):
+            if error is None:
+                sys.stdout.write(f'Job {job_id}: done.\n')
+            else:
+                sys.stderr.write(f'Job {job_id}: {error}\n')
+                return_code = ReturnCodes.BACKEND_ERROR
+        return return_code
+
+    except (AbortError, KeyboardInterrupt):
+        sys.stderr.write('\nAbort.\n')
+        return ReturnCodes.ABORT
+    except AcronError as error:
+        sys.stderr.write(str(error) + '\n')
+        return ReturnCodes.USER_ERROR
@@ -14,19 +14,17 @@ import sys
 import os
 import re
 import json
-import requests
 import gssapi
-from requests_gssapi import HTTPSPNEGOAuth
 from acron.constants import Endpoints, ReturnCodes
 from .config import CONFIG
+from .utils import LOGIN_CACHE, send_request
 
 
-def get_user_from_principal():
-    ''' Get the username from the current principal'''
+def get_principal():
+    ''' Get the current principal'''
     try:
         creds = gssapi.creds.Credentials(usage='initiate')
-        principal = str(creds.name.display_as(creds.name.name_type))
-        return principal.split('@')[0]
+        return str(creds.name.display_as(creds.name.name_type))
     except Exception as krb_error:  # pylint: disable=broad-except
         sys.stderr.write(
             "Kerberos ticket not found or expired. Exiting...\n")
@@ -36,6 +34,12 @@ def get_user_from_principal():
             "\nPlease run kinit and try again.\n")
         sys.exit(1)
 
+
+def get_user_from_principal():
+    ''' Get the username from the current principal'''
+    return get_principal().split('@')[0]
+
+
 def read_secret(length):
     ''' read the 2FA secret from stdin '''
     secret = sys.stdin.readlines(1)[0].rstrip()
@@ -83,39 +87,41 @@ def ask_for_secret():
             sys.exit(0)
 
 
-def check_login_status():
-    ''' check if the user is logged into the server '''
+def check_login_status(principal=None):
+    ''' check if the user is logged into the server, caching the expiry of the session '''
     # check login status
     path = CONFIG['ACRON_SERVER_FULL_URL'] + \
         Endpoints.SESSION_TRAILING_SLASH + 'status'
-    response = requests.get(path, auth=HTTPSPNEGOAuth(),
-                            verify=CONFIG['SSL_CERTS'])
+    response = send_request('GET', path)
     if response.status_code == 200:
-        return response.json()['loggedIn']
+        answer = response.json()
+        if answer['loggedIn'] and principal and 'expiresAt' in answer:
+            LOGIN_CACHE.put(principal, CONFIG['ACRON_SERVER_FULL_URL'], answer['expiresAt'])
+        return answer['loggedIn']
     if response.status_code == 401:
         return response.text
     return False
 
 
-def login_user():
-    ''' log in the user '''
+def login_user(principal=None):
+    ''' log in the user, caching the expiry of the session '''
     secret = ask_for_secret()
     path = CONFIG['ACRON_SERVER_FULL_URL'] + \
         Endpoints.SESSION_TRAILING_SLASH + 'login'
     headers = {
         "Content-Type": "application/json"
     }
-    response = requests.post(path,
-                             data=secret,
-                             headers=headers,
-                             auth=HTTPSPNEGOAuth(),
-                             verify=CONFIG['SSL_CERTS'])
+    response = send_request('POST', path,
+                            data=secret,
+                            headers=headers)
     if response.status_code == 200:
         try:
             answer = response.json()
             if 'isError' in answer:
                 return 0
-            return response.json()['AuthTimestamp']
+            if answer['AuthTimestamp'] and principal and 'ExpiresAt' in answer:
+                LOGIN_CACHE.put(principal, CONFIG['ACRON_SERVER_FULL_URL'], answer['ExpiresAt'])
+            return answer['AuthTimestamp']
         except json.decoder.JSONDecodeError:
             sys.stderr.write("%s" % response.text)
             sys.exit(1)
@@ -123,14 +129,21 @@ def login_user():
 
 
 def login():
-    ''' check session status and login the user if needed '''
+    ''' check session status and login the user if needed, unless nobody answers the prompt '''
     # check logged user
-    if os.environ['USER'] != get_user_from_principal():
+    principal = get_principal()
+    if os.environ['USER'] != principal.split('@')[0]:
         print('WARNING: Kerberos Principal does not match the logged in username')
+    # skip checking a session known to be valid, the server turns it down otherwise
+    if LOGIN_CACHE.is_valid(principal, CONFIG['ACRON_SERVER_FULL_URL']):
+        return ReturnCodes.OK
     # check login status
-    if check_login_status():
+    if check_login_status(principal):
         return ReturnCodes.OK
-    authtime = login_user()
+    if not LOGIN_CACHE.interactive:
+        sys.stderr.write('Not logged in, run any acron command to log in.\n')
+        sys.exit(ReturnCodes.ABORT)
+    authtime = login_user(principal)
     if authtime > 0:
         return ReturnCodes.OK
     sys.stderr.write('2FA authentication has failed.\n')
@@ -0,0 +1,226 @@
+#
+# (C) Copyright 2022 CERN
+#
+# This software is distributed under the terms of the GNU General Public Licence version 3
+# (GPL Version 3), copied verbatim in the file "COPYING" /copied verbatim below.
+#
+# In applying this licence, CERN does not waive the privileges and immunities granted to it
+# by virtue of its status as an Intergovernmental Organization or submit itself to any jurisdiction.
+#
+'''Client-side cache of the server responses, revalidated with ETags'''
+
+import codecs
+import json
+import os
+from tempfile import NamedTemporaryFile
+from urllib.parse import urlparse
+from acron.serialization import json_loads
+from acron.utils import get_current_user
+from .utils import cache_dir, send_request
+
+__author__ = 'Rodrigo Bermudez Schettino (CERN)'
+__credits__ = ['Rodrigo Bermudez Schettino (CERN)', 'Ulrich Schwickerath (CERN)']
+__maintainer__ = 'Rodrigo Bermudez Schettino (CERN)'
+__email__ = 'rodrigo.bermudez.schettino@cern.ch'
+__status__ = 'Development'
+
+
+# Maximum number of responses kept per project
+MAX_ENTRIES = 64
+# Headers of the responses kept along with their body
+KEPT_HEADERS = ['Content-Type', 'X-Next-Cursor']
+
+
+class CachedResponse:
+    '''
+    Stands in for the HTTP response of the server when the cached copy is still valid.
+    '''
+
+    def __init__(self, entry):
+        '''
+        Constructor
+
+        :param entry: the cache entry holding the body and its headers
+        '''
+        self.status_code = 200
+        self.text = entry['body']
+        self.content = entry['body'].encode('utf-8')
+        self.headers = dict(entry['headers'], ETag=entry['etag'])
+
+    def json(self):
+        '''
+        :returns: the decoded body
+        '''
+        return json_loads(self.text)
+
+    def iter_content(self, chunk_size=None, decode_unicode=False):
+        '''
+        :param chunk_size:     ignored, the body is given at once
+        :param decode_unicode: True to get the body as text
+        :returns:              an iterator over the body, like requests.Response.iter_content
+        '''
+        yield self.text if decode_unicode else self.content
+
+    def iter_lines(self):
+        '''
+        :returns: an iterator over the lines of the body, like requests.Response.iter_lines
+        '''
+        yield from self.content.splitlines()
+
+
+class RecordedResponse:
+    '''
+    Stands in for a streamed HTTP response of the server, storing its body in the cache
+    once it was read entirely.
+    '''
+
+    def __init__(self, response, cache, key):
+        '''
+        Constructor
+
+        :param response: HTTP response from server, streamed
+        :param cache:    the ProjectCache the body is stored in
+        :param key:      identifier of the request
+        '''
+        self._response = response
+        self._cache = cache
+        self._key = key
+        self.status_code = response.status_code
+        self.headers = response.headers
+
+    def iter_content(self, chunk_size=None, decode_unicode=False):
+        '''
+        :param chunk_size:     number of bytes read at once, None as they arrive
+        :param decode_unicode: True to get the body as text
+        :returns:              an iterator over the body, like requests.Response.iter_content
+        '''
+        chunks = []
+        # requests only decodes the body if its charset is given
+        decoder = codecs.getincrementaldecoder('utf-8')('replace')
+        for chunk in self._response.iter_content(chunk_size=chunk_size):
+            text = decoder.decode(chunk)
+            chunks.append(text)
+            yield text if decode_unicode else chunk
+        tail = decoder.decode(b'', final=True)
+        if tail:
+            chunks.append(tail)
+            if decode_unicode:
+                yield tail
+        self._cache.put(self._key, self._response, ''.join(chunks))
+
+    def iter_lines(self):
+        '''
+        :returns: an iterator over the lines of the body, like requests.Response.iter_lines
+        '''
+        pending = b''
+        for chunk in self.iter_content():
+            lines = (pending + chunk).split(b'\n')
+            pending = lines.pop()
+            yield from lines
+        if pending:
+            yield pending
+
+    @property
+    def text(self):
+        '''
+        :returns: the body, read entirely
+        '''
+        return ''.join(self.iter_content(decode_unicode=True))
+
+    def json(self):
+        '''
+        :returns: the decoded body
+        '''
+        return json_loads(self.text)
+
+
+class ProjectCache:
+    '''
+    Responses of the server for one project, stored in a single file only readable by
+    the user, as job definitions may contain sensitive commands.
+    '''
+
+    def __init__(self, server_url, project=None):
+        '''
+        Constructor
+
+        :param server_url: URL of the server, responses of different servers are kept apart
+        :param project:    the project, defaults to the one of the current user
+        '''
+        server = urlparse(server_url).netloc.replace(':', '_')
+        self.path = os.path.join(cache_dir(), 'responses', server,
+                                 (project or get_current_user()) + '.json')
+        self._entries = None
+
+    def _load(self):
+        '''
+        :returns: the entries of the project, empty if the cache is missing or corrupted
+        '''
+        if self._entries is None:
+            try:
+                with open(self.path, 'r') as cache_file:
+                    self._entries = json.load(cache_file)
+            except (OSError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def get(self, key):
+        '''
+        :param key: identifier of the request
+        :returns:   the cached entry, None if unknown
+        '''
+        return self._load().get(key)
+
+    def put(self, key, response, body=None):
+        '''
+        Store a response carrying an ETag. Failing to write the cache is not an error.
+
+        :param key:      identifier of the request
+        :param response: HTTP response from server
+        :param body:     the body of the response, if already read from a stream
+        '''
+        etag = response.headers.get('ETag')
+        if not etag:
+            return
+        entries = self._load()
+        entries.pop(key, None)
+        entries[key] = {'etag': etag, 'body': response.text if body is None else body,
+                        'headers': {header: response.headers[header] for header in KEPT_HEADERS
+                                    if header in response.headers}}
+        while len(entries) > MAX_ENTRIES:
+            del entries[next(iter(entries))]
+        try:
+            os.makedirs(os.path.dirname(self.path), 0o0700, exist_ok=True)
+            with NamedTemporaryFile('w', dir=os.path.dirname(self.path), delete=False) as tmp:
+                json.dump(entries, tmp)
+            os.replace(tmp.name, self.path)
+        except OSError:
+            pass
+
+
+def cached_get(path, params=None, project=None, headers=None, stream=False):
+    '''
+    GET request answered from the cache when the server confirms the cached copy is current.
+
+    :param path:    full URL of the endpoint
+    :param params:  query parameters of the request
+    :param project: the project the response belongs to
+    :param headers: further headers of the request, e.g. Accept
+    :param stream:  True to read the body as it arrives, it is cached once read entirely
+    :returns:       the HTTP response from server, or the cached copy if not modified
+    '''
+    cache = ProjectCache(path, project)
+    key = urlparse(path).path + '?' + json.dumps(params, sort_keys=True)
+    entry = cache.get(key)
+    headers = dict(headers or {})
+    if entry:
+        headers['If-None-Match'] = entry['etag']
+
+    response = send_request('GET', path, params=params, headers=headers, stream=stream)
+    if response.status_code == 304 and entry:
+        return CachedResponse(entry)
+    if response.status_code == 200 and stream:
+        return RecordedResponse(response, cache, key)
+    if response.status_code == 200:
+        cache.put(key, response)
+    return response
@@ -16,10 +16,7 @@ __email__ = 'rodrigo.bermudez.schettino@cern.ch'
 __status__ = 'Development'
 
 
-from .creds import creds_delete, creds_get, creds_put
-from .jobs import (jobs_delete, jobs_get, jobs_put,
-                   jobs_post, jobs_enable, jobs_disable)
-from .projects import (projects_get, projects_share, projects_delete)
+import importlib
 
 
 EPILOG_CREDS = 'For more information, please check the man page, acron-creds(1).'
@@ -47,6 +44,19 @@ FLAG_LONG_ALL = '--all'
 FLAG_LONG_USER = '--user_id'
 FLAG_LONG_WRITE = '--write'
 FLAG_LONG_DELETE = '--delete'
+FLAG_LONG_LIMIT = '--limit'
+FLAG_LONG_CURSOR = '--cursor'
+FLAG_LONG_ENABLED = '--enabled'
+FLAG_LONG_DISABLED = '--disabled'
+FLAG_SHORT_FILE = '-f'
+FLAG_LONG_FILE = '--file'
+FLAG_LONG_DRY_RUN = '--dry-run'
+FLAG_LONG_PRUNE = '--prune'
+FLAG_LONG_PARALLEL = '--parallel'
+FLAG_LONG_ALL_PROJECTS = '--all-projects'
+FLAG_LONG_NEXT = '--next'
+FLAG_SHORT_YES = '-y'
+FLAG_LONG_YES = '--yes'
 
 # Displayed only in usage messages
 METAVAR_JOBID = 'JOB_ID'
@@ -57,6 +67,9 @@ METAVAR_CMD = "'CMD'"
 METAVAR_COMMAND = '<command>'
 METAVAR_SCHEDULE = "'CRON'"
 METAVAR_USERID = 'USER_ID'
+METAVAR_LIMIT = 'N'
+METAVAR_CURSOR = 'JOB_ID'
+METAVAR_FILE = 'FILE'
 
 HELP_DESCRIPTION = 'description'
 HELP_ARG_JOB = 'The unique job identifier corresponding to the job.'
@@ -71,6 +84,21 @@ HELP_ARG_WRITE = 'Grant user write permissions to project. Default: read-only pe
 TITLE_COMMANDS = 'Commands'
 
 
+def _lazy(module, function):
+    '''
+    Refer to the function of a subcommand without importing its module, and the HTTP and
+    Kerberos libraries it needs, until the subcommand is run.
+
+    :param module:   name of the module of acron.client defining the function
+    :param function: name of the function
+    :returns:        a function importing the module and calling the function
+    '''
+    def run(parser_args):
+        return getattr(importlib.import_module('acron.client.' + module), function)(parser_args)
+    run.__name__ = function
+    return run
+
+
 def add_creds_subparsers(arg_parser):
     '''
     Add creds subparsers.
@@ -93,7 +121,7 @@ def add_creds_subparsers(arg_parser):
         help='show credentials status, does not download them',
         description='Acron credentials status utility.',
         epilog=EPILOG_CREDS)
-    creds_get_parser.set_defaults(func=creds_get)
+    creds_get_parser.set_defaults(func=_lazy('creds', 'creds_get'))
 
     # acron creds upload [--file FILE|--generate] [--help]
     creds_update_parser = creds_subparsers.add_parser(
@@ -101,7 +129,7 @@ def add_creds_subparsers(arg_parser):
         help='upload new credentials, either existing (--file) or generated on the fly (--generate)',
         description='Acron credentials upload utility.',
         epilog=EPILOG_CREDS)
-    creds_update_parser.set_defaults(func=creds_put)
+    creds_update_parser.set_defaults(func=_lazy('creds', 'creds_put'))
     creds_update_parser_type = creds_update_parser.add_mutually_exclusive_group(
         required=True)
     creds_update_parser_type.add_argument(
@@ -115,7 +143,7 @@ def add_creds_subparsers(arg_parser):
         help='delete credentials, if they exist',
         description='Acron credentials deletion utility.',
         epilog=EPILOG_CREDS)
-    creds_delete_parser.set_defaults(func=creds_delete)
+    creds_delete_parser.set_defaults(func=_lazy('creds', 'creds_delete'))
 
 
 def add_jobs_subparsers(arg_parser):
@@ -135,19 +163,55 @@ def add_jobs_subparsers(arg_parser):
         title=TITLE_COMMANDS, metavar=METAVAR_COMMAND, help=HELP_DESCRIPTION)
     jobs_subparsers.required = True
 
-    # acron jobs show (--job_id JOB_ID) [--project PROJECT] [--help]
+    # acron jobs show (--job_id JOB_ID [JOB_ID ...]) [--project PROJECT|--all-projects]
+    #                 [--limit N] [--cursor JOB_ID] [--target FQDN] [--schedule 'CRON']
+    #                 [--description 'DESCR'] [--enabled|--disabled] [--next N] [--parallel N]
+    #                 [--help]
     jobs_get_parser = jobs_subparsers.add_parser(
         'show',
         help='show job definition',
         description='Acron jobs information utility.',
         epilog=EPILOG_JOBS)
-    jobs_get_parser.set_defaults(func=jobs_get)
-    jobs_get_parser.add_argument(
-        FLAG_SHORT_JOBID, FLAG_LONG_JOBID, metavar=METAVAR_JOBID,
-        help=HELP_ARG_JOB)
+    jobs_get_parser.set_defaults(func=_lazy('jobs', 'jobs_get'))
     jobs_get_parser.add_argument(
+        FLAG_SHORT_JOBID, FLAG_LONG_JOBID, metavar=METAVAR_JOBID, nargs='+',
+        help=HELP_ARG_JOB + ' Several jobs can be given.')
+    jobs_get_parser_project = jobs_get_parser.add_mutually_exclusive_group()
+    jobs_get_parser_project.add_argument(
         FLAG_SHORT_PROJECT, FLAG_LONG_PROJECT, metavar=METAVAR_PROJECT,
         help=HELP_ARG_PROJECT)
+    jobs_get_parser_project.add_argument(
+        FLAG_LONG_ALL_PROJECTS, action='store_true',
+        help='Show the jobs of your project and of all the projects shared with you.')
+    jobs_get_parser.add_argument(
+        FLAG_LONG_LIMIT, metavar=METAVAR_LIMIT, type=int,
+        help='Show at most N jobs.')
+    jobs_get_parser.add_argument(
+        FLAG_LONG_CURSOR, metavar=METAVAR_CURSOR,
+        help='Show the jobs following JOB_ID, as suggested when more jobs are available.')
+    jobs_get_parser.add_argument(
+        FLAG_SHORT_TARGET, FLAG_LONG_TARGET, metavar=METAVAR_TARGET,
+        help='Show only the jobs executed on this node.')
+    jobs_get_parser.add_argument(
+        FLAG_SHORT_SCHEDULE, FLAG_LONG_SCHED, metavar=METAVAR_SCHEDULE,
+        help='Show only the jobs whose schedule contains this text.')
+    jobs_get_parser.add_argument(
+        FLAG_SHORT_DESCR, FLAG_LONG_DESCR, metavar=METAVAR_DESCR,
+        help='Show only the jobs whose description contains this text, ignoring case.')
+    jobs_get_parser_state = jobs_get_parser.add_mutually_exclusive_group()
+    jobs_get_parser_state.add_argument(
+        FLAG_LONG_ENABLED, action='store_true',
+        help='Show only the enabled jobs.')
+    jobs_get_parser_state.add_argument(
+        FLAG_LONG_DISABLED, action='store_true',
+        help='Show only the disabled jobs.')
+    jobs_get_parser.add_argument(
+        FLAG_LONG_NEXT, metavar=METAVAR_LIMIT, type=int,
+        help='Show the next N times the jobs given with --job_id run at.')
+    jobs_get_parser.add_argument(
+        FLAG_LONG_PARALLEL, metavar=METAVAR_LIMIT, type=int, default=4,
+        help='Send up to N requests at the same time with several jobs or projects. '
+             'Default: 4.')
 
     # acron jobs create --schedule 'CRON' --target HOST --command 'CMD' [--description 'DESCR']
     #                   [--project PROJECT] [--help]
@@ -156,7 +220,7 @@ def add_jobs_subparsers(arg_parser):
         help='create a job.',
         description='Acron jobs creation utility.',
         epilog=EPILOG_JOBS)
-    jobs_post_parser.set_defaults(func=jobs_post)
+    jobs_post_parser.set_defaults(func=_lazy('jobs', 'jobs_post'))
     jobs_post_parser.add_argument(
         FLAG_SHORT_JOBID, FLAG_LONG_JOBID, metavar=METAVAR_JOBID, required=False,
         help=HELP_ARG_JOB)
@@ -183,7 +247,7 @@ def add_jobs_subparsers(arg_parser):
         help='modify a job.',
         description='Acron jobs modification utility.',
         epilog=EPILOG_JOBS)
-    jobs_put_parser.set_defaults(func=jobs_put)
+    jobs_put_parser.set_defaults(func=_lazy('jobs', 'jobs_put'))
     jobs_put_parser.add_argument(
         FLAG_SHORT_JOBID, FLAG_LONG_JOBID, metavar=METAVAR_JOBID, required=True,
         help=HELP_ARG_JOB)
@@ -203,13 +267,40 @@ def add_jobs_subparsers(arg_parser):
         FLAG_SHORT_PROJECT, FLAG_LONG_PROJECT, metavar=METAVAR_PROJECT,
         help=HELP_ARG_PROJECT)
 
+    # acron jobs apply --file FILE [--project PROJECT] [--dry-run] [--prune] [--yes]
+    #                  [--parallel N] [--help]
+    jobs_apply_parser = jobs_subparsers.add_parser(
+        'apply',
+        help='bring the jobs to the state described in a file.',
+        description='Acron declarative jobs management utility.',
+        epilog=EPILOG_JOBS)
+    jobs_apply_parser.set_defaults(func=_lazy('apply', 'jobs_apply'))
+    jobs_apply_parser.add_argument(
+        FLAG_SHORT_FILE, FLAG_LONG_FILE, metavar=METAVAR_FILE, required=True,
+        help='YAML file listing the jobs of the project, - for the standard input.')
+    jobs_apply_parser.add_argument(
+        FLAG_SHORT_PROJECT, FLAG_LONG_PROJECT, metavar=METAVAR_PROJECT,
+        help=HELP_ARG_PROJECT)
+    jobs_apply_parser.add_argument(
+        FLAG_LONG_DRY_RUN, action='store_true',
+        help='Only show the changes that would be made.')
+    jobs_apply_parser.add_argument(
+        FLAG_LONG_PRUNE, action='store_true',
+        help='Delete the jobs of the project which are not in the file.')
+    jobs_apply_parser.add_argument(
+        FLAG_SHORT_YES, FLAG_LONG_YES, action='store_true',
+        help='Do not ask for confirmation before deleting jobs.')
+    jobs_apply_parser.add_argument(
+        FLAG_LONG_PARALLEL, metavar=METAVAR_LIMIT, type=int, default=4,
+        help='Send up to N requests at the same time. Default: 4.')
+
     # acron jobs delete (--job_id JOB_ID|--all) [--project PROJECT] [--help]
     jobs_delete_parser = jobs_subparsers.add_parser(
         'delete',
         help='delete a job',
         description='Acron jobs deletion utility.',
         epilog=EPILOG_JOBS)
-    jobs_delete_parser.set_defaults(func=jobs_delete)
+    jobs_delete_parser.set_defaults(func=_lazy('jobs', 'jobs_delete'))
     jobs_delete_parser_jobid = jobs_delete_parser.add_mutually_exclusive_group(
         required=True)
     jobs_delete_parser_jobid.add_argument(
@@ -228,7 +319,7 @@ def add_jobs_subparsers(arg_parser):
         help='enable a disabled job.',
         description='Acron jobs enabling utility.',
         epilog=EPILOG_JOBS)
-    jobs_enable_parser.set_defaults(func=jobs_enable)
+    jobs_enable_parser.set_defaults(func=_lazy('jobs', 'jobs_enable'))
     jobs_enable_parser_jobid = jobs_enable_parser.add_mutually_exclusive_group(
         required=True)
     jobs_enable_parser_jobid.add_argument(
@@ -247,7 +338,7 @@ def add_jobs_subparsers(arg_parser):
         help='disable a job without deleting it.',
         description='Acron jobs disabling utility.',
         epilog=EPILOG_JOBS)
-    jobs_disable_parser.set_defaults(func=jobs_disable)
+    jobs_disable_parser.set_defaults(func=_lazy('jobs', 'jobs_disable'))
     jobs_disable_parser_jobid = jobs_disable_parser.add_mutually_exclusive_group(
         required=True)
     jobs_disable_parser_jobid.add_argument(
@@ -285,7 +376,7 @@ def add_projects_subparsers(arg_parser):
         description='Acron projects sharing utility.',
         epilog=EPILOG_PROJECTS
     )
-    projects_share_parser.set_defaults(func=projects_share)
+    projects_share_parser.set_defaults(func=_lazy('projects', 'projects_share'))
     projects_share_parser.add_argument(
         FLAG_SHORT_USER, FLAG_LONG_USER, metavar=METAVAR_USERID,
         required=True, help=HELP_ARG_USER)
@@ -304,7 +395,7 @@ def add_projects_subparsers(arg_parser):
         help='show project definition',
         description='Acron projects information utility.',
         epilog=EPILOG_PROJECTS)
-    projects_get_parser.set_defaults(func=projects_get)
+    projects_get_parser.set_defaults(func=_lazy('projects', 'projects_get'))
     projects_get_parser.add_argument(
         FLAG_SHORT_ALL, FLAG_LONG_ALL, action='store_true',
         help='Show all shareable projects for current user.')
@@ -315,4 +406,59 @@ def add_projects_subparsers(arg_parser):
         help='delete personal project',
         description='Acron projects deletion utility.',
         epilog=EPILOG_PROJECTS)
-    projects_delete_parser.set_defaults(func=projects_delete)
+    projects_delete_parser.set_defaults(func=_lazy('projects', 'projects_delete'))
+
+    # acron projects export [--project PROJECT] [--file FILE] [--help]
+    projects_export_parser = projects_subparsers.add_parser(
+        'export',
+        help='save the jobs, shares and nodes of a project to a file',
+        description='Acron projects backup utility.',
+        epilog=EPILOG_PROJECTS)
+    projects_export_parser.set_defaults(func=_lazy('projects', 'projects_export'))
+    projects_export_parser.add_argument(
+        FLAG_SHORT_PROJECT, FLAG_LONG_PROJECT, metavar=METAVAR_PROJECT,
+        help=HELP_ARG_PROJECT)
+    projects_export_parser.add_argument(
+        FLAG_SHORT_FILE, FLAG_LONG_FILE, metavar=METAVAR_FILE,
+        help='File to write, - for the standard output. Default: acron-PROJECT.json.gz.')
+
+    # acron projects import --file FILE [--project PROJECT] [--help]
+    projects_import_parser = projects_subparsers.add_parser(
+        'import',
+        help='restore the jobs, shares and nodes of an exported project',
+        description='Acron projects restore utility.',
+        epilog=EPILOG_PROJECTS)
+    projects_import_parser.set_defaults(func=_lazy('projects', 'projects_import'))
+    projects_import_parser.add_argument(
+        FLAG_SHORT_FILE, FLAG_LONG_FILE, metavar=METAVAR_FILE, required=True,
+        help='File written by acron projects export, - for the standard input.')
+    projects_import_parser.add_argument(
+        FLAG_SHORT_PROJECT, FLAG_LONG_PROJECT, metavar=METAVAR_PROJECT,
+        help=HELP_ARG_PROJECT)
+
+
+def add_completion_subparsers(arg_parser):
+    '''
+    Add completion subparsers, used by the shell completion script and not listed in the help.
+
+    :param arg_parser: ArgumentParser class instance
+    '''
+    # acron completion [--help]
+    completion_parser = arg_parser.add_parser(
+        'completion',
+        description='Acron shell completion utility.')
+    completion_subparsers = completion_parser.add_subparsers(
+        title=TITLE_COMMANDS, metavar=METAVAR_COMMAND, help=HELP_DESCRIPTION)
+    completion_subparsers.required = True
+
+    # acron completion refresh [--project PROJECT] [--help]
+    completion_refresh_parser = completion_subparsers.add_parser(
+        'refresh',
+        help='refresh the job identifiers and project names completed by the shell',
+        description='Acron shell completion utility.')
+    # Run in the background, an expired login session skips the refresh instead of prompting
+    completion_refresh_parser.set_defaults(func=_lazy('completion', 'completion_refresh'),
+                                           interactive=False)
+    completion_refresh_parser.add_argument(
+        FLAG_SHORT_PROJECT, FLAG_LONG_PROJECT, metavar=METAVAR_PROJECT,
+        help=HELP_ARG_PROJECT)
@@ -0,0 +1,95 @@
+#
+# (C) Copyright 2022 CERN
+#
+# This software is distributed under the terms of the GNU General Public Licence version 3
+# (GPL Version 3), copied verbatim in the file "COPYING" /copied verbatim below.
+#
+# In applying this licence, CERN does not waive the privileges and immunities granted to it
+# by virtue of its status as an Intergovernmental Organization or submit itself to any jurisdiction.
+#
+'''Words completed by the shell, cached in plain files read by the completion script'''
+
+import os
+from tempfile import NamedTemporaryFile
+from acron.constants import Endpoints, JobFields, MimeTypes, ReturnCodes
+from acron.exceptions import AcronError, AbortError
+from .config import CONFIG
+from .jobs import _shared_projects
+from .utils import cache_dir, send_request
+
+__author__ = 'Rodrigo Bermudez Schettino (CERN)'
+__credits__ = ['Rodrigo Bermudez Schettino (CERN)', 'Ulrich Schwickerath (CERN)']
+__maintainer__ = 'Rodrigo Bermudez Schettino (CERN)'
+__email__ = 'rodrigo.bermudez.schettino@cern.ch'
+__status__ = 'Development'
+
+
+# Name of the file of the projects shared with the user
+PROJECTS_FILE = 'projects'
+# Name of the file of the jobs of the user's project, followed by .PROJECT for the others
+JOBS_FILE = 'jobs'
+
+
+def completion_path(name):
+    '''
+    :param name: name of the list of words
+    :returns:    the path of the file, as read by etc/bash_completion.d/acron
+    '''
+    return os.path.join(cache_dir(), 'completion', name)
+
+
+def write_words(name, words):
+    '''
+    Replace a list of words at once, so that the shell never reads half of it.
+
+    :param name:  name of the list of words
+    :param words: the words, one per line
+    '''
+    path = completion_path(name)
+    os.makedirs(os.path.dirname(path), 0o0700, exist_ok=True)
+    with NamedTemporaryFile('w', dir=os.path.dirname(path), delete=False) as tmp:
+        tmp.write(''.join(word + '\n' for word in words))
+    os.replace(tmp.name, path)
+
+
+def fetch_job_ids(project=None):
+    '''
+    Get the names of all the jobs of a project.
+
+    :param project:     the project, defaults to the one of the current user
+    :raises AbortError: if the jobs cannot be listed
+    :returns:           the sorted list of the job identifiers
+    '''
+    params = {'fields': JobFields.NAME}
+    if project:
+        params['project'] = project
+    path = CONFIG['ACRON_SERVER_FULL_URL'] + Endpoints.JOBS_TRAILING_SLASH
+    response = send_request('GET', path, params=params, headers={'Accept': MimeTypes.JSON})
+    if response.status_code == 404 and not project:
+        # The personal project is initialised by the first job created
+        return []
+    if response.status_code != 200:
+        raise AbortError
+    jobs = response.json()
+    if not isinstance(jobs, list):
+        return []
+    return sorted(job['name'] for job in jobs)
+
+
+def completion_refresh(parser_args):
+    '''
+    Refresh the words completed by the shell. Run in the background by the completion
+    script when its files are missing or older than ACRON_COMPLETION_TTL seconds.
+
+    :param parser_args: dictionary containing the user input from the parser
+    :returns:           the API's return value
+    '''
+    project = getattr(parser_args, 'project', None)
+    try:
+        write_words(JOBS_FILE + ('.' + project if project else ''), fetch_job_ids(project))
+        if not project:
+            write_words(PROJECTS_FILE, _shared_projects())
+    except (AcronError, OSError):
+        # Nobody reads the errors, the words are refreshed at the next completion
+        return ReturnCodes.BACKEND_ERROR
+    return ReturnCodes.OK
@@ -10,7 +10,7 @@
 '''Acron client configuration'''
 
 import os
-import yaml
+from acron.serialization import yaml_load
 
 __author__ = 'Philippe Ganz (CERN)'
 __credits__ = ['Philippe Ganz (CERN)', 'Ulrich Schwickerath (CERN)']
@@ -22,7 +22,7 @@ __status__ = 'Development'
 CONFIG_FILE_PATH = '/etc/acron/client.config'
 
 with open(CONFIG_FILE_PATH, 'r') as config_file:
-    CONFIG = yaml.safe_load(config_file)
+    CONFIG = yaml_load(config_file)
 
 try:
     ACRONSERVER = "https://"+os.environ['ACRON_SERVER']
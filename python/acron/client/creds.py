@@ -15,14 +15,13 @@ import os
 from shutil import rmtree
 import sys
 from tempfile import mkdtemp
-import requests
-from requests_gssapi import HTTPSPNEGOAuth
 from acron.exceptions import AcronError, AbortError, GPGError, KinitError, KTUtilError
 from acron.utils import (get_current_user, gpg_add_public_key, gpg_encrypt_file, gpg_key_exist,
                          keytab_generator, krb_init_keytab)
 from acron.constants import Endpoints, ReturnCodes
 from .config import CONFIG
 from .errors import ServerError
+from .utils import send_request
 
 __author__ = 'Philippe Ganz (CERN)'
 __credits__ = ['Philippe Ganz (CERN)', 'Ulrich Schwickerath (CERN)',
@@ -158,9 +157,8 @@ def creds_delete(parser_args):
     :returns:           the API's return value
     '''
     try:
-        response = requests.delete(
-            CONFIG['ACRON_SERVER_FULL_URL'] + Endpoints.CREDS_TRAILING_SLASH,
-            auth=HTTPSPNEGOAuth(), verify=CONFIG['SSL_CERTS'])
+        response = send_request(
+            'DELETE', CONFIG['ACRON_SERVER_FULL_URL'] + Endpoints.CREDS_TRAILING_SLASH)
 
         http_status_code_switcher = {
             200: _handle_found_delete,
@@ -190,9 +188,8 @@ def creds_get(parser_args):
     :returns:           the API's return value
     '''
     try:
-        response = requests.get(
-            CONFIG['ACRON_SERVER_FULL_URL'] + Endpoints.CREDS_TRAILING_SLASH,
-            auth=HTTPSPNEGOAuth(), verify=CONFIG['SSL_CERTS'])
+        response = send_request(
+            'GET', CONFIG['ACRON_SERVER_FULL_URL'] + Endpoints.CREDS_TRAILING_SLASH)
 
         http_status_code_switcher = {
             200: _handle_found_get,
@@ -315,11 +312,12 @@ def creds_put(parser_args):
         gpg_encrypt_file(creds_file, creds_file_encrypted,
                          CONFIG['GPG_BINARY_PATH'], CONFIG['GPG_PUBLIC_KEY_NAME'])
         sys.stdout.write('Credentials file successfully encrypted\n')
-        files = {'keytab': open(creds_file_encrypted, 'rb')}
+        # Read the file at once, so that the upload can be repeated if the server is busy
+        with open(creds_file_encrypted, 'rb') as keytab:
+            files = {'keytab': ('keytab.gpg', keytab.read())}
         sys.stdout.write('Sending credentials file to the server...\n')
-        response = requests.put(
-            CONFIG['ACRON_SERVER_FULL_URL'] + Endpoints.CREDS_TRAILING_SLASH, files=files,
-            auth=HTTPSPNEGOAuth(), verify=CONFIG['SSL_CERTS'])
+        response = send_request(
+            'PUT', CONFIG['ACRON_SERVER_FULL_URL'] + Endpoints.CREDS_TRAILING_SLASH, files=files)
 
         http_status_code_switcher = {
             200: _handle_found_put,
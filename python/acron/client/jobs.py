@@ -9,13 +9,17 @@
 #
 '''Jobs management functions'''
 
+import copy
 import sys
-import requests
-from requests_gssapi import HTTPSPNEGOAuth
+from concurrent.futures import ThreadPoolExecutor
 from acron.exceptions import AcronError, AbortError
-from acron.constants import Endpoints, ReturnCodes
+from acron.serialization import json_loads, yaml_load
+from acron.utils import format_crontab_entry, get_current_user
+from acron.constants import Endpoints, JobFields, MimeTypes, ReturnCodes
+from .cache import cached_get
 from .config import CONFIG
 from .errors import ServerError
+from .utils import send_request
 
 __author__ = 'Philippe Ganz (CERN)'
 __credits__ = ['Philippe Ganz (CERN)', 'Ulrich Schwickerath (CERN)',
@@ -24,6 +28,31 @@ __maintainer__ = 'Rodrigo Bermudez Schettino (CERN)'
 __email__ = 'rodrigo.bermudez.schettino@cern.ch'
 __status__ = 'Development'
 
+# Media types of the job listings, crontab entries rendered by the server preferred
+LISTING_ACCEPT = ', '.join([MimeTypes.CRONTAB, MimeTypes.NDJSON + ';q=0.9',
+                            MimeTypes.JSON + ';q=0.8'])
+
+
+def _job_summary(job_properties):
+    '''
+    Bring a job to the summary format, servers not supporting fields= send the full
+    definition of the backend.
+
+    :param job_properties: a dictionary containing the job's properties
+    :returns:              a dictionary with the fields of JobFields
+    '''
+    if 'nodefilters' not in job_properties:
+        return job_properties
+    description = job_properties['description'].split(' ')
+    return {
+        JobFields.NAME: job_properties['name'],
+        JobFields.SCHEDULE: ' '.join(description[0:5]),
+        JobFields.TARGET: job_properties['nodefilters']['filter'].replace('name: ', ''),
+        JobFields.COMMAND: job_properties['sequence']['commands'][0]['exec'],
+        JobFields.DESCRIPTION: ' '.join(description[5:]),
+        JobFields.ENABLED: job_properties['scheduleEnabled'],
+    }
+
 
 def _write_job_to_console(job_properties):
     '''
@@ -31,15 +60,25 @@ def _write_job_to_console(job_properties):
 
     :param job_properties: a dictionary containing the job's properties
     '''
-    sys.stdout.write(
-        '#' + ' '.join(job_properties['description'].split(' ')[5:]) + '\n')
-    sys.stdout.write(
-        ('#' if not job_properties['scheduleEnabled'] else '') + job_properties['name'] + ': ')
-    sys.stdout.write(
-        ' '.join(job_properties['description'].split(' ')[0:5]) + ' ')
-    sys.stdout.write(job_properties['nodefilters']
-                     ['filter'].replace('name: ', '') + ' ')
-    sys.stdout.write(job_properties['sequence']['commands'][0]['exec'] + '\n')
+    sys.stdout.write(format_crontab_entry(_job_summary(job_properties)))
+
+
+def _jobs_query(parser_args):
+    '''
+    Build the pagination, filter and projection arguments of a job listing.
+
+    :param parser_args: dictionary containing the user input from the parser
+    :returns:           a dictionary of request parameters
+    '''
+    query = {'fields': ','.join(JobFields.ALL)}
+    for arg in ['limit', 'cursor', 'target', 'schedule', 'description']:
+        if getattr(parser_args, arg, None) is not None:
+            query[arg] = getattr(parser_args, arg)
+    if getattr(parser_args, 'enabled', False):
+        query['enabled'] = 'true'
+    elif getattr(parser_args, 'disabled', False):
+        query['enabled'] = 'false'
+    return query
 
 
 def _handle_found(response, *_):
@@ -87,13 +126,38 @@ def _handle_found_get(response, parser_args):
     return_code = ReturnCodes.OK
 
     if not parser_args.job_id:
-        if hasattr(response, 'json') and isinstance(response.json(), dict):
+        if response.headers.get('Content-Type', '').startswith(MimeTypes.CRONTAB):
+            # Rendered by the server, two lines per job
+            lines = 0
+            for chunk in response.iter_content(chunk_size=None, decode_unicode=True):
+                sys.stdout.write(chunk)
+                lines += chunk.count('\n')
+            if lines:
+                sys.stdout.write('Found ' + str(lines // 2) + ' job(s) in the project.\n')
+            else:
+                sys.stdout.write('No jobs found in the project.\n')
+        elif response.headers.get('Content-Type', '').startswith(MimeTypes.NDJSON):
+            count = 0
+            for line in response.iter_lines():
+                if line:
+                    _write_job_to_console(json_loads(line))
+                    count += 1
+            if count:
+                sys.stdout.write('Found ' + str(count) + ' job(s) in the project.\n')
+            else:
+                sys.stdout.write('No jobs found in the project.\n')
+        elif hasattr(response, 'json') and isinstance(response.json(), dict):
             sys.stdout.write(response.json()['message'] + '\n')
+        elif not response.json():
+            sys.stdout.write('No jobs found in the project.\n')
         else:
             sys.stdout.write(
                 'Found ' + str(len(response.json())) + ' job(s) in the project:\n')
             for job_properties in response.json():
                 _write_job_to_console(job_properties)
+        if response.headers.get('X-Next-Cursor'):
+            sys.stderr.write('More jobs available, show them with --cursor ' +
+                             response.headers['X-Next-Cursor'] + '\n')
 
         return return_code
 
@@ -101,6 +165,26 @@ def _handle_found_get(response, parser_args):
     return return_code
 
 
+def _handle_found_runs(response, parser_args):
+    '''
+    Handle HTTP response status code 200 (OK) of the next runs of a job
+
+    :params response:    HTTP response from server
+    :params parser_args: user-given arguments
+    :returns:            the API's return value
+    '''
+    runs = response.json()
+    if not runs['enabled']:
+        sys.stdout.write('Job ' + parser_args.job_id + ' is disabled, it does not run.\n')
+    elif not runs['runs']:
+        sys.stdout.write('Job ' + parser_args.job_id + ' does not run in the next years.\n')
+    else:
+        sys.stdout.write('Next runs of job ' + parser_args.job_id + " ('" +
+                         runs['schedule'] + "'):\n")
+        sys.stdout.write(''.join('  ' + run + '\n' for run in runs['runs']))
+    return ReturnCodes.OK
+
+
 def _handle_bad_request_post(*_):
     '''
     Handle HTTP response status code 400 (Bad Request)
@@ -216,8 +300,7 @@ def jobs_delete(parser_args):
         path = CONFIG['ACRON_SERVER_FULL_URL'] + Endpoints.JOBS_TRAILING_SLASH
         if parser_args.job_id:
             path += parser_args.job_id
-        response = requests.delete(
-            path, params=params, auth=HTTPSPNEGOAuth(), verify=CONFIG['SSL_CERTS'])
+        response = send_request('DELETE', path, params=params)
 
         http_status_code_switcher = {
             200: _handle_found_with_name,
@@ -240,33 +323,162 @@ def jobs_delete(parser_args):
     return return_code
 
 
-def jobs_get(parser_args):
+def _job_ids(parser_args):
     '''
-    Get job information request to the API.
+    Get the job identifiers given by the user, a single one for the commands other than show.
 
     :param parser_args: dictionary containing the user input from the parser
+    :returns:           the list of job identifiers, empty to list the jobs of the project
+    '''
+    job_id = getattr(parser_args, 'job_id', None)
+    if not job_id:
+        return []
+    return [job_id] if isinstance(job_id, str) else list(job_id)
+
+
+def _shared_projects():
+    '''
+    Get the projects shared with the user.
+
+    :raises AbortError: if the projects cannot be listed, after reporting why
+    :returns:           the sorted list of the names of the projects
+    '''
+    path = CONFIG['ACRON_SERVER_FULL_URL'] + Endpoints.PROJECTS_TRAILING_SLASH
+    response = send_request('GET', path, headers={'Accept': MimeTypes.JSON})
+    if response.status_code == 404:
+        return []
+    if response.status_code in [401, 403]:
+        ServerError.error_no_access()
+        raise AbortError
+    if response.status_code != 200:
+        ServerError.error_unknown(response.text)
+        raise AbortError
+    # The projects and their permissions, or a sentence when there are none
+    projects = yaml_load(response.json()['message'])
+    if not isinstance(projects, dict):
+        return []
+    return sorted(projects)
+
+
+def _send_get(parser_args, stream=False):
+    '''
+    Send the request of a job or of the jobs of a project.
+
+    :param parser_args: dictionary containing the user input, with a single job identifier
+    :param stream:      True to write a listing as the jobs arrive
+    :returns:           the HTTP response from server
+    '''
+    params = {} if 'project' not in parser_args else {
+        'project': parser_args.project}
+    path = CONFIG['ACRON_SERVER_FULL_URL'] + Endpoints.JOBS_TRAILING_SLASH
+    if parser_args.job_id and getattr(parser_args, 'next', None):
+        # The runs change with the time, they are not cached
+        params['count'] = parser_args.next
+        return send_request('GET', path + parser_args.job_id + '/next', params=params,
+                            headers={'Accept': MimeTypes.JSON})
+    if parser_args.job_id:
+        path += parser_args.job_id
+        return cached_get(path, params, getattr(parser_args, 'project', None))
+    # Listings are written as the jobs arrive, and cached once read entirely
+    params.update(_jobs_query(parser_args))
+    return cached_get(path, params, getattr(parser_args, 'project', None),
+                      headers={'Accept': LISTING_ACCEPT}, stream=stream)
+
+
+def _handle_get(response, parser_args):
+    '''
+    Handle the response to the request of a job or of the jobs of a project.
+
+    :param response:    HTTP response from server
+    :param parser_args: dictionary containing the user input, with a single job identifier
     :returns:           the API's return value
     '''
-    try:
-        params = None if 'project' not in parser_args else {
-            'project': parser_args.project}
-        path = CONFIG['ACRON_SERVER_FULL_URL'] + Endpoints.JOBS_TRAILING_SLASH
-        if parser_args.job_id:
-            path += parser_args.job_id
-        response = requests.get(
-            path, params=params, auth=HTTPSPNEGOAuth(), verify=CONFIG['SSL_CERTS'])
+    http_status_code_switcher = {
+        200: _handle_found_runs if getattr(parser_args, 'next', None) else _handle_found_get,
+        401: _handle_no_access,
+        403: _handle_no_access,
+        404: _handle_not_found,
+    }
 
-        http_status_code_switcher = {
-            200: _handle_found_get,
-            401: _handle_no_access,
-            403: _handle_no_access,
-            404: _handle_not_found,
-        }
+    handler = http_status_code_switcher.get(
+        response.status_code, _handle_invalid)
 
-        handler = http_status_code_switcher.get(
-            response.status_code, _handle_invalid)
+    return handler(response, parser_args)
 
-        return_code = handler(response, parser_args)
+
+def _jobs_get_many(parser_args, job_ids):
+    '''
+    Get several jobs, or the jobs of several projects, up to parallel requests at the same
+    time. The results are written in the order of the projects and jobs given.
+
+    :param parser_args: dictionary containing the user input from the parser
+    :param job_ids:     the job identifiers, empty to list the jobs of the projects
+    :returns:           the first return value of the API which is not OK, if any
+    '''
+    if getattr(parser_args, 'all_projects', False):
+        projects = [None] + [project for project in _shared_projects()
+                             if project != get_current_user()]
+    else:
+        projects = [getattr(parser_args, 'project', None)]
+
+    queries = []
+    for project in projects:
+        for job_id in job_ids or [None]:
+            query = copy.copy(parser_args)
+            query.project = project
+            query.job_id = job_id
+            queries.append(query)
+
+    def fetch(query):
+        try:
+            return _send_get(query), None
+        except AcronError as error:
+            return None, error
+
+    return_code = ReturnCodes.OK
+    with ThreadPoolExecutor(max_workers=max(1, getattr(parser_args, 'parallel', 4))) as pool:
+        for query, (response, error) in zip(queries, pool.map(fetch, queries)):
+            if len(projects) > 1 and not query.job_id:
+                sys.stdout.write('Project ' + (query.project or get_current_user()) + ':\n')
+            elif len(projects) > 1:
+                sys.stdout.write('Project ' + (query.project or get_current_user()) +
+                                 ', job ' + query.job_id + ':\n')
+            elif response is None or response.status_code != 200:
+                sys.stderr.write('Job ' + query.job_id + ': ')
+            if error is not None:
+                ServerError.error_unknown(str(error))
+                result = ReturnCodes.BACKEND_ERROR
+            elif response.status_code == 404 and query.project is None and not query.job_id:
+                # The personal project is initialised by the first job created
+                sys.stdout.write('No jobs found in the project.\n')
+                result = ReturnCodes.OK
+            else:
+                result = _handle_get(response, query)
+            if return_code == ReturnCodes.OK:
+                return_code = result
+    return return_code
+
+
+def jobs_get(parser_args):
+    '''
+    Get job information request to the API.
+
+    :param parser_args: dictionary containing the user input from the parser
+    :returns:           the API's return value
+    '''
+    try:
+        job_ids = _job_ids(parser_args)
+        if getattr(parser_args, 'next', None) is not None and \
+           (not job_ids or not 0 < parser_args.next <= 100):
+            sys.stderr.write('--next needs the jobs given with --job_id and a number '
+                             'of runs between 1 and 100.\n')
+            return ReturnCodes.BAD_ARGS
+        if getattr(parser_args, 'all_projects', False) or len(job_ids) > 1:
+            return _jobs_get_many(parser_args, job_ids)
+        query = copy.copy(parser_args)
+        query.job_id = job_ids[0] if job_ids else None
+        response = _send_get(query, stream=True)
+        return_code = _handle_get(response, query)
 
     except (AbortError, KeyboardInterrupt):
         sys.stderr.write('\nAbort.\n')
@@ -321,13 +533,11 @@ def jobs_post(parser_args, is_create=True):
         path = CONFIG['ACRON_SERVER_FULL_URL'] + Endpoints.JOBS_TRAILING_SLASH
 
         if is_create:
-            response = requests.post(
-                path, params=params, auth=HTTPSPNEGOAuth(), verify=CONFIG['SSL_CERTS'])
+            response = send_request('POST', path, params=params)
         else:
             path += parser_args.job_id
             params['job_id'] = parser_args.job_id
-            response = requests.put(
-                path, params=params, auth=HTTPSPNEGOAuth(), verify=CONFIG['SSL_CERTS'])
+            response = send_request('PUT', path, params=params)
 
         http_status_code_switcher = {
             200: _handle_found,
@@ -367,8 +577,7 @@ def jobs_enable_disable(enable, parser_args):
         path = CONFIG['ACRON_SERVER_FULL_URL'] + Endpoints.JOBS_TRAILING_SLASH
         if parser_args.job_id:
             path += parser_args.job_id
-        response = requests.patch(
-            path, params=params, auth=HTTPSPNEGOAuth(), verify=CONFIG['SSL_CERTS'])
+        response = send_request('PATCH', path, params=params)
 
         http_status_code_switcher = {
             200: _handle_found_with_name,
@@ -10,13 +10,12 @@
 '''Project management functions'''
 
 import sys
-import requests
-from requests_gssapi import HTTPSPNEGOAuth
 from acron.exceptions import AcronError, AbortError
-from acron.constants import Endpoints, ProjectPerms, ReturnCodes
+from acron.utils import get_current_user
+from acron.constants import Endpoints, MimeTypes, ProjectPerms, ReturnCodes
 from .config import CONFIG
 from .errors import ServerError
-from .utils import confirm
+from .utils import confirm, send_request
 
 __author__ = 'Rodrigo Bermudez Schettino (CERN)'
 __credits__ = ['Rodrigo Bermudez Schettino (CERN)']
@@ -101,6 +100,34 @@ def _handle_not_found(*_):
     return ReturnCodes.NOT_FOUND
 
 
+def _handle_bad_archive(*_):
+    '''
+    Handle HTTP response status code 400 (Bad Request) of an import
+
+    :params *_: Ignore parameters passed
+    :returns:   the API's return value
+    '''
+    sys.stderr.write('The file is not a valid project archive.\n')
+    return ReturnCodes.BAD_ARGS
+
+
+def _handle_found_export(response, parser_args):
+    '''
+    Handle HTTP response status code 200 (OK) of an export
+
+    :params response:    HTTP response from server
+    :params parser_args: user-given arguments
+    :returns:            the API's return value
+    '''
+    if parser_args.file == '-':
+        sys.stdout.buffer.write(response.content)
+        return ReturnCodes.OK
+    with open(parser_args.file, 'wb') as archive:
+        archive.write(response.content)
+    sys.stdout.write('Project exported to ' + parser_args.file + '.\n')
+    return ReturnCodes.OK
+
+
 def _handle_internal_server(*_):
     '''
     Handle HTTP response status code 500 (Internal Server Error)
@@ -149,8 +176,7 @@ def projects_get(parser_args):
             path = path.replace(
                 default_endpoint, Endpoints.PROJECTS_TRAILING_SLASH)
 
-        response = requests.get(
-            path, params=params, auth=HTTPSPNEGOAuth(), verify=CONFIG['SSL_CERTS'])
+        response = send_request('GET', path, params=params)
 
         http_status_code_switcher = {
             200: _handle_found,
@@ -187,21 +213,15 @@ def projects_share(parser_args):
             Endpoints.PROJECT_TRAILING_SLASH + 'user/' + parser_args.user_id
 
         if hasattr(parser_args, 'delete') and parser_args.delete:
-            response = requests.delete(
-                path,
-                auth=HTTPSPNEGOAuth(),
-                verify=CONFIG['SSL_CERTS'])
+            response = send_request('DELETE', path)
         else:
             acl = ProjectPerms.READ_ONLY
 
             if hasattr(parser_args, 'write') and parser_args.write:
                 acl = ProjectPerms.READ_WRITE
 
-            response = requests.put(
-                path,
-                params={'project_permissions': acl},
-                auth=HTTPSPNEGOAuth(),
-                verify=CONFIG['SSL_CERTS'])
+            response = send_request(
+                'PUT', path, params={'project_permissions': acl})
 
         http_status_code_switcher = {
             200: _handle_found,
@@ -240,10 +260,7 @@ def projects_delete(parser_args):
         path = CONFIG['ACRON_SERVER_FULL_URL'] + \
             Endpoints.PROJECT_TRAILING_SLASH
 
-        response = requests.delete(
-            path,
-            auth=HTTPSPNEGOAuth(),
-            verify=CONFIG['SSL_CERTS'])
+        response = send_request('DELETE', path)
 
         http_status_code_switcher = {
             200: _handle_found,
@@ -266,3 +283,91 @@ def projects_delete(parser_args):
         ServerError.error_unknown(str(error))
         return_code = ReturnCodes.BACKEND_ERROR
     return return_code
+
+
+def projects_export(parser_args):
+    '''
+    Export the jobs, shares and nodes of a project to a file
+
+    :param parser_args: dictionary containing the user input from the parser
+    :returns:           the API's return value
+    '''
+    try:
+        path = CONFIG['ACRON_SERVER_FULL_URL'] + \
+            Endpoints.PROJECT_TRAILING_SLASH + 'export'
+        params = {'project': parser_args.project} if parser_args.project else None
+        if parser_args.file is None:
+            parser_args.file = 'acron-' + (parser_args.project or get_current_user()) + '.json.gz'
+
+        response = send_request('GET', path, params=params,
+                                headers={'Accept': MimeTypes.GZIP})
+
+        http_status_code_switcher = {
+            200: _handle_found_export,
+            401: _handle_no_access,
+            403: _handle_no_access,
+            404: _handle_not_found_project,
+            500: _handle_internal_server,
+        }
+
+        handler = http_status_code_switcher.get(
+            response.status_code, _handle_invalid)
+
+        return_code = handler(response, parser_args)
+
+    except (AbortError, KeyboardInterrupt):
+        sys.stderr.write('\nAbort.\n')
+        return_code = ReturnCodes.ABORT
+    except OSError as error:
+        sys.stderr.write(f'Cannot write {parser_args.file}: {error.strerror}\n')
+        return_code = ReturnCodes.USER_ERROR
+    except AcronError as error:
+        ServerError.error_unknown(str(error))
+        return_code = ReturnCodes.BACKEND_ERROR
+    return return_code
+
+
+def projects_import(parser_args):
+    '''
+    Restore the jobs, shares and nodes of an exported project, in a single request
+
+    :param parser_args: dictionary containing the user input from the parser
+    :returns:           the API's return value
+    '''
+    try:
+        if parser_args.file == '-':
+            data = sys.stdin.buffer.read()
+        else:
+            with open(parser_args.file, 'rb') as archive:
+                data = archive.read()
+        path = CONFIG['ACRON_SERVER_FULL_URL'] + \
+            Endpoints.PROJECT_TRAILING_SLASH + 'import'
+        params = {'project': parser_args.project} if parser_args.project else None
+
+        response = send_request('POST', path, params=params, data=data,
+                                headers={'Content-Type': MimeTypes.GZIP})
+
+        http_status_code_switcher = {
+            200: _handle_found,
+            400: _handle_bad_archive,
+            401: _handle_no_access,
+            403: _handle_no_access,
+            404: _handle_not_found_project,
+            500: _handle_internal_server,
+        }
+
+        handler = http_status_code_switcher.get(
+            response.status_code, _handle_invalid)
+
+        return_code = handler(response, parser_args)
+
+    except (AbortError, KeyboardInterrupt):
+        sys.stderr.write('\nAbort.\n')
+        return_code = ReturnCodes.ABORT
+    except OSError as error:
+        sys.stderr.write(f'Cannot read {parser_args.file}: {error.strerror}\n')
+        return_code = ReturnCodes.USER_ERROR
+    except AcronError as error:
+        ServerError.error_unknown(str(error))
+        return_code = ReturnCodes.BACKEND_ERROR
+    return return_code
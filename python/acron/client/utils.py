@@ -17,7 +17,29 @@ __email__ = 'rodrigo.bermudez.schettino@cern.ch'
 __status__ = 'Development'
 
 
+import os
+import random
 import sys
+import threading
+import time
+from tempfile import NamedTemporaryFile
+import requests
+from requests_gssapi import HTTPSPNEGOAuth
+from acron.serialization import json_dumps, json_loads
+from .config import CONFIG
+
+# HTTP status codes sent by the server when it asks the client to come back later
+RETRY_STATUS_CODES = [429, 503]
+
+# HTTP status codes sent by the server when the login session is not valid (any more)
+UNAUTHORIZED_STATUS_CODES = [401, 403]
+# Seconds before the expiry of a login session from which it is checked again
+LOGIN_EXPIRY_MARGIN = 60
+
+# HTTP sessions of the client, one per thread, see get_session
+_SESSIONS = threading.local()
+# Cookies set by the server, shared by the sessions of all the threads
+_COOKIES = requests.cookies.RequestsCookieJar()
 
 
 def confirm(question):
@@ -44,3 +66,200 @@ def confirm(question):
                 f"Please respond with '{yes_long}' or '{no_long}' " +
                 f"(or '{yes_short}' or '{no_short}').\n")
         return valid[choice]
+
+
+def _retry_delay(response, attempt):
+    '''
+    Compute how long to wait before retrying a request the server turned down.
+
+    :param response: HTTP response from server
+    :param attempt:  number of the attempt that failed, starting at 0
+    :returns:        seconds to wait, at least the Retry-After header if any, with jitter,
+                     None if the server asks to wait longer than RETRY_MAX_WAIT
+    '''
+    max_wait = CONFIG.get('RETRY_MAX_WAIT', 30)
+    try:
+        delay = float(response.headers['Retry-After'])
+    except (KeyError, ValueError):
+        delay = min(max_wait, CONFIG.get('RETRY_BASE_WAIT', 1) * 2 ** attempt)
+    if delay > max_wait:
+        # Retrying earlier than asked would only be turned down again
+        return None
+    # Full jitter on top of the requested delay spreads out clients turned down together
+    return min(max_wait, delay + random.uniform(0, delay))
+
+
+def cache_dir():
+    '''
+    :returns: the directory of the acron cache of the user
+    '''
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'acron')
+
+
+class LoginCache:
+    '''
+    Expiry of the login sessions of the user, as issued by the servers, by principal and
+    server. While a session is known to be valid, commands do not check it on the server.
+    '''
+
+    def __init__(self, path=None):
+        '''
+        Constructor
+
+        :param path: the file of the cache, only readable by the user
+        '''
+        self.path = path or os.path.join(cache_dir(), 'sessions.json')
+        # Principal and server of the session of this invocation
+        self.key = None
+        # Incremented when the session of this invocation is renewed
+        self.generation = 0
+        # False when nobody answers the login prompt, e.g. for a command run in the background
+        self.interactive = True
+
+    def _load(self):
+        '''
+        :returns: the expiry of the sessions by key, empty if the cache is missing or corrupted
+        '''
+        try:
+            with open(self.path, 'rb') as cache:
+                return json_loads(cache.read())
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, entries):
+        '''
+        Replace atomically the cache. Failing to write it is not an error.
+
+        :param entries: the expiry of the sessions by key
+        '''
+        try:
+            os.makedirs(os.path.dirname(self.path), 0o0700, exist_ok=True)
+            with NamedTemporaryFile('wb', dir=os.path.dirname(self.path), delete=False) as tmp:
+                tmp.write(json_dumps(entries))
+            os.replace(tmp.name, self.path)
+        except OSError:
+            pass
+
+    def is_valid(self, principal, server):
+        '''
+        :param principal: the Kerberos principal of the user
+        :param server:    URL of the server
+        :returns:         True if the session of the user on the server is known to be valid
+        '''
+        self.key = principal + ' ' + server
+        return self._load().get(self.key, 0) - time.time() > LOGIN_EXPIRY_MARGIN
+
+    def put(self, principal, server, expires_at):
+        '''
+        Remember until when the session of the user on the server is valid.
+
+        :param principal:  the Kerberos principal of the user
+        :param server:     URL of the server
+        :param expires_at: expiry of the session issued by the server, epoch seconds
+        '''
+        self.key = principal + ' ' + server
+        entries = {key: expiry for key, expiry in self._load().items() if expiry > time.time()}
+        entries[self.key] = expires_at
+        self._save(entries)
+        self.generation += 1
+
+    def invalidate(self):
+        '''
+        Forget the session of this invocation, the server turned it down.
+
+        :returns: True if the session was cached
+        '''
+        entries = self._load()
+        if self.key not in entries:
+            return False
+        del entries[self.key]
+        self._save(entries)
+        return True
+
+
+# Login sessions of the user
+LOGIN_CACHE = LoginCache()
+# Held while logging in again, requests of several threads may be turned down together
+_LOGIN_LOCK = threading.RLock()
+
+
+def _renew_login(status_code, generation):
+    '''
+    Forget the cached login session once the server turned a request down, and log in again
+    if the request was not authenticated. Requests are only checked again if the session
+    was cached, so a session turned down just after being checked is not renewed in a loop.
+
+    :param status_code: HTTP status code of the response
+    :param generation:  generation of the login session the request was sent with
+    :returns:           True if the request can be sent again
+    '''
+    with _LOGIN_LOCK:
+        if LOGIN_CACHE.generation != generation:
+            # Renewed by another thread meanwhile
+            return True
+        if not LOGIN_CACHE.invalidate() or status_code != 401:
+            return False
+        from .auth import login  # pylint: disable=import-outside-toplevel,cyclic-import
+        login()
+        return True
+
+
+def get_session():
+    '''
+    Get the HTTP session of the current thread, created on first use. All the requests of an
+    invocation reuse its TLS connection to the server and its Kerberos authentication, which
+    sends the token with the first request instead of waiting to be challenged.
+    Threads get their own session, the Kerberos context of a session is not thread-safe.
+
+    :returns: a requests.Session
+    '''
+    session = getattr(_SESSIONS, 'session', None)
+    if session is None:
+        session = requests.Session()
+        try:
+            session.auth = HTTPSPNEGOAuth(opportunistic_auth=True)
+        except TypeError:
+            # requests_gssapi < 1.2 only authenticates when challenged by the server
+            session.auth = HTTPSPNEGOAuth()
+        session.verify = CONFIG['SSL_CERTS']
+        session.cookies = _COOKIES
+        _SESSIONS.session = session
+    return session
+
+
+def send_request(method, path, **kwargs):
+    '''
+    Send an authenticated request to the server. Requests turned down with 429 or 503 are
+    retried after the delay requested by the server, up to RETRY_MAX_ATTEMPTS times, unless
+    the server asks to wait longer than RETRY_MAX_WAIT.
+    Requests turned down with 401 while the login session was cached are sent again once
+    logged in again.
+
+    :param method: HTTP method
+    :param path:   full URL of the endpoint
+    :param kwargs: further arguments of requests.Session.request, e.g. params or files
+    :returns:      the last HTTP response from server
+    '''
+    max_attempts = CONFIG.get('RETRY_MAX_ATTEMPTS', 3)
+    attempt = 0
+    renewed = False
+    while True:
+        generation = LOGIN_CACHE.generation
+        response = get_session().request(method, path, **kwargs)
+        if response.status_code in UNAUTHORIZED_STATUS_CODES and not renewed:
+            renewed = True
+            if _renew_login(response.status_code, generation):
+                response.close()
+                continue
+        if response.status_code not in RETRY_STATUS_CODES or attempt + 1 >= max_attempts:
+            return response
+        delay = _retry_delay(response, attempt)
+        if delay is None:
+            return response
+        # Gives the connection back to the session before waiting
+        response.close()
+        sys.stderr.write(
+            f'The server is busy, retrying in {delay:.1f} seconds...\n')
+        time.sleep(delay)
+        attempt += 1
@@ -49,6 +49,9 @@ class ReturnCodes:
     ABORT = 8
     CREDS_INVALID = 9
     SSH_ERROR = 10
+    RATE_LIMITED = 11
+    BACKEND_BUSY = 12
+    REVISION_EXPIRED = 13
 
 
 # pylint: disable=too-few-public-methods
@@ -78,3 +81,27 @@ class ProjectPerms:
     READ_WRITE = 'rw'
     ALL = [READ_ONLY, READ_WRITE]
     NAME_MAP = {READ_ONLY: 'read-only', READ_WRITE: 'read and write'}
+
+
+class JobFields:
+    '''
+    Constants for the fields of the job summaries
+    '''
+    NAME = 'name'
+    SCHEDULE = 'schedule'
+    TARGET = 'target'
+    COMMAND = 'command'
+    DESCRIPTION = 'description'
+    ENABLED = 'enabled'
+    ALL = [NAME, SCHEDULE, TARGET, COMMAND, DESCRIPTION, ENABLED]
+
+
+class MimeTypes:
+    '''
+    Constants for the media types exchanged with the server
+    '''
+    JSON = 'application/json'
+    NDJSON = 'application/x-ndjson'
+    MSGPACK = 'application/msgpack'
+    CRONTAB = 'text/x-crontab'
+    GZIP = 'application/gzip'
@@ -0,0 +1,261 @@
+#
+# (C) Copyright 2022 CERN
+#
+# This software is distributed under the terms of the GNU General Public Licence version 3
+# (GPL Version 3), copied verbatim in the file "COPYING" /copied verbatim below.
+#
+# In applying this licence, CERN does not waive the privileges and immunities granted to it
+# by virtue of its status as an Intergovernmental Organization or submit itself to any jurisdiction.
+#
+'''Schedules of the jobs, compiled into bit masks to validate them and compute their runs'''
+
+import functools
+import re
+from calendar import monthrange
+from datetime import date, datetime, timedelta
+
+__author__ = 'Rodrigo Bermudez Schettino (CERN)'
+__credits__ = ['Rodrigo Bermudez Schettino (CERN)', 'Ulrich Schwickerath (CERN)']
+__maintainer__ = 'Rodrigo Bermudez Schettino (CERN)'
+__email__ = 'rodrigo.bermudez.schettino@cern.ch'
+__status__ = 'Development'
+
+
+MONTHS = ['JAN', 'FEB', 'MAR', 'APR', 'MAY', 'JUN',
+          'JUL', 'AUG', 'SEP', 'OCT', 'NOV', 'DEC']
+# Numbered like Quartz, the scheduler of Rundeck: 1 = Sunday
+WEEKDAYS = ['SUN', 'MON', 'TUE', 'WED', 'THU', 'FRI', 'SAT']
+
+# Names of the fields, lowest and highest values and names of the values
+FIELDS = [
+    ('minute', 0, 59, {}),
+    ('hour', 0, 23, {}),
+    ('day of month', 1, 31, {}),
+    # MAI was accepted by the former validation of the schedules
+    ('month', 1, 12, dict({name: index for index, name in enumerate(MONTHS, 1)}, MAI=5)),
+    ('day of week', 1, 7, {name: index for index, name in enumerate(WEEKDAYS, 1)}),
+]
+# Months searched for the next run, enough for the 29th of February on a given weekday
+SEARCH_MONTHS = 12 * 29
+
+NEAREST_WEEKDAY = re.compile(r'^(\d{1,2})W$')
+NTH_WEEKDAY = re.compile(r'^([1-7])#([1-5])$')
+LAST_WEEKDAY = re.compile(r'^([1-7])L$')
+
+
+def _bits(mask, start=0):
+    '''
+    :param mask:  a bit mask
+    :param start: lowest position returned
+    :returns:     a generator of the positions of the bits set, in increasing order
+    '''
+    mask >>= start
+    while mask:
+        lowest = (mask & -mask).bit_length()
+        start += lowest - 1
+        yield start
+        mask >>= lowest
+        start += 1
+
+
+def _nearest_weekday(year, month, day, last):
+    '''
+    :returns: the weekday of the month closest to the given day, as in Quartz's W
+    '''
+    weekday = date(year, month, day).weekday()
+    if weekday == 5:
+        return day - 1 if day > 1 else day + 2
+    if weekday == 6:
+        return day + 1 if day < last else day - 2
+    return day
+
+
+def _parse_value(text, field):
+    '''
+    :param text:        a number or the name of a value
+    :param field:       the field, from FIELDS
+    :raises ValueError: if it is not a value of the field
+    :returns:           the value
+    '''
+    name, low, high, names = field
+    if text.upper() in names:
+        return names[text.upper()]
+    if not text.isdigit() or len(text) > 2 or not low <= int(text) <= high:
+        raise ValueError('invalid %s %s' % (name, text))
+    return int(text)
+
+
+def _parse_field(text, field):
+    '''
+    Compile a comma separated list of values, ranges and increments.
+
+    :param text:        the field of the schedule
+    :param field:       the field, from FIELDS
+    :raises ValueError: if it has an invalid syntax or value
+    :returns:           the bit mask of the values
+    '''
+    name, low, high, _ = field
+    mask = 0
+    for item in text.split(','):
+        base, slash, step = item.partition('/')
+        if slash and (not step.isdigit() or len(step) > 2 or int(step) == 0):
+            raise ValueError('invalid %s increment %s' % (name, item))
+        step = int(step) if slash else 1
+        if base == '*':
+            start, end = low, high
+        else:
+            first, dash, last = base.partition('-')
+            start = _parse_value(first, field)
+            end = _parse_value(last, field) if dash else high if slash else start
+        # Ranges like 22-2 wrap around, as in Quartz
+        for offset in range(0, (end - start) % (high - low + 1) + 1, step):
+            mask |= 1 << (low + (start - low + offset) % (high - low + 1))
+    return mask
+
+
+class CronSchedule:
+    '''
+    A schedule of the crontab format, with the days of the week and the special characters
+    of Quartz: ? for no restriction, L, LW and nW in the days of the month, L, nL and n#k in
+    the days of the week. The days of the month and of the week cannot both be restricted,
+    since Quartz cannot run a job on both.
+    '''
+
+    __slots__ = ('fields', 'minutes', 'hours', 'days', 'months', 'weekdays', 'last_day',
+                 'last_weekday', 'nearest_weekdays', 'nth_weekdays', 'last_weekdays',
+                 'restricted_days', 'restricted_weekdays')
+
+    def __init__(self, schedule):
+        '''
+        :param schedule:    the schedule, five fields separated by single spaces
+        :raises ValueError: if the schedule is invalid
+        '''
+        self.fields = schedule.split(' ')
+        if len(self.fields) != 5:
+            raise ValueError('a schedule has 5 fields')
+        minute, hour, day, month, weekday = self.fields
+        self.minutes = _parse_field(minute, FIELDS[0])
+        self.hours = _parse_field(hour, FIELDS[1])
+        self.months = _parse_field(month, FIELDS[3])
+        self.last_day = self.last_weekday = False
+        self.days = self.nearest_weekdays = self.weekdays = self.last_weekdays = 0
+        self.nth_weekdays = ()
+        self.restricted_days = day not in ('*', '?')
+        self.restricted_weekdays = weekday not in ('*', '?')
+        if self.restricted_days and self.restricted_weekdays:
+            raise ValueError('the day of month and the day of week cannot both be '
+                             'restricted, set one of them to ?')
+        if day.upper() == 'L':
+            self.last_day = True
+        elif day.upper() == 'LW':
+            self.last_weekday = True
+        elif NEAREST_WEEKDAY.match(day.upper()):
+            self.nearest_weekdays = 1 << _parse_value(day[:-1], FIELDS[2])
+        elif self.restricted_days:
+            self.days = _parse_field(day, FIELDS[2])
+        if weekday.upper() == 'L':
+            # Alone, L is the last day of the week
+            self.weekdays = 1 << 7
+        elif NTH_WEEKDAY.match(weekday):
+            self.nth_weekdays = (tuple(int(value) for value in weekday.split('#')),)
+        elif LAST_WEEKDAY.match(weekday.upper()):
+            self.last_weekdays = 1 << int(weekday[0])
+        elif self.restricted_weekdays:
+            self.weekdays = _parse_field(weekday, FIELDS[4])
+
+    def days_of_month(self, year, month):
+        '''
+        :param year:  the year
+        :param month: the month, 1 to 12
+        :returns:     the bit mask of the days of the month the schedule runs on
+        '''
+        last = monthrange(year, month)[1]
+        month_days = (1 << last + 1) - 2
+        if self.restricted_days:
+            mask = self.days
+            if self.last_day:
+                mask |= 1 << last
+            if self.last_weekday:
+                mask |= 1 << _nearest_weekday(year, month, last, last)
+            for day in _bits(self.nearest_weekdays):
+                if day <= last:
+                    mask |= 1 << _nearest_weekday(year, month, day, last)
+            return mask & month_days
+        if self.restricted_weekdays:
+            # Day of the week of the 1st of the month, numbered from 0 = Sunday
+            first = (date(year, month, 1).weekday() + 1) % 7
+            mask = 0
+            for day in range(1, last + 1):
+                if self.weekdays >> (first + day - 1) % 7 + 1 & 1:
+                    mask |= 1 << day
+            for weekday, nth in self.nth_weekdays:
+                day = 1 + (weekday - 1 - first) % 7 + 7 * (nth - 1)
+                if day <= last:
+                    mask |= 1 << day
+            for weekday in _bits(self.last_weekdays):
+                mask |= 1 << last - (first + last - 1 - (weekday - 1)) % 7
+            return mask
+        return month_days
+
+    def iter_runs(self, after, seconds=0):
+        '''
+        :param after:   the time to start from, not included
+        :param seconds: the second of the minute the job runs at
+        :returns:       a generator of the times of the next runs, in the time zone of after
+        '''
+        start = after.replace(second=seconds, microsecond=0)
+        if start <= after:
+            start += timedelta(minutes=1)
+        year, month = start.year, start.month
+        floor = (start.day, start.hour, start.minute)
+        for _ in range(SEARCH_MONTHS):
+            if self.months >> month & 1:
+                for day in _bits(self.days_of_month(year, month), floor[0]):
+                    for hour in _bits(self.hours, floor[1] if day == floor[0] else 0):
+                        lowest = floor[2] if (day, hour) == floor[:2] else 0
+                        for minute in _bits(self.minutes, lowest):
+                            yield datetime(year, month, day, hour, minute, seconds,
+                                           tzinfo=after.tzinfo)
+            floor = (1, 0, 0)
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+    def next_runs(self, after, count, seconds=0):
+        '''
+        :param after:   the time to start from, not included
+        :param count:   the number of runs
+        :param seconds: the second of the minute the job runs at
+        :returns:       the list of the times of the next runs, shorter if the schedule
+                        does not run that often in the next years
+        '''
+        runs = []
+        for run in self.iter_runs(after, seconds):
+            runs.append(run)
+            if len(runs) >= count:
+                break
+        return runs
+
+    def to_quartz(self, seconds):
+        '''
+        :param seconds: the second of the minute the job runs at
+        :returns:       the schedule in the format of Quartz, where exactly one of the day
+                        of month and the day of week is ?
+        '''
+        minute, hour, day, month, weekday = self.fields
+        if not self.restricted_weekdays:
+            day, weekday = ('*' if day == '?' else day), '?'
+        elif not self.restricted_days:
+            day = '?'
+        month = re.sub('MAI', 'MAY', month, flags=re.IGNORECASE)
+        return ' '.join([str(seconds), minute, hour, day, month, weekday, '*'])
+
+
+@functools.lru_cache(maxsize=1024)
+def parse_schedule(schedule):
+    '''
+    Compile a schedule once, the schedules of whole acrontabs and projects are checked.
+
+    :param schedule:    the schedule, in crontab format
+    :raises ValueError: if the schedule is invalid
+    :returns:           the CronSchedule
+    '''
+    return CronSchedule(schedule)
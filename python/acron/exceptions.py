@@ -155,6 +155,12 @@ class NoAccessError(SchedulerError):
     '''
 
 
+class LockTimeoutError(SchedulerError):
+    '''
+    The project is being modified by another request and could not be locked in time.
+    '''
+
+
 class CrontabError(SchedulerError):
     '''
     The Crontab scheduler backend failed to perform the requested task.
@@ -171,3 +177,33 @@ class RundeckError(SchedulerError):
     '''
     The Rundeck scheduler backend failed to perform the requested task.
     '''
+
+
+class ExecutorError(AcronError):
+    '''
+    An external command could not be run to completion by the executor.
+    '''
+
+
+class ExecutorBusyError(ExecutorError):
+    '''
+    No worker was freed in time to run the command.
+    '''
+
+
+class CommandTimeoutError(ExecutorError):
+    '''
+    The command did not complete before its deadline and was killed.
+    '''
+
+
+class JournalError(AcronError):
+    '''
+    The job journal of a project could not be read.
+    '''
+
+
+class RevisionExpiredError(JournalError):
+    '''
+    The changes after the requested revision are no longer in the job journal.
+    '''
@@ -20,11 +20,11 @@ from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 import smtplib
 import logging
-import yaml
+from acron.serialization import yaml_load
 
 
 with open('/etc/acron/server.config', 'r') as config_file:
-    CONFIG = yaml.safe_load(config_file)
+    CONFIG = yaml_load(config_file)
 
 
 def email_user(username, subject, body):
@@ -0,0 +1,83 @@
+#
+# (C) Copyright 2022 CERN
+#
+# This software is distributed under the terms of the GNU General Public Licence version 3
+# (GPL Version 3), copied verbatim in the file "COPYING" /copied verbatim below.
+#
+# In applying this licence, CERN does not waive the privileges and immunities granted to it
+# by virtue of its status as an Intergovernmental Organization or submit itself to any jurisdiction.
+#
+'''YAML and JSON serialization, using the fastest implementation available'''
+
+import json
+import yaml
+try:
+    from yaml import CSafeDumper as SafeDumper, CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeDumper, SafeLoader
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+__author__ = 'Rodrigo Bermudez Schettino (CERN)'
+__credits__ = ['Rodrigo Bermudez Schettino (CERN)', 'Ulrich Schwickerath (CERN)']
+__maintainer__ = 'Rodrigo Bermudez Schettino (CERN)'
+__email__ = 'rodrigo.bermudez.schettino@cern.ch'
+__status__ = 'Development'
+
+
+# True if YAML is parsed and emitted by libyaml
+LIBYAML = SafeLoader.__module__ != 'yaml.loader'
+
+
+def yaml_load(stream):
+    '''
+    Parse a YAML document, restricted to the standard YAML tags like yaml.safe_load.
+
+    :param stream: a string, bytes or an open file
+    :returns:      the Python object of the document
+    '''
+    return yaml.load(stream, Loader=SafeLoader)
+
+
+def yaml_dump(data, stream=None, **kwargs):
+    '''
+    Emit a YAML document, restricted to the standard YAML tags like yaml.safe_dump.
+
+    :param data:   the Python object to serialize
+    :param stream: an open file to write to, optional
+    :param kwargs: further arguments of yaml.dump
+    :returns:      the document if no stream is given
+    '''
+    return yaml.dump(data, stream, Dumper=SafeDumper, **kwargs)
+
+
+def json_dumps(data, sort_keys=False):
+    '''
+    Serialize to compact JSON, encoded as UTF-8. Objects JSON does not know, like dates
+    parsed from YAML, are serialized as strings.
+
+    :param data:      the Python object to serialize
+    :param sort_keys: True to sort the keys of the objects, e.g. for stable ETags
+    :returns:         the JSON document, as bytes
+    '''
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(data, default=str, option=option)
+    return json.dumps(data, default=str, sort_keys=sort_keys, ensure_ascii=False,
+                      separators=(',', ':')).encode('utf-8')
+
+
+def json_loads(data):
+    '''
+    Parse a JSON document.
+
+    :param data: the document, as string or bytes
+    :returns:    the Python object of the document
+    '''
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
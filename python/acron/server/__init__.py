@@ -14,10 +14,16 @@ from time import time
 from flask import Flask, current_app
 import flask_login
 import pkg_resources
-import yaml
 from acron.exceptions import AcronError
+from acron.serialization import yaml_load
 from acron.server.api.session import User
 from acron.server.auth import UserAuth
+from acron.server.executor import EXECUTOR
+from acron.server.http import use_fast_json
+from acron.server.journal import JOURNAL
+from acron.server.locks import PROJECT_LOCKS
+from acron.server.ratelimit import THROTTLE
+from acron.server.status import STATUS_PROBER
 from acron.constants import Endpoints
 from .config import Config
 
@@ -39,15 +45,15 @@ def scheduler_config(app):
     '''
     if app.config['SCHEDULER']['TYPE'] == 'Crontab':
         with open(app.config['SCHEDULER']['CONFIG'] + 'crontab.config', 'r') as config:
-            cfg = yaml.safe_load(config)
+            cfg = yaml_load(config)
             app.config['SCHEDULER'].update(cfg)
     elif app.config['SCHEDULER']['TYPE'] == 'Nomad':
         with open(app.confi['SCHEDULER']['CONFIG'] + 'nomad.config', 'r') as config:
-            cfg = yaml.safe_load(config)
+            cfg = yaml_load(config)
             app.config['SCHEDULER'].update(cfg)
     elif app.config['SCHEDULER']['TYPE'] == 'Rundeck':
         with open(app.config['SCHEDULER']['CONFIG'] + 'rundeck.config', 'r') as config:
-            cfg = yaml.safe_load(config)
+            cfg = yaml_load(config)
             app.config['SCHEDULER'].update(cfg)
     else:
         logging.error(
@@ -66,11 +72,11 @@ def creds_config(app):
     cfg = {}
     if app.config['CREDS']['TYPE'] == 'File':
         with open(app.config['CREDS']['CONFIG'] + 'file.config', 'r') as config:
-            cfg = yaml.safe_load(config)
+            cfg = yaml_load(config)
             app.config['CREDS'].update(cfg)
     elif app.config['CREDS']['TYPE'] == 'Vault':
         with open(app.config['CREDS']['CONFIG'] + 'vault.config', 'r') as config:
-            cfg = yaml.safe_load(config)
+            cfg = yaml_load(config)
             app.config['CREDS'].update(cfg)
     else:
         logging.error(
@@ -225,7 +231,7 @@ def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
     with open(config_class.CONFIG_FILE, 'r') as config:
-        app.config.update(yaml.safe_load(config))
+        app.config.update(yaml_load(config))
 
     logging.basicConfig(filename=app.config['LOG_FILE'],
                         level=app.config['LOG_LEVEL'],
@@ -241,9 +247,15 @@ def create_app(config_class=Config):
     app.user_is_authenticated = {}
     app.user_auth = UserAuth(app.config)
 
+    use_fast_json(app)
     LOGIN_MANAGER.init_app(app)
+    THROTTLE.init_app(app)
 
+    EXECUTOR.configure(app.config.get('EXECUTOR', {}))
     scheduler_config(app)
+    PROJECT_LOCKS.configure(app.config['SCHEDULER'])
+    JOURNAL.configure(app.config['SCHEDULER'])
+    STATUS_PROBER.init_app(app)
     creds_config(app)
     register_blueprint(app)
 
@@ -276,4 +288,5 @@ def request_loader(login_request):
 @LOGIN_MANAGER.unauthorized_handler
 def unauthorized_handler():
     ''' flask-login method unauthorised '''
-    return 'Unauthorized\n'
+    # A proper status lets the clients tell an expired session from a successful request
+    return 'Unauthorized\n', 401
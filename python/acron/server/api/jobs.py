@@ -9,17 +9,22 @@
 #
 '''Job management submodule'''
 
+import itertools
 import logging
-from flask import Blueprint, current_app, jsonify, request
+from flask import Blueprint, current_app, request
 from flask_login import login_required
 from acron.utils import (check_schedule, check_target,
                          check_command, check_description, check_job_id)
-from acron.server.http import http_response
+from acron.server.http import (conditional_response, http_response, negotiate,
+                               negotiated_response, not_modified_response,
+                               streamed_response, version_etag)
 from acron.exceptions import (NoAccessError, NotFoundError, NotShareableError,
-                              ProjectNotFoundError, SchedulerError, ArgsMalformedError)
+                              ProjectNotFoundError, RevisionExpiredError, SchedulerError,
+                              ArgsMalformedError)
+from acron.server.journal import JOURNAL
 from acron.server.utils import (
-    default_log_line_request, dump_args)
-from acron.constants import Endpoints, ReturnCodes
+    default_log_line_request, dump_args, fqdnify)
+from acron.constants import Endpoints, JobFields, MimeTypes, ReturnCodes
 from .utils import setup_scheduler
 
 __author__ = 'Philippe Ganz (CERN)'
@@ -33,6 +38,12 @@ __status__ = 'Development'
 # Blueprint storing all routes and function calls
 BP_JOBS = Blueprint('jobs', __name__)
 
+# Arguments of GET /jobs selecting a subset of the jobs
+JOBS_QUERY_ARGS = ['limit', 'cursor', 'target', 'enabled', 'schedule', 'description', 'fields']
+# Number of runs of a job previewed by default and at most
+DEFAULT_JOB_RUNS = 5
+MAX_JOB_RUNS = 100
+
 
 # pylint: disable=too-many-arguments
 @dump_args
@@ -74,7 +85,7 @@ def create_job(job_id=None, scheduler=None, schedule=None, target=None, command=
     except ArgsMalformedError as error:
         logging.error('%s on /jobs/: %s', default_log_line_request(), error)
         return http_response(ReturnCodes.BAD_ARGS)
-    return jsonify(response)
+    return negotiated_response(response)
 
 
 @dump_args
@@ -94,26 +105,170 @@ def modify_all_jobs_meta(scheduler, meta):
     except SchedulerError as error:
         logging.error('%s on /jobs/: %s', default_log_line_request(), error)
         return http_response(ReturnCodes.BACKEND_ERROR)
-    return jsonify(response)
+    return negotiated_response(response)
+
+
+def _parse_jobs_query(args):
+    '''
+    Validate the pagination, filter and projection arguments of a job listing.
+
+    :param args:                the arguments of the request
+    :raises ArgsMalformedError: if an argument has a wrong value
+    :returns:                   a dictionary with the given arguments, converted
+    '''
+    query = {key: args.get(key) for key in JOBS_QUERY_ARGS if key in args}
+    if 'limit' in query:
+        try:
+            query['limit'] = int(query['limit'])
+        except ValueError as error:
+            raise ArgsMalformedError('limit must be an integer') from error
+        if not 0 < query['limit'] <= current_app.config.get('JOBS_MAX_LIMIT', 1000):
+            raise ArgsMalformedError('limit out of range')
+    if 'enabled' in query:
+        if query['enabled'].lower() not in ['true', 'false']:
+            raise ArgsMalformedError('enabled must be true or false')
+        query['enabled'] = query['enabled'].lower() == 'true'
+    if 'target' in query:
+        query['target'] = fqdnify(query['target'])
+    if 'fields' in query:
+        query['fields'] = query['fields'].split(',')
+        if not set(query['fields']).issubset(JobFields.ALL):
+            raise ArgsMalformedError('fields must be among ' + ','.join(JobFields.ALL))
+    return query
+
+
+def _filter_jobs(scheduler, jobs, query):
+    '''
+    Filter a list of jobs, in the order of the backend.
+
+    :param scheduler: the scheduler backend
+    :param jobs:      iterable of the job definitions of the backend
+    :param query:     the arguments returned by _parse_jobs_query
+    :returns:         an iterator over the tuples of summary and definition of the jobs
+                      matching the query
+    '''
+    for job in jobs:
+        summary = scheduler.summarize_job(job)
+        if 'cursor' in query and summary['name'] <= query['cursor']:
+            continue
+        if 'target' in query and summary['target'] != query['target']:
+            continue
+        if 'enabled' in query and summary['enabled'] != query['enabled']:
+            continue
+        if 'schedule' in query and query['schedule'] not in summary['schedule']:
+            continue
+        if ('description' in query and
+                query['description'].lower() not in summary['description'].lower()):
+            continue
+        yield summary, job
+
+
+def _project_jobs(selected, query):
+    '''
+    :param selected: iterable of the tuples of summary and definition of the jobs
+    :param query:    the arguments returned by _parse_jobs_query
+    :returns:        an iterator over the requested fields of the jobs, or their definitions
+    '''
+    for summary, job in selected:
+        if 'fields' in query:
+            yield {field: summary[field] for field in query['fields']}
+        else:
+            yield job
+
+
+def _select_jobs(scheduler, jobs, query):
+    '''
+    Filter, sort, paginate and project a list of jobs.
+    Jobs are sorted by name, the cursor is the name of the last job of the previous page.
+
+    :param scheduler: the scheduler backend
+    :param jobs:      iterable of the job definitions of the backend
+    :param query:     the arguments returned by _parse_jobs_query
+    :returns:         tuple of the selected jobs and the cursor of the next page, if any
+    '''
+    selected = sorted(_filter_jobs(scheduler, jobs, query), key=lambda pair: pair[0]['name'])
+
+    next_cursor = None
+    if 'limit' in query and len(selected) > query['limit']:
+        selected = selected[:query['limit']]
+        next_cursor = selected[-1][0]['name']
+
+    return list(_project_jobs(selected, query)), next_cursor
+
+
+def _stream_jobs(scheduler, query):
+    '''
+    Select the jobs of the project as they are read from the backend. Pages are sorted by
+    name, so they cannot be streamed before all the jobs are read.
+
+    :param scheduler: the scheduler backend
+    :param query:     the arguments returned by _parse_jobs_query
+    :returns:         tuple of an iterator over the selected jobs, already started so that
+                      the backend errors are raised, and the cursor of the next page, if any
+    '''
+    if 'limit' in query:
+        return _select_jobs(scheduler, scheduler.iter_jobs(), query)
+    rows = _project_jobs(_filter_jobs(scheduler, scheduler.iter_jobs(), query), query)
+    first = next(rows, None)
+    if first is None:
+        return iter([]), None
+    return itertools.chain([first], rows), None
 
 
 @dump_args
-def get_all_jobs(scheduler):
+def get_all_jobs(scheduler, args):
     '''
     Requests from the backend a list of all jobs from the current project.
+    Without query arguments the list is returned as given by the backend, for
+    compatibility. Otherwise, a list of the jobs matching the query is returned, with
+    the cursor of the next page in the X-Next-Cursor header.
+    Clients accepting NDJSON, or crontab entries, get the jobs streamed one per line as they
+    are read from the backend, and an empty body if there are none. Their ETag is computed
+    from the revision of the jobs of the project, so a client having the same list already
+    gets a 304 without the backend being called.
 
     :param scheduler: the scheduler backend
-    :returns:         an HTTP payload
+    :param args:      the arguments of the request
+    :returns:         an HTTP payload, 304 if the client has the same list already
     '''
+    mimetype = negotiate(crontab=True, ndjson=True)
+    stream = mimetype in [MimeTypes.NDJSON, MimeTypes.CRONTAB]
+    etag = None
+    if stream:
+        revision = scheduler.get_jobs_revision()
+        if revision is not None:
+            etag = version_etag('{}:{}'.format(scheduler.project_id, revision), mimetype)
+            if etag in request.if_none_match:
+                return not_modified_response(etag)
     try:
-        response = scheduler.get_jobs()
+        query = _parse_jobs_query(args)
+        if mimetype == MimeTypes.CRONTAB:
+            query['fields'] = JobFields.ALL
+        next_cursor = None
+        if stream:
+            response, next_cursor = _stream_jobs(scheduler, query)
+        else:
+            response = scheduler.get_jobs()
+            if query:
+                # An empty project is reported with a message instead of an empty list
+                jobs = response if isinstance(response, list) else []
+                response, next_cursor = _select_jobs(scheduler, jobs, query)
+    except ArgsMalformedError as error:
+        logging.warning('%s on /jobs/: %s', default_log_line_request(), error)
+        return http_response(ReturnCodes.BAD_ARGS)
     except NotFoundError as error:
         logging.warning('%s on /jobs/: %s', default_log_line_request(), error)
         return http_response(ReturnCodes.NOT_FOUND)
     except SchedulerError as error:
         logging.error('%s on /jobs/: %s', default_log_line_request(), error)
         return http_response(ReturnCodes.BACKEND_ERROR)
-    return jsonify(response)
+    if stream:
+        payload = streamed_response(response, mimetype, etag)
+    else:
+        payload = conditional_response(response, mimetype)
+    if next_cursor is not None:
+        payload.headers['X-Next-Cursor'] = next_cursor
+    return payload
 
 
 @dump_args
@@ -132,7 +287,7 @@ def delete_all_jobs(scheduler):
     except SchedulerError as error:
         logging.error('%s on /jobs/: %s', default_log_line_request(), error)
         return http_response(ReturnCodes.BACKEND_ERROR)
-    return jsonify(response)
+    return negotiated_response(response)
 
 
 #pylint: disable=R0913
@@ -173,7 +328,7 @@ def update_job(scheduler, job_id, schedule, target, command, description):
         logging.error('%s on /jobs/%s: %s',
                       default_log_line_request(), job_id, error)
         return http_response(ReturnCodes.BACKEND_ERROR)
-    return jsonify(response)
+    return negotiated_response(response)
 
 
 @dump_args
@@ -195,7 +350,7 @@ def modify_job_meta(scheduler, job_id, meta):
         logging.error('%s on /jobs/%s: %s',
                       default_log_line_request(), job_id, error)
         return http_response(ReturnCodes.BACKEND_ERROR)
-    return jsonify(response)
+    return negotiated_response(response)
 
 
 @dump_args
@@ -205,10 +360,13 @@ def get_job(scheduler, job_id):
 
     :param scheduler: the scheduler backend
     :param job_id:    the unique job identifier corresponding to the job definition requested
-    :returns:         an HTTP payload
+    :returns:         an HTTP payload, 304 if the client has the same definition already
     '''
+    mimetype = negotiate(crontab=True)
     try:
         response = scheduler.get_job(job_id)
+        if mimetype == MimeTypes.CRONTAB:
+            response = [scheduler.summarize_job(response)]
     except NotFoundError as error:
         logging.warning('%s on /jobs/: %s', default_log_line_request(), error)
         return http_response(ReturnCodes.NOT_FOUND)
@@ -216,7 +374,7 @@ def get_job(scheduler, job_id):
         logging.error('%s on /jobs/%s: %s',
                       default_log_line_request(), job_id, error)
         return http_response(ReturnCodes.BACKEND_ERROR)
-    return jsonify(response)
+    return conditional_response(response, mimetype)
 
 
 @dump_args
@@ -237,7 +395,7 @@ def delete_job(scheduler, job_id):
         logging.error('%s on /jobs/%s: %s',
                       default_log_line_request(), job_id, error)
         return http_response(ReturnCodes.BACKEND_ERROR)
-    return jsonify(response)
+    return negotiated_response(response)
 
 
 #pylint: disable=R0911
@@ -247,7 +405,8 @@ def jobs():
     '''
     Launcher for unnamed jobs actions
     POST: create a new job, job id will be automatically generated
-    GET: get the list of all jobs in the project
+    GET: get the list of all jobs in the project, or with since the job changes after
+         that revision, all the jobs if 0
     DELETE: delete all the jobs in the project
     '''
     try:
@@ -285,7 +444,9 @@ def jobs():
         return modify_all_jobs_meta(scheduler, request.args)
 
     if request.method == 'GET':
-        return get_all_jobs(scheduler)
+        if 'since' in request.args:
+            return get_job_changes(scheduler, request.args)
+        return get_all_jobs(scheduler, request.args)
 
     if request.method == 'DELETE':
         return delete_all_jobs(scheduler)
@@ -295,6 +456,99 @@ def jobs():
     raise ValueError('Critical error: method not allowed!')
 
 
+@dump_args
+def get_job_changes(scheduler, args):
+    '''
+    Get the job changes of the project after the revision known by the client.
+
+    :param scheduler: the scheduler backend
+    :param args:      the arguments of the request, with the revision as since
+    :returns:         an HTTP payload, 410 if the client has to fetch all the jobs again
+    '''
+    if not JOURNAL.enabled:
+        logging.warning('%s on /jobs/?since: job journal disabled.', default_log_line_request())
+        return http_response(ReturnCodes.NOT_FOUND)
+
+    def snapshot():
+        jobs_properties = scheduler.get_jobs()
+        if not isinstance(jobs_properties, list):
+            return []
+        return [scheduler.summarize_job(job_properties) for job_properties in jobs_properties]
+
+    try:
+        since = int(args.get('since', 0))
+        if since < 0:
+            raise ValueError(since)
+        response = JOURNAL.changes(scheduler.project_id, since, snapshot)
+    except ValueError:
+        logging.warning('%s on /jobs/?since: malformed revision.', default_log_line_request())
+        return http_response(ReturnCodes.BAD_ARGS)
+    except RevisionExpiredError as error:
+        logging.info('%s on /jobs/?since: %s', default_log_line_request(), error)
+        return http_response(ReturnCodes.REVISION_EXPIRED)
+    except NotFoundError as error:
+        logging.warning('%s on /jobs/?since: %s', default_log_line_request(), error)
+        return http_response(ReturnCodes.NOT_FOUND)
+    except SchedulerError as error:
+        logging.error('%s on /jobs/?since: %s', default_log_line_request(), error)
+        return http_response(ReturnCodes.BACKEND_ERROR)
+    return conditional_response(response)
+
+
+@dump_args
+def get_job_runs(scheduler, job_id, args):
+    '''
+    Compute the next times a job runs at.
+
+    :param scheduler: the scheduler backend
+    :param job_id:    the unique job identifier
+    :param args:      the arguments of the request, with the number of runs as count
+    :returns:         an HTTP payload
+    '''
+    try:
+        count = int(args.get('count', DEFAULT_JOB_RUNS))
+        if not 0 < count <= MAX_JOB_RUNS:
+            raise ValueError(count)
+    except ValueError:
+        logging.warning('%s on /jobs/%s/next: malformed count.',
+                        default_log_line_request(), job_id)
+        return http_response(ReturnCodes.BAD_ARGS)
+    try:
+        response = scheduler.get_job_runs(job_id, count)
+    except NotFoundError as error:
+        logging.warning('%s on /jobs/%s/next: %s', default_log_line_request(), job_id, error)
+        return http_response(ReturnCodes.NOT_FOUND)
+    except (SchedulerError, ValueError) as error:
+        # ValueError: schedules stored before their validation by acron.cron
+        logging.error('%s on /jobs/%s/next: %s',
+                      default_log_line_request(), job_id, error)
+        return http_response(ReturnCodes.BACKEND_ERROR)
+    return negotiated_response(response)
+
+
+@BP_JOBS.route('/<string:job_id>/next', methods=['GET'])
+@login_required
+def job_runs(job_id):
+    '''
+    Launcher for the preview of the runs of a job
+    GET: get the next times the job identified by job-id runs at, as many as count
+    '''
+    if len(job_id) > current_app.config['JOB_ID_MAX_LENGTH']:
+        logging.warning('%s on /jobs/%s/next: job_id too long.',
+                        default_log_line_request(), job_id)
+        return http_response(ReturnCodes.BAD_ARGS)
+    try:
+        scheduler = setup_scheduler(Endpoints.JOBS)
+    except (NoAccessError, NotShareableError):
+        return http_response(ReturnCodes.NOT_ALLOWED)
+    except ProjectNotFoundError:
+        return http_response(ReturnCodes.NOT_FOUND)
+
+    logging.info('%s on /jobs/%s/next.', default_log_line_request(), job_id)
+
+    return get_job_runs(scheduler, job_id, request.args)
+
+
 #pylint: disable=R0911
 @BP_JOBS.route('/<string:job_id>', methods=['GET', 'PUT', 'PATCH', 'DELETE'])
 @login_required
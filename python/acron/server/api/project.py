@@ -9,15 +9,16 @@
 #
 '''Project management submodule'''
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request
 from flask_login import login_required
 from acron.server.utils import dump_args
 from acron.server.constants import HttpMethods
 from acron.server.log import Logger, LogLevel
-from acron.server.http import http_response
-from acron.exceptions import (NoAccessError, NotShareableError,
-                              ProjectNotFoundError, ArgsMalformedError, UserNotFoundError)
-from acron.constants import Endpoints, ReturnCodes
+from acron.server.http import http_response, negotiated_response
+from acron.server.snapshot import MAX_SNAPSHOT_SIZE, read_snapshot
+from acron.exceptions import (NoAccessError, NotShareableError, ProjectNotFoundError,
+                              ArgsMalformedError, SchedulerError, UserNotFoundError)
+from acron.constants import Endpoints, MimeTypes, ReturnCodes
 from .utils import setup_scheduler
 
 __author__ = 'Rodrigo Bermudez Schettino (CERN)'
@@ -50,7 +51,7 @@ def _get_project_name(scheduler):
     :returns:         the backend's response
     '''
     try:
-        return jsonify(scheduler.get_project_name())
+        return negotiated_response(scheduler.get_project_name())
     except ProjectNotFoundError as err:
         _log_project_request(LogLevel.ERROR, err)
         return http_response(ReturnCodes.NOT_FOUND)
@@ -65,7 +66,7 @@ def _get_project_users(scheduler):
     :returns:         the backend's response
     '''
     try:
-        return jsonify(scheduler.get_project_users())
+        return negotiated_response(scheduler.get_project_users())
     except ProjectNotFoundError as err:
         _log_project_request(LogLevel.ERROR, err)
         return http_response(ReturnCodes.NOT_FOUND)
@@ -85,7 +86,7 @@ def _share_project(scheduler, user, perms):
     :returns:         the backend's response
     '''
     try:
-        return jsonify(scheduler.share_project(user, perms))
+        return negotiated_response(scheduler.share_project(user, perms))
     except ProjectNotFoundError as err:
         _log_project_request(LogLevel.ERROR, err)
         return http_response(ReturnCodes.NOT_FOUND)
@@ -110,7 +111,7 @@ def _undo_share_project(scheduler, user):
     :returns:         the backend's response
     '''
     try:
-        return jsonify(scheduler.undo_share_project(user))
+        return negotiated_response(scheduler.undo_share_project(user))
     except ProjectNotFoundError as err:
         _log_project_request(LogLevel.ERROR, err)
         return http_response(ReturnCodes.NOT_FOUND)
@@ -131,12 +132,102 @@ def _delete_project(scheduler):
     :returns:         the backend's response
     '''
     try:
-        return jsonify(scheduler.delete_project(scheduler.project_id, scheduler.config))
+        return negotiated_response(scheduler.delete_project(scheduler.project_id, scheduler.config))
     except ProjectNotFoundError as err:
         _log_project_request(LogLevel.ERROR, err)
         return http_response(ReturnCodes.NOT_FOUND)
 
 
+@dump_args
+def _export_project(scheduler):
+    '''
+    Request from the backend an archive of the current project.
+
+    :param scheduler: the scheduler backend
+    :returns:         the archive as attachment
+    '''
+    try:
+        archive = scheduler.export_project()
+    except ProjectNotFoundError as err:
+        _log_project_request(LogLevel.ERROR, err)
+        return http_response(ReturnCodes.NOT_FOUND)
+    except SchedulerError as err:
+        _log_project_request(LogLevel.ERROR, err)
+        return http_response(ReturnCodes.BACKEND_ERROR)
+    response = current_app.response_class(archive, mimetype=MimeTypes.GZIP)
+    response.headers['Content-Disposition'] = \
+        f'attachment; filename=acron-{scheduler.project_id}.json.gz'
+    return response
+
+
+@dump_args
+def _import_project(scheduler, data):
+    '''
+    Request from the backend to restore an archive in the current project.
+
+    :param scheduler: the scheduler backend
+    :param data:      the archive, as exported
+    :returns:         the backend's response
+    '''
+    try:
+        return negotiated_response(scheduler.import_project(read_snapshot(data)))
+    except ArgsMalformedError as err:
+        _log_project_request(LogLevel.ERROR, err)
+        return http_response(ReturnCodes.BAD_ARGS)
+    except SchedulerError as err:
+        _log_project_request(LogLevel.ERROR, err)
+        return http_response(ReturnCodes.BACKEND_ERROR)
+
+
+@BP_PROJECT.route('/export', methods=[HttpMethods.GET])
+@login_required
+def project_export():
+    '''
+    Launcher for project export
+
+    GET: get an archive of the jobs, shares and nodes of the project
+    '''
+    try:
+        scheduler = setup_scheduler(Endpoints.PROJECT)
+    except (NoAccessError, NotShareableError) as err:
+        _log_project_request(LogLevel.ERROR, err)
+        return http_response(ReturnCodes.NOT_ALLOWED)
+    except ProjectNotFoundError as err:
+        _log_project_request(LogLevel.ERROR, err)
+        return http_response(ReturnCodes.NOT_FOUND)
+
+    _log_project_request(level=LogLevel.INFO, msg='Export project')
+
+    return _export_project(scheduler)
+
+
+@BP_PROJECT.route('/import', methods=[HttpMethods.POST])
+@login_required
+def project_import():
+    '''
+    Launcher for project import
+
+    POST: restore the archive sent as body in the project
+    '''
+    try:
+        scheduler = setup_scheduler(Endpoints.PROJECT)
+    except (NoAccessError, NotShareableError) as err:
+        _log_project_request(LogLevel.ERROR, err)
+        return http_response(ReturnCodes.NOT_ALLOWED)
+    except ProjectNotFoundError as err:
+        _log_project_request(LogLevel.ERROR, err)
+        return http_response(ReturnCodes.NOT_FOUND)
+
+    _log_project_request(level=LogLevel.INFO, msg='Import project')
+
+    # Compressed, the archive cannot be larger than once decompressed
+    if (request.content_length or 0) > MAX_SNAPSHOT_SIZE:
+        _log_project_request(LogLevel.ERROR, 'Project archive too large.')
+        return http_response(ReturnCodes.BAD_ARGS)
+
+    return _import_project(scheduler, request.get_data())
+
+
 @BP_PROJECT.route('/users', methods=[HttpMethods.GET])
 def project_users():
     '''
@@ -9,11 +9,11 @@
 #
 '''Projects management submodule'''
 
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, request
 from flask_login import login_required
 from acron.server.utils import dump_args
 from acron.server.constants import HttpMethods
-from acron.server.http import http_response
+from acron.server.http import http_response, negotiated_response
 from acron.server.log import Logger, LogLevel
 from acron.exceptions import (NoAccessError, NotFoundError, NotShareableError,
                               ProjectNotFoundError, SchedulerError)
@@ -58,7 +58,7 @@ def _get_all_projects(scheduler):
     except SchedulerError as error:
         _log_projects_request(LogLevel.ERROR, error)
         return http_response(ReturnCodes.BACKEND_ERROR)
-    return jsonify(response)
+    return negotiated_response(response)
 
 
 @BP_PROJECTS.route('/', methods=[HttpMethods.GET])
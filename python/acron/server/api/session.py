@@ -146,6 +146,9 @@ def login():
         if otp is not None:
             auth_timestamp = verify_otp(username, otp)
         current_app.user_auth.setauth(username, auth_timestamp)
+        if auth_timestamp:
+            return jsonify(AuthTimestamp=auth_timestamp,
+                           ExpiresAt=auth_timestamp + current_app.ttl)
         return jsonify(AuthTimestamp=auth_timestamp)
 
     return 'Bad method.\n'
@@ -169,9 +172,14 @@ def login_status():
         return generate_http_payload(status_code=401,
                                      message=f'Please subscribe your user, {username} ' +
                                      f', to the LDAP group {current_app.config["USERS_GROUP"]}')
+    # Clients skip checking the status again until the session expires
     if current_app.config['ENABLE_2FA']:
-        if int(time())-current_app.user_auth.getauth(username) < current_app.ttl:
+        expires_at = current_app.user_auth.getauth(username) + current_app.ttl
+        if int(time()) < expires_at:
             status = True
     else:
+        expires_at = int(time()) + current_app.ttl
         status = True
+    if status:
+        return jsonify(loggedIn=status, expiresAt=expires_at)
     return jsonify(loggedIn=status)
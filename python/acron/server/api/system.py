@@ -9,12 +9,17 @@
 #
 '''System routines submodule'''
 
+from datetime import date, datetime, timedelta
 import logging
 from flask import Blueprint, current_app, jsonify, request
+from flask_login import login_required
 from acron.constants import ReturnCodes
 from acron.exceptions import SchedulerError
+from acron.server.executor import EXECUTOR
 from acron.server.http import http_response
-from acron.server.utils import default_log_line_request, dump_args
+from acron.server.locks import PROJECT_LOCKS
+from acron.server.status import STATUS_PROBER
+from acron.server.utils import check_ldap_group_membership, default_log_line_request, dump_args
 from .utils import get_scheduler_class
 
 __author__ = 'Philippe Ganz (CERN)'
@@ -30,19 +35,29 @@ BP_SYSTEM = Blueprint('system', __name__)
 
 
 @dump_args
-def backend_status(scheduler):
+def backend_status():
     '''
-    Forward a backend status call to the backend
+    Serve the backend status probed in the background, or probe it now if the last
+    probe is too old
 
-    :param scheduler: the scheduler backend
-    :returns:         the backend's response
+    :returns: the backend's response, with its age in seconds in the Age header
     '''
-    try:
-        response = scheduler.backend_status(current_app.config)
-    except SchedulerError as error:
+    sample = STATUS_PROBER.get()
+    if sample is None:
+        try:
+            STATUS_PROBER.refresh()
+        except SchedulerError:
+            pass
+        sample = STATUS_PROBER.get()
+
+    status, error, age = sample
+    if error is not None:
         logging.error('%s on /system/: %s', default_log_line_request(), error)
-        return http_response(ReturnCodes.BACKEND_ERROR)
-    return jsonify(response)
+        response = http_response(ReturnCodes.BACKEND_ERROR)
+    else:
+        response = jsonify(status)
+    response.headers['Age'] = str(int(age))
+    return response
 
 
 @BP_SYSTEM.route('/', methods=['GET'])
@@ -51,12 +66,95 @@ def system():
     Launcher for system call
     GET: get the status of the backend
     '''
-    scheduler_class = get_scheduler_class()
     logging.info('%s on /system/.', default_log_line_request())
 
     if request.method == 'GET':
-        return backend_status(scheduler_class)
+        return backend_status()
 
     logging.critical('%s on /system/: Method not allowed!',
                      default_log_line_request())
     raise ValueError('Critical error: method not allowed!')
+
+
+@BP_SYSTEM.route('/alive', methods=['GET'])
+def alive():
+    '''
+    Launcher for liveness call, meant for load balancers: no backend, DNS or disk access
+    GET: tell that the server process is up
+    '''
+    return jsonify({'alive': True})
+
+
+@BP_SYSTEM.route('/metrics', methods=['GET'])
+def metrics():
+    '''
+    Launcher for metrics call
+    GET: get the load and the timings of the executor and the project locks of this
+         server process
+    '''
+    logging.info('%s on /system/metrics.', default_log_line_request())
+    return jsonify({'executor': EXECUTOR.stats(), 'locks': PROJECT_LOCKS.stats()})
+
+
+@dump_args
+def scheduler_load(args):
+    '''
+    Count the runs of the jobs of all the projects starting in each slot of a day or a week
+
+    :param args: the arguments of the request: window, day or week, resolution, minute or
+                 second, top, the number of slots and targets reported, and start, the
+                 first day, today or the Monday of this week by default
+    :returns:    an HTTP payload
+    '''
+    try:
+        # NumPy is only needed here, the servers not serving /system/load can do without
+        from acron.server.load import RESOLUTIONS, WINDOWS, load_histogram, parse_day
+    except ImportError as error:
+        logging.error('%s on /system/load: %s', default_log_line_request(), error)
+        return http_response(ReturnCodes.BACKEND_ERROR)
+
+    window = args.get('window', 'day')
+    resolution = args.get('resolution', 'minute')
+    try:
+        top = int(args.get('top', 10))
+        if window not in WINDOWS or resolution not in RESOLUTIONS or not 0 < top <= 100:
+            raise ValueError(args)
+        if 'start' in args:
+            start = parse_day(args['start'])
+        else:
+            start = date.today()
+            if window == 'week':
+                start -= timedelta(days=start.weekday())
+    except ValueError:
+        logging.warning('%s on /system/load: malformed arguments.', default_log_line_request())
+        return http_response(ReturnCodes.BAD_ARGS)
+
+    try:
+        scheduler_class = get_scheduler_class()
+        # Backfilling calls the scheduler for every project, it is left to acron-load
+        catalog = scheduler_class.backfill_catalog(current_app.config, dry_run=True)
+        jobs = scheduler_class.iter_catalog(current_app.config)
+        report = load_histogram(jobs, datetime.combine(start, datetime.min.time()),
+                                window, resolution, top)
+        report['catalog'] = catalog
+    except SchedulerError as error:
+        logging.error('%s on /system/load: %s', default_log_line_request(), error)
+        return http_response(ReturnCodes.BACKEND_ERROR)
+    return jsonify(report)
+
+
+@BP_SYSTEM.route('/load', methods=['GET'])
+@login_required
+def load():
+    '''
+    Launcher for load call, restricted to the members of ADMINS_GROUP
+    GET: get the busiest slots of the scheduler, overall and per target
+    '''
+    logging.info('%s on /system/load.', default_log_line_request())
+
+    admins_group = current_app.config.get('ADMINS_GROUP')
+    if not admins_group or not check_ldap_group_membership(request.remote_user, admins_group):
+        logging.warning('%s on /system/load: not an administrator.', default_log_line_request())
+        return http_response(ReturnCodes.NOT_ALLOWED)
+
+    return scheduler_load(request.args)
@@ -10,10 +10,10 @@
 '''Implementation of the File storage backend client'''
 
 import logging
-from subprocess import Popen, PIPE
+import os
 from acron.constants import ReturnCodes
-from acron.exceptions import ArgsMalformedError, CredsNoFileError, FileError
-from acron.server.utils import dump_args
+from acron.exceptions import ArgsMalformedError, CredsNoFileError, ExecutorError, FileError
+from acron.server.utils import dump_args, _execute_command
 from . import Creds
 
 __author__ = 'Philippe Ganz (CERN)'
@@ -28,6 +28,21 @@ class File(Creds):
     '''
     Implements a credentials manager based on the native Linux file manager.
     '''
+    @staticmethod
+    def _execute(cmd):
+        '''
+        Run one of the privileged creds helpers as the acron user.
+
+        :param cmd:        the helper and its arguments
+        :raises FileError: if the helper could not be run to completion
+        :returns:          tuple of return code, output and error message
+        '''
+        try:
+            return _execute_command(['sudo', '-u', 'acron'] + cmd,
+                                    name=os.path.basename(cmd[0]))
+        except ExecutorError as error:
+            raise FileError(error) from error
+
     @dump_args
     def update_creds(self, source_path):
         '''
@@ -37,16 +52,14 @@ class File(Creds):
         :except ArgsMalformedError: if the credentials file is not valid
         :except FileError:          on backend failure
         '''
-        with Popen(['sudo', '-u', 'acron', '/usr/libexec/acron/store_creds',
-                    self.project_id, source_path],
-                   universal_newlines=True, stdout=PIPE, stderr=PIPE) as process:
-            _, err = process.communicate()
-            if process.returncode != 0:
-                logging.error(
-                    'File creds storage: could not update creds. %s\n', err)
-                if process.returncode == ReturnCodes.BAD_ARGS:
-                    raise ArgsMalformedError(err)
-                raise FileError(err)
+        returncode, _, err = self._execute(['/usr/libexec/acron/store_creds',
+                                            self.project_id, source_path])
+        if returncode != 0:
+            logging.error(
+                'File creds storage: could not update creds. %s\n', err)
+            if returncode == ReturnCodes.BAD_ARGS:
+                raise ArgsMalformedError(err)
+            raise FileError(err)
 
     @dump_args
     def get_creds(self):
@@ -57,14 +70,12 @@ class File(Creds):
         :raises FileError:        if creds could not be delivered
         :returns:                 the path to the unencrypted credentials
         '''
-        with Popen(['sudo', '-u', 'acron', '/usr/libexec/acron/get_creds', self.project_id],
-                   universal_newlines=True, stdout=PIPE, stderr=PIPE) as process:
-            out, err = process.communicate()
-            if process.returncode != 0:
-                if process.returncode == ReturnCodes.NO_VALID_CREDS:
-                    raise CredsNoFileError(err)
-                raise FileError(err)
-            return out.rstrip('\n')
+        returncode, out, err = self._execute(['/usr/libexec/acron/get_creds', self.project_id])
+        if returncode != 0:
+            if returncode == ReturnCodes.NO_VALID_CREDS:
+                raise CredsNoFileError(err)
+            raise FileError(err)
+        return out.rstrip('\n')
 
     @dump_args
     def delete_creds(self):
@@ -74,10 +85,8 @@ class File(Creds):
         :raises CredsNoFileError: if no creds are stored
         :raises FileError:        if creds could not be deleted
         '''
-        with Popen(['sudo', '-u', 'acron', '/usr/libexec/acron/delete_creds', self.project_id],
-                   universal_newlines=True, stdout=PIPE, stderr=PIPE) as process:
-            _, err = process.communicate()
-            if process.returncode != 0:
-                if process.returncode == ReturnCodes.NOT_FOUND:
-                    raise CredsNoFileError(err)
-                raise FileError(err)
+        returncode, _, err = self._execute(['/usr/libexec/acron/delete_creds', self.project_id])
+        if returncode != 0:
+            if returncode == ReturnCodes.NOT_FOUND:
+                raise CredsNoFileError(err)
+            raise FileError(err)
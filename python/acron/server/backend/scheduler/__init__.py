@@ -10,7 +10,10 @@
 '''Scheduler interface class'''
 
 from abc import ABC, abstractmethod
+from datetime import datetime
 import logging
+from acron.constants import JobFields
+from acron.cron import parse_schedule
 from acron.server.utils import dump_args, get_remote_hostname
 
 __author__ = 'Philippe Ganz (CERN)'
@@ -21,6 +24,28 @@ __email__ = 'rodrigo.bermudez.schettino@cern.ch'
 __status__ = 'Development'
 
 
+def job_runs(job, count, seconds=0):
+    '''
+    Compute the next runs of a job from its schedule.
+
+    :param job:     a job summary, as returned by summarize_job
+    :param count:   the number of runs
+    :param seconds: the second of the minute the job runs at
+    :returns:       a dictionary with the name, schedule and enabled keys, and the runs
+                    as ISO 8601 times in the time zone of the server, none if disabled
+    '''
+    runs = []
+    if job[JobFields.ENABLED]:
+        runs = [run.astimezone().isoformat() for run in
+                parse_schedule(job[JobFields.SCHEDULE]).next_runs(datetime.now(), count, seconds)]
+    return {
+        JobFields.NAME: job[JobFields.NAME],
+        JobFields.SCHEDULE: job[JobFields.SCHEDULE],
+        JobFields.ENABLED: job[JobFields.ENABLED],
+        'runs': runs,
+    }
+
+
 class Scheduler(ABC):
     '''
     Base scheduler class. Acts as interface for the different scheduler backends.
@@ -177,6 +202,80 @@ class Scheduler(ABC):
         :returns:                     a dictionary containing the backend's response
         '''
 
+    def iter_jobs(self):
+        '''
+        Get all job definitions in the current project one by one.
+        Backends able to parse their listing incrementally should override it,
+        so that the jobs can be streamed without holding the whole listing in memory.
+        :raises ProjectNotFoundError: if the project doesn't exist
+        :raises SchedulerError:       on unexpected backend error
+        :returns:                     an iterator over the job definitions
+        '''
+        jobs_properties = self.get_jobs()
+        if isinstance(jobs_properties, list):
+            yield from jobs_properties
+
+    def get_job_runs(self, job_id, count):
+        '''
+        Get the next times a job runs at.
+        Backends knowing the second of the minute the jobs run at should override it.
+
+        :param job_id:                the unique job identifier
+        :param count:                 the number of runs
+        :raises JobNotFoundError:     if the job doesn't exist
+        :raises ProjectNotFoundError: if the project doesn't exist
+        :raises SchedulerError:       on unexpected backend error
+        :returns:                     a dictionary, see job_runs
+        '''
+        return job_runs(self.summarize_job(self.get_job(job_id)), count)
+
+    def get_jobs_revision(self):
+        '''
+        Get the revision of the jobs of the project, which changes with any of them, without
+        calling the backend. Backends recording their job changes should override it.
+
+        :returns: the revision, None if unknown
+        '''
+        return None
+
+    @staticmethod
+    @abstractmethod
+    def summarize_job(job_properties):
+        '''
+        Extract the fields shown to the users from a job definition of the backend.
+
+        :param job_properties:  a job definition, as returned by get_job or get_jobs
+        :raises SchedulerError: if the backend cannot summarize its jobs
+        :returns:               a dictionary with the name, schedule, target, command,
+                                description and enabled keys
+        '''
+
+    @staticmethod
+    @abstractmethod
+    def backfill_catalog(config, dry_run=False):
+        '''
+        Complete the catalog with the jobs it misses, e.g. created before it was kept.
+
+        :param config:          a dictionary containing all the config values
+        :param dry_run:         only find the projects not backfilled yet, without calling
+                                the backend
+        :raises SchedulerError: if the backend keeps no catalog
+        :returns:               a dictionary with the numbers of jobs backfilled and left
+                                out, and the projects not backfilled yet
+        '''
+
+    @staticmethod
+    @abstractmethod
+    def iter_catalog(config):
+        '''
+        Get the jobs of all the projects, e.g. to compute the load of the backend.
+
+        :param config:          a dictionary containing all the config values
+        :raises SchedulerError: on unexpected backend error
+        :returns:               an iterator over the job summaries, with the project and the
+                                second of the minute they run at
+        '''
+
     @abstractmethod
     def modify_all_jobs_meta(self, meta):
         '''
@@ -198,6 +297,26 @@ class Scheduler(ABC):
         :returns:                     a dictionary containing the backend's response
         '''
 
+    @abstractmethod
+    def export_project(self):
+        '''
+        Export the jobs, shares and nodes of the current project in a single archive.
+
+        :raises ProjectNotFoundError: if the project doesn't exist
+        :raises SchedulerError:       on unexpected backend error
+        :returns:                     the archive, see acron.server.snapshot
+        '''
+
+    @abstractmethod
+    def import_project(self, snapshot):
+        '''
+        Restore the jobs, shares and nodes of an archive in the current project.
+
+        :param snapshot:        the content of the archive, as returned by read_snapshot
+        :raises SchedulerError: on unexpected backend error
+        :returns:               a dictionary containing the backend's response
+        '''
+
     @abstractmethod
     def is_shareable(self, user):
         '''
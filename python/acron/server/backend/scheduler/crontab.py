@@ -193,6 +193,37 @@ class Crontab(Scheduler):
         '''
         raise CrontabError
 
+    @staticmethod
+    def summarize_job(job_properties):
+        '''
+        Extract the fields shown to the users from a job definition of the backend.
+
+        :param job_properties: a job definition, as returned by get_job or get_jobs
+        :raises CrontabError:  the jobs are not summarized by this backend
+        '''
+        raise CrontabError
+
+    @staticmethod
+    def backfill_catalog(config, dry_run=False):
+        '''
+        Complete the catalog with the jobs it misses, e.g. created before it was kept.
+
+        :param config:        a dictionary containing all the config values
+        :param dry_run:       only find the projects not backfilled yet
+        :raises CrontabError: the jobs are not listed by this backend
+        '''
+        raise CrontabError
+
+    @staticmethod
+    def iter_catalog(config):
+        '''
+        Get the jobs of all the projects, e.g. to compute the load of the backend.
+
+        :param config:        a dictionary containing all the config values
+        :raises CrontabError: the jobs are not listed by this backend
+        '''
+        raise CrontabError
+
     @dump_args
     def modify_all_jobs_meta(self, meta):
         '''
@@ -216,6 +247,28 @@ class Crontab(Scheduler):
         '''
         raise CrontabError
 
+    @dump_args
+    def export_project(self):
+        '''
+        Export the jobs, shares and nodes of the current project in a single archive.
+
+        :raises ProjectNotFoundError: if the project doesn't exist
+        :raises CrontabError:         on unexpected backend error
+        :returns:                     the archive, see acron.server.snapshot
+        '''
+        raise CrontabError
+
+    @dump_args
+    def import_project(self, snapshot):
+        '''
+        Restore the jobs, shares and nodes of an archive in the current project.
+
+        :param snapshot:      the content of the archive, as returned by read_snapshot
+        :raises CrontabError: on unexpected backend error
+        :returns:             a dictionary containing the backend's response
+        '''
+        raise CrontabError
+
     @dump_args
     def is_shareable(self, user):
         '''
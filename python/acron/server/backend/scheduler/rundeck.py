@@ -10,24 +10,31 @@
 #pylint: disable=too-many-lines
 '''Implementation of the Rundeck backend client'''
 
+import hashlib
 import logging
 import os
 from pathlib import Path
 import re
+import shutil
 from tempfile import NamedTemporaryFile
 import requests
-import yaml
-from acron.exceptions import (JobNotFoundError, ProjectNotFoundError,
-                              RundeckError, UserNotFoundError,
+from acron.exceptions import (ExecutorError, JobNotFoundError, ProjectNotFoundError,
+                              RundeckError, SchedulerError, UserNotFoundError,
                               NotShareableError, ArgsMalformedError)
+from acron.serialization import json_dumps, json_loads, yaml_dump, yaml_load
 from acron.utils import replace_in_file
-from acron.constants import ProjectPerms
+from acron.constants import JobFields, ProjectPerms
 from acron.server.utils import (dump_args, fqdnify, create_parent,
                                 _cron2quartz, _execute_command,
                                 _get_project_home_path, _delete_shareable_file)
 from acron.server.constants import ConfigFilenames, OpenModes
+from acron.server.journal import ACTION_CREATE, ACTION_DELETE, ACTION_UPDATE, JOURNAL
+from acron.server.locks import locked
+from acron.server.placement import place_job
+from acron.server.snapshot import build_snapshot
+from acron.server.singleflight import coalesce
 from acron.notifications import email_user
-from . import Scheduler
+from . import Scheduler, job_runs
 
 __author__ = 'Philippe Ganz (CERN)'
 __credits__ = ['Philippe Ganz (CERN)', 'Ulrich Schwickerath (CERN)',
@@ -61,18 +68,31 @@ class Rundeck(Scheduler):
         '''
         os.environ['RD_CONF'] = config['SCHEDULER']['RD_CLI_CONF']
 
+    @staticmethod
+    @dump_args
+    def _execute(cmd):
+        '''
+        Execute a command through the bounded executor of the server.
+        :param cmd: Command to execute as list of arguments
+        :raises RundeckError: if the command could not be run to completion
+        :returns: Tuple of return code, output and error message, if any
+        '''
+        try:
+            return _execute_command(cmd)
+        except ExecutorError as error:
+            raise RundeckError(error) from error
+
     @staticmethod
     @dump_args
     def _exec_cmd_raise_err_if_fails(cmd, project_id=None, disable_check_job_found=True):
         '''
         Open subprocess and execute command.
         Raise error if exit code is not 0.
-        :param cmd: Command to execute as string
+        :param cmd: Command to execute as list of arguments
         :raises RundeckError: on unexpected backend error
         :returns: Tuple of return code and error message, if any
         '''
-        logging.debug("Executing command %s", cmd)
-        returncode, out, err = _execute_command(cmd)
+        returncode, out, err = Rundeck._execute(cmd)
 
         if project_id is not None and returncode == 2:
             project_not_found = re.match(
@@ -175,10 +195,8 @@ class Rundeck(Scheduler):
             f'Performing {obj_name_singular} lookup on the backend ' +
             f'for {obj_name_singular} {obj_val}')
         Rundeck._config(config)
-        cmd = f'rd {obj_name_plural} info'
-        cmd += f' --{long_option_name} ' + obj_val
-        logging.debug("Executing command %s", cmd)
-        returncode, _, _ = _execute_command(cmd)
+        cmd = ['rd', obj_name_plural, 'info', f'--{long_option_name}', obj_val]
+        returncode, _, _ = Rundeck._execute(cmd)
         obj_exists = returncode == 0
         logging.debug(
             f'{obj_name_singular} {obj_val} exists on the backend: {obj_exists}')
@@ -244,7 +262,7 @@ class Rundeck(Scheduler):
         :raises RundeckError: on unexpected Rundeck error
         :returns:             True if the host is already in the list, False otherwise
         '''
-        cmd = f'rd nodes --project {self.project_id} --filter {target}'
+        cmd = ['rd', 'nodes', '--project', self.project_id, '--filter', target]
         _, out, _ = Rundeck._exec_cmd_raise_err_if_fails(cmd)
         host = re.search(target, out)
         if host is None:
@@ -257,8 +275,7 @@ class Rundeck(Scheduler):
         Add a node to the user's project.
         :param target: FQDN of the host to add
         '''
-        filename = os.path.join('etc', 'resources.yaml')
-        path, _ = self._get_project_home_path(self.project_id, filename)
+        path, _ = self._get_project_home_path(self.project_id, ConfigFilenames.RESOURCES)
         create_parent(path)
         logging.debug('Adding %s to %s.', target, path)
         with open(path, 'a+') as resources:
@@ -269,6 +286,20 @@ class Rundeck(Scheduler):
                             '  username: ' + self.project_id + '\n' +
                             '  tags: ""')
 
+    @dump_args
+    def _get_node_names(self):
+        '''
+        Get the nodes registered in the user's project, without asking Rundeck.
+        :returns: the list of the FQDNs of the nodes, empty if none was added yet
+        '''
+        path, _ = self._get_project_home_path(self.project_id, ConfigFilenames.RESOURCES)
+        try:
+            with open(path, OpenModes.READ) as resources:
+                nodes = yaml_load(resources)
+        except OSError:
+            return []
+        return list(nodes) if isinstance(nodes, dict) else []
+
     @dump_args
     def _get_shareable_projects(self, user):
         '''
@@ -346,9 +377,11 @@ class Rundeck(Scheduler):
         logging.debug(
             f'Writing new ACL list to {path}:\n' + user_acl_list_str)
 
-        # Write updated project permissions
-        with open(path, OpenModes.WRITE) as project_shared_with_file:
+        # Write updated project permissions. Replace the file in one step, so readers
+        # of other requests, which do not take the project lock, never see it half written
+        with open(path + '.tmp', OpenModes.WRITE) as project_shared_with_file:
             project_shared_with_file.writelines(user_acl_list)
+        os.replace(path + '.tmp', path)
 
         logging.debug(
             f'Contents of file {path}:' + '\n' + user_acl_list_str)
@@ -383,8 +416,7 @@ class Rundeck(Scheduler):
         :raises RundeckError: on unexpected Rundeck error
         :returns:             Comma separated list of job ids
         '''
-        cmd = f'rd jobs list --project {project_id}'
-        cmd += ' --outformat %id'
+        cmd = ['rd', 'jobs', 'list', '--project', project_id, '--outformat', '%id']
         _, out, _ = Rundeck._exec_cmd_raise_err_if_fails(cmd)
 
         # Rundeck returns extra trailing empty line; delete
@@ -393,12 +425,195 @@ class Rundeck(Scheduler):
         job_ids = job_ids.replace('\n', ',')
         return job_ids
 
-    # pylint: disable=R0912, R0913, R0915
+    @dump_args
+    def _get_job_meta_path(self, job_id=None):
+        '''
+        Get path to the acron metadata of a job, or to the directory of the metadata of all jobs
+        :param job_id: the unique job identifier, None for the directory
+        :returns:      absolute path to the metadata file or directory
+        '''
+        filename = ConfigFilenames.JOBS_META
+        if job_id is not None:
+            filename = os.path.join(filename, job_id + '.json')
+        path, _ = self._get_project_home_path(self.project_id, filename)
+        return path
 
     @dump_args
+    def _read_job_meta(self, job_id):
+        '''
+        Read the acron metadata of a job: its fields as given by the user, the second of the
+        minute it runs at and the digest of its Rundeck definition.
+        :param job_id: the unique job identifier
+        :returns:      a dictionary with the metadata, None if unknown or unreadable
+        '''
+        try:
+            with open(self._get_job_meta_path(job_id), 'rb') as meta_file:
+                return json_loads(meta_file.read())
+        except (OSError, ValueError):
+            return None
+
+    @dump_args
+    def _write_job_meta(self, job_id, meta):
+        '''
+        Replace atomically the acron metadata of a job.
+        Failing to write it only means that the next update of the job is not skipped.
+        :param job_id: the unique job identifier
+        :param meta:   a dictionary with the metadata
+        '''
+        path = self._get_job_meta_path(job_id)
+        try:
+            create_parent(path)
+            with NamedTemporaryFile('wb', dir=os.path.dirname(path), delete=False) as tmp:
+                tmp.write(json_dumps(meta))
+            os.replace(tmp.name, path)
+        except OSError as error:
+            logging.error('Rundeck: could not write metadata of job %s: %s', job_id, error)
+
+    @dump_args
+    def _delete_job_meta(self, job_id=None):
+        '''
+        Delete the acron metadata of a job, or of all the jobs of the project.
+        :param job_id: the unique job identifier, None for all jobs
+        '''
+        path = self._get_job_meta_path(job_id)
+        if job_id is None:
+            shutil.rmtree(path, ignore_errors=True)
+        elif os.path.exists(path):
+            os.remove(path)
+
+    @dump_args
+    def _set_job_meta_enabled(self, enabled, job_id=None):
+        '''
+        Record in the acron metadata that a job, or all the jobs of the project, were
+        enabled or disabled.
+        :param enabled: True if the jobs were enabled
+        :param job_id:  the unique job identifier, None for all jobs
+        '''
+        if job_id is None:
+            try:
+                job_ids = [filename[:-len('.json')]
+                           for filename in os.listdir(self._get_job_meta_path())
+                           if filename.endswith('.json')]
+            except OSError:
+                return
+        else:
+            job_ids = [job_id]
+        for meta_job_id in job_ids:
+            meta = self._read_job_meta(meta_job_id)
+            if meta is not None and meta['enabled'] != enabled:
+                meta['enabled'] = enabled
+                self._write_job_meta(meta_job_id, meta)
+
+    @dump_args
+    def _get_job_fields(self, job_id):
+        '''
+        Get the acron fields of a job, from its metadata if available. Jobs created before
+        the metadata was kept have their fields parsed once from the Rundeck definition.
+
+        :param job_id:            the unique job identifier
+        :raises JobNotFoundError: if the job doesn't exist
+        :raises RundeckError:     on unexpected Rundeck error
+        :returns:                 a dictionary with the name, schedule, target, command,
+                                  description, enabled and seconds keys, and the digest
+                                  of the definition if known
+        '''
+        meta = self._read_job_meta(job_id)
+        if meta is not None:
+            return meta
+        return self._summarize_job_meta(self._get_job(job_id))
+
+    @staticmethod
+    def _summarize_job_meta(job_properties):
+        '''
+        Get the acron fields of a job from its Rundeck definition, without the digest so that
+        the next update of the job loads it again.
+        :param job_properties: a job definition, as returned by get_job or get_jobs
+        :returns:              a dictionary with the name, schedule, target, command,
+                               description, enabled and seconds keys
+        '''
+        meta = Rundeck.summarize_job(job_properties)
+        meta['seconds'] = int(job_properties['schedule']['crontab'].split(' ')[0])
+        return meta
+
+    @staticmethod
+    def _mark_job_meta_complete(project_id, config):
+        '''
+        Record that every job of a project has its acron metadata, so that it is not
+        backfilled again.
+        :param project_id: identifier of the project
+        :param config:     a dictionary containing all the config values
+        '''
+        path, _ = _get_project_home_path(config, project_id, ConfigFilenames.JOBS_META_COMPLETE)
+        try:
+            create_parent(path)
+            Path(path).touch()
+        except OSError as error:
+            logging.error('Rundeck: could not mark metadata of project %s complete: %s',
+                          project_id, error)
+
+    @dump_args
+    @locked(lambda self: self.project_id)
+    def _backfill_job_meta(self):
+        '''
+        Write the acron metadata of the jobs of the project created before it was kept, from
+        their Rundeck definitions. The project is marked complete unless some jobs could not
+        be summarized, so that they are reported again on the next pass.
+        :raises ProjectNotFoundError: if the project doesn't exist
+        :raises RundeckError:         on unexpected Rundeck error
+        :returns:                     a tuple with the numbers of jobs backfilled and left out
+        '''
+        backfilled = left_out = 0
+        for job_properties in self.iter_jobs():
+            job_id = job_properties.get('name')
+            if job_id is not None and self._read_job_meta(job_id) is not None:
+                continue
+            try:
+                meta = self._summarize_job_meta(job_properties)
+            except (AttributeError, IndexError, KeyError, TypeError, ValueError):
+                logging.warning('Rundeck: cannot summarize job %s of project %s.',
+                                job_id, self.project_id)
+                left_out += 1
+                continue
+            self._write_job_meta(job_id, meta)
+            backfilled += 1
+        if not left_out:
+            self._mark_job_meta_complete(self.project_id, self.config)
+        return backfilled, left_out
+
+    # pylint: disable=R0913
+    @dump_args
+    def _render_job(self, job_id, schedule, target, command, description, seconds):
+        '''
+        Render the Rundeck definition of a job from the template.
+        :param job_id:      the unique job identifier
+        :param schedule:    the schedule of the job, crontab format
+        :param target:      the node on which the job will be executed, FQDN
+        :param command:     the command to launch on the target at the given schedule
+        :param description: the description of the job
+        :param seconds:     the second of the minute the job runs at
+        :returns:           the definition of the job, YAML format
+        '''
+        with open(self.config['SCHEDULER']['JOB_SOURCE'], 'r') as template:
+            definition = template.read()
+        for placeholder, value in [('__PROJECT_NAME__', self.project_id),
+                                   ('__DESCRIPTION__', schedule + ' ' + description),
+                                   ('__DOMAIN__', self.config['DOMAIN']),
+                                   ('__JOB_NAME__', job_id),
+                                   ('__TARGET_HOST__', target),
+                                   ('__COMMAND__', command),
+                                   ('__CRONTAB__', _cron2quartz(schedule, seconds))]:
+            definition = definition.replace(placeholder, value)
+        return definition
+
+    # pylint: disable=R0912, R0913, R0914, R0915
+
+    @dump_args
+    @locked(lambda self, *args, **kwargs: self.project_id)
     def _create_update_job(self, job_id, schedule, target, command, description, is_create):
         '''
         Create or update a job.
+        An update leaving the Rundeck definition of an enabled job unchanged returns
+        right away, from the metadata of the job, without calling Rundeck.
 
         :param job_id:            the unique job identifier corresponding to the job to update
         :param schedule:          the schedule of the new job, Quartz format
@@ -411,8 +626,9 @@ class Rundeck(Scheduler):
         :raises RundeckError:     on unexpected Rundeck error
         :returns:                 a dictionary containing the backend's response
         '''
-        self._ensure_project_exists(self.project_id)
+        meta = None
         if is_create:  # new job
+            self._ensure_project_exists(self.project_id)
             # Increase count of jobs regardless of wether job_id was provided
             default_job_id = self._generate_job_name()
             if job_id is None:
@@ -424,46 +640,78 @@ class Rundeck(Scheduler):
                     f'Error on job creation, job_id {job_id} provided by the user already exists.')
                 raise ArgsMalformedError
         else:  # update existing job
-            job_properties = self.get_job(job_id)
+            meta = self._get_job_fields(job_id)
             if schedule is None:
-                schedule = ' '.join(
-                    job_properties['description'].split(' ')[0:5])
+                schedule = meta['schedule']
             if target is None:
-                target = job_properties['nodefilters']['filter'].replace(
-                    'name: ', '')
+                target = meta['target']
             if command is None:
-                command = job_properties['sequence']['commands'][0]['exec']
+                command = meta['command']
             if description is None:
-                description = ' '.join(
-                    job_properties['description'].split(' ')[5:])
+                description = meta['description']
+            seconds = meta['seconds']
             type_message = 'updated'
         target = fqdnify(target)
-        crontab = _cron2quartz(schedule)
+        if description is None or description == "":
+            description = ' No description given'
+        if meta is None or schedule != meta['schedule'] or target != meta['target']:
+            # Spread over the minute, away from the jobs hitting the same target at once
+            seconds = place_job(self.project_id, job_id, schedule, target,
+                                self._iter_meta_dir(self._get_job_meta_path()))
+        definition = self._render_job(job_id, schedule, target, command, description, seconds)
+        digest = hashlib.sha256(definition.encode('utf-8')).hexdigest()
+        summary = {'name': job_id, 'schedule': schedule, 'target': target, 'command': command,
+                   'description': description, 'enabled': True}
+
+        # Loading the job would enable it again, so a disabled job is never unchanged
+        if meta is not None and meta.get('digest') == digest and meta['enabled']:
+            logging.info('Rundeck: job %s of %s unchanged, not reloaded.', job_id, self.project_id)
+            payload = {'message': 'Job unchanged.'}
+            payload.update(summary)
+            return payload
+
+        if not is_create:
+            self._ensure_project_exists(self.project_id)
         if not self._target_is_in_project(target):
             self._add_target_to_project(target)
-        with NamedTemporaryFile() as job_file:
-            if description is None or description == "":
-                description = ' No description given'
-            replace_in_file('__PROJECT_NAME__', self.project_id,
-                            self.config['SCHEDULER']['JOB_SOURCE'], job_file.name)
-            replace_in_file('__DESCRIPTION__', schedule +
-                            ' ' + description, job_file.name)
-            replace_in_file('__DOMAIN__', self.config['DOMAIN'], job_file.name)
-            replace_in_file('__JOB_NAME__', job_id, job_file.name)
-            replace_in_file('__TARGET_HOST__', target, job_file.name)
-            replace_in_file('__COMMAND__', command, job_file.name)
-            replace_in_file('__CRONTAB__', crontab, job_file.name)
-            cmd = 'rd jobs load'
-            cmd += ' --project ' + self.project_id
-            cmd += ' --file ' + job_file.name
-            cmd += ' --format yaml --duplicate update'
+        with NamedTemporaryFile('w') as job_file:
+            job_file.write(definition)
+            job_file.flush()
+            cmd = ['rd', 'jobs', 'load', '--project', self.project_id, '--file', job_file.name,
+                   '--format', 'yaml', '--duplicate', 'update']
             Rundeck._exec_cmd_raise_err_if_fails(cmd)
+        job_properties = self._get_job(job_id)
+        summary.update(digest=digest, seconds=seconds)
+        self._write_job_meta(job_id, summary)
+        self._journal(lambda: [(ACTION_CREATE if is_create else ACTION_UPDATE, job_id,
+                                {key: summary[key] for key in JobFields.ALL})])
         payload = {'message': 'Job successfully ' + type_message + '.'}
-        payload.update(self.get_job(job_id))
+        payload.update(job_properties)
         return payload
 
+    def _job_summaries(self):
+        '''
+        :raises RundeckError: on unexpected Rundeck error
+        :returns:             the summaries of all the jobs of the project
+        '''
+        jobs_properties = self._get_jobs()
+        if not isinstance(jobs_properties, list):
+            return []
+        return [self.summarize_job(job_properties) for job_properties in jobs_properties]
+
+    def _journal(self, changes):
+        '''
+        Record job changes in the journal of the project, if enabled.
+
+        :param changes: function returning the list of tuples of the action, the job
+                        identifier and the job summary, only called if the journal is enabled
+        '''
+        if JOURNAL.enabled:
+            JOURNAL.record(self.project_id, changes(), self._job_summaries)
+
     @staticmethod
     @dump_args
+    @coalesce(lambda config: ())
     def backend_status(config):
         '''
         Request the status of the backend
@@ -473,9 +721,84 @@ class Rundeck(Scheduler):
         :returns:             a dictionary containing the backend's response
         '''
         Rundeck._config(config)
-        cmd = 'rd system info'
+        cmd = ['rd', 'system', 'info']
         _, out, _ = Rundeck._exec_cmd_raise_err_if_fails(cmd)
-        return yaml.safe_load(out)
+        return yaml_load(out)
+
+    @staticmethod
+    def _iter_meta_dir(meta_dir):
+        '''
+        Read the acron metadata of all the jobs of a project, skipping unreadable files.
+        :param meta_dir: the directory of the metadata of the project
+        :returns:        an iterator over the metadata, sorted by job identifier
+        '''
+        try:
+            filenames = sorted(os.listdir(meta_dir))
+        except OSError:
+            return
+        for filename in filenames:
+            if not filename.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(meta_dir, filename), 'rb') as meta_file:
+                    meta = json_loads(meta_file.read())
+            except (OSError, ValueError):
+                continue
+            yield meta
+
+    @staticmethod
+    def backfill_catalog(config, dry_run=False):
+        '''
+        Write the metadata of the jobs created before it was kept, once per project, so that
+        iter_catalog lists them.
+        :param config:  a dictionary containing all the config values
+        :param dry_run: only find the projects not backfilled yet, without calling Rundeck
+        :returns:       a dictionary with the numbers of jobs backfilled and left out, and the
+                        projects not backfilled yet, whose jobs may be left out
+        '''
+        report = {'backfilled': 0, 'left_out': 0, 'projects': []}
+        home = config['SCHEDULER']['PROJECTS_HOME']
+        for project_id in sorted(os.listdir(home)):
+            # Skips the locks and the journal
+            if project_id.startswith('.') or os.path.exists(
+                    os.path.join(home, project_id, ConfigFilenames.JOBS_META_COMPLETE)):
+                continue
+            if dry_run:
+                report['projects'].append(project_id)
+                continue
+            try:
+                backfilled, left_out = Rundeck(project_id, config)._backfill_job_meta()
+            except ProjectNotFoundError:
+                continue
+            except SchedulerError as error:
+                logging.error('Rundeck: could not backfill metadata of project %s: %s',
+                              project_id, error)
+                report['projects'].append(project_id)
+                continue
+            report['backfilled'] += backfilled
+            report['left_out'] += left_out
+            if left_out:
+                report['projects'].append(project_id)
+        return report
+
+    @staticmethod
+    def iter_catalog(config):
+        '''
+        Get the jobs of all the projects from their metadata, without calling Rundeck.
+        Jobs created before the metadata was kept are missing until backfill_catalog runs.
+        :param config: a dictionary containing all the config values
+        :returns:      an iterator over the job summaries, with the project and the second
+                       of the minute they run at
+        '''
+        home = config['SCHEDULER']['PROJECTS_HOME']
+        for project_id in sorted(os.listdir(home)):
+            # Skips the locks and the journal
+            if project_id.startswith('.'):
+                continue
+            for meta in Rundeck._iter_meta_dir(
+                    os.path.join(home, project_id, ConfigFilenames.JOBS_META)):
+                meta['project'] = project_id
+                yield meta
 
     @staticmethod
     @dump_args
@@ -494,27 +817,24 @@ class Rundeck(Scheduler):
                             config['SCHEDULER']['PROJECT_PROPERTIES_SOURCE'], properties.name)
             replace_in_file('__PROJECTS_HOME__', config['SCHEDULER']['PROJECTS_HOME'],
                             properties.name)
-            cmd = 'rd projects create'
-            cmd += ' --project ' + project_id
-            cmd += ' --file ' + properties.name
+            cmd = ['rd', 'projects', 'create', '--project', project_id, '--file', properties.name]
             Rundeck._exec_cmd_raise_err_if_fails(cmd)
 
         with NamedTemporaryFile() as acls:
             replace_in_file('__USERNAME__', project_id,
                             config['SCHEDULER']['PROJECT_ACLS_SOURCE'], acls.name)
-            cmd = 'rd projects acls create'
-            cmd += ' --project ' + project_id
-            cmd += ' --file ' + acls.name
-            cmd += ' --name ' + project_id + '.aclpolicy'
+            cmd = ['rd', 'projects', 'acls', 'create', '--project', project_id,
+                   '--file', acls.name, '--name', project_id + '.aclpolicy']
             Rundeck._exec_cmd_raise_err_if_fails(cmd)
 
         with NamedTemporaryFile() as system_acls:
             replace_in_file('__USERNAME__', project_id,
                             config['SCHEDULER']['SYSTEM_ACLS_SOURCE'], system_acls.name)
-            cmd = 'rd system acls create'
-            cmd += ' --file ' + system_acls.name
-            cmd += ' --name ' + project_id + '.aclpolicy'
+            cmd = ['rd', 'system', 'acls', 'create',
+                   '--file', system_acls.name, '--name', project_id + '.aclpolicy']
             Rundeck._exec_cmd_raise_err_if_fails(cmd)
+        # A new project has no job without metadata
+        Rundeck._mark_job_meta_complete(project_id, config)
 
     @dump_args
     def get_project_name(self):
@@ -525,6 +845,7 @@ class Rundeck(Scheduler):
         return {'message': self.project_id}
 
     @dump_args
+    @coalesce(lambda self: self.project_id)
     def get_project_users(self):
         '''
         Get a project's users.
@@ -573,6 +894,7 @@ class Rundeck(Scheduler):
         return payload
 
     @dump_args
+    @locked(lambda self, *args, **kwargs: self.project_id)
     def share_project(self, user, perms):
         '''
         Share project with another user.
@@ -632,6 +954,7 @@ class Rundeck(Scheduler):
         return payload
 
     @dump_args
+    @locked(lambda self, *args, **kwargs: self.project_id)
     def undo_share_project(self, user):
         '''
         Delete project share for user.
@@ -682,6 +1005,7 @@ class Rundeck(Scheduler):
 
     @staticmethod
     @dump_args
+    @locked(lambda project_id, config: project_id)
     def delete_project(project_id, config):
         '''
         Delete a project.
@@ -700,26 +1024,24 @@ class Rundeck(Scheduler):
         _delete_shareable_file(project_id, config)
         logging.debug(
             f'Deleting system ACL definition for {project_id}.aclpolicy')
-        cmd = 'rd system acls delete'
-        cmd += ' --name ' + project_id + '.aclpolicy'
+        cmd = ['rd', 'system', 'acls', 'delete', '--name', project_id + '.aclpolicy']
         Rundeck._exec_cmd_raise_err_if_fails(cmd)
         logging.debug(
             f'Deleting project ACL definition for {project_id}.aclpolicy')
-        cmd = 'rd projects acls delete'
-        cmd += ' --project ' + project_id
-        cmd += ' --name ' + project_id + '.aclpolicy'
+        cmd = ['rd', 'projects', 'acls', 'delete', '--project', project_id,
+               '--name', project_id + '.aclpolicy']
         Rundeck._exec_cmd_raise_err_if_fails(cmd)
-        cmd = 'rd projects delete'
-        cmd += ' --confirm'
-        cmd += ' --project ' + project_id
-        logging.debug("Executing command %s", cmd)
-        returncode, _, err = _execute_command(cmd)
+        cmd = ['rd', 'projects', 'delete', '--confirm', '--project', project_id]
+        returncode, _, err = Rundeck._execute(cmd)
         if returncode == 2:
             logging.debug(err)
             raise ProjectNotFoundError(err)
         if returncode != 0:
             logging.debug(err)
             raise RundeckError(err)
+        JOURNAL.drop(project_id)
+        jobs_meta, _ = _get_project_home_path(config, project_id, ConfigFilenames.JOBS_META)
+        shutil.rmtree(jobs_meta, ignore_errors=True)
         payload = {
             'message': 'successfully deleted',
             'name': project_id
@@ -742,7 +1064,7 @@ class Rundeck(Scheduler):
             return {'message': 'No projects have been shared with you yet.'}
 
         # Convert from object to YAML string
-        projects_permissions = yaml.dump(projects_permissions)
+        projects_permissions = yaml_dump(projects_permissions)
 
         logging.debug(
             f'Projects shareable for user {user}:\n{projects_permissions}')
@@ -760,8 +1082,7 @@ class Rundeck(Scheduler):
         :returns:             a dictionary containing the backend's response
         '''
         Rundeck._config(config)
-        cmd = 'rd projects list'
-        cmd += ' --outformat %name'
+        cmd = ['rd', 'projects', 'list', '--outformat', '%name']
         _, out, _ = Rundeck._exec_cmd_raise_err_if_fails(cmd)
         projects_list = out.split('\n')
         return projects_list
@@ -858,6 +1179,7 @@ class Rundeck(Scheduler):
         return self._create_update_job(job_id, schedule, target, command, description, is_create=False)
 
     @dump_args
+    @locked(lambda self, *args, **kwargs: self.project_id)
     def modify_job_meta(self, job_id, meta):
         '''
         Modify the meta of a job, like the description or if it is active.
@@ -871,23 +1193,39 @@ class Rundeck(Scheduler):
         payload = {'name': job_id}
         if 'enable' in meta:
             if meta.get('enable') == 'True':
-                cmd = 'rd jobs reschedule'
+                cmd = ['rd', 'jobs', 'reschedule']
                 payload['message'] = 'Job successfully enabled.'
             else:
-                cmd = 'rd jobs unschedule'
+                cmd = ['rd', 'jobs', 'unschedule']
                 payload['message'] = 'Job successfully disabled.'
 
-            cmd += ' --project ' + self.project_id
-            cmd += ' --job ' + job_id
+            cmd += ['--project', self.project_id, '--job', job_id]
             Rundeck._exec_cmd_raise_err_if_fails(
                 cmd, self.project_id, disable_check_job_found=False)
+            self._set_job_meta_enabled(meta.get('enable') == 'True', job_id)
+            self._journal(lambda: [(ACTION_UPDATE, job_id,
+                                    self.summarize_job(self._get_job(job_id)))])
 
         return payload
 
     @dump_args
+    @coalesce(lambda self, job_id: (self.project_id, job_id))
     def get_job(self, job_id):
         '''
         Get a job definition.
+        Identical concurrent requests share a single backend call.
+        :param job_id:                the unique job identifier corresponding to the job to update
+        :raises JobNotFoundError:     if the job doesn't exist
+        :raises ProjectNotFoundError: if the project doesn't exist
+        :raises RundeckError:         on unexpected Rundeck error
+        :returns:                     a dictionary containing the backend's response
+        '''
+        return self._get_job(job_id)
+
+    @dump_args
+    def _get_job(self, job_id):
+        '''
+        Get a job definition straight from the backend, e.g. right after modifying it.
         :param job_id:                the unique job identifier corresponding to the job to update
         :raises JobNotFoundError:     if the job doesn't exist
         :raises ProjectNotFoundError: if the project doesn't exist
@@ -895,15 +1233,12 @@ class Rundeck(Scheduler):
         :returns:                     a dictionary containing the backend's response
         '''
         with NamedTemporaryFile() as job_file:
-            cmd = 'rd jobs list'
-            cmd += ' --project ' + self.project_id
-            cmd += ' --jobxact ' + job_id
-            cmd += ' --file ' + job_file.name
-            cmd += ' --format yaml'
+            cmd = ['rd', 'jobs', 'list', '--project', self.project_id, '--jobxact', job_id,
+                   '--file', job_file.name, '--format', 'yaml']
             Rundeck._exec_cmd_raise_err_if_fails(
                 cmd, self.project_id)
 
-            job_properties = yaml.safe_load(job_file)
+            job_properties = yaml_load(job_file)
             if not job_properties:
                 logging.warning('Rundeck: user %s tries to access non existing job %s.',
                                 self.project_id, job_id)
@@ -911,6 +1246,7 @@ class Rundeck(Scheduler):
         return job_properties[0]
 
     @dump_args
+    @locked(lambda self, *args, **kwargs: self.project_id)
     def delete_job(self, job_id):
         '''
         Delete a job.
@@ -919,30 +1255,41 @@ class Rundeck(Scheduler):
         :raises RundeckError:     on unexpected Rundeck error
         :returns:                 a dictionary containing the backend's response
         '''
-        cmd = 'rd jobs purge --confirm'
-        cmd += ' --idlist ' + self.project_id + '-' + job_id
+        cmd = ['rd', 'jobs', 'purge', '--confirm', '--idlist', self.project_id + '-' + job_id]
         Rundeck._exec_cmd_raise_err_if_fails(
             cmd, self.project_id)
+        self._delete_job_meta(job_id)
+        self._journal(lambda: [(ACTION_DELETE, job_id, None)])
         payload = {'message': 'successfully deleted',
                    'name': job_id}
         return payload
 
     @dump_args
+    @coalesce(lambda self: self.project_id)
     def get_jobs(self):
         '''
         Get all job definitions in the current project.
+        Identical concurrent requests share a single backend call.
+        :raises ProjectNotFoundError: if the project doesn't exist
+        :raises RundeckError:         on unexpected Rundeck error
+        :returns:                     a dictionary containing the backend's response
+        '''
+        return self._get_jobs()
+
+    @dump_args
+    def _get_jobs(self):
+        '''
+        Get all job definitions straight from the backend, e.g. right after modifying them.
         :raises ProjectNotFoundError: if the project doesn't exist
         :raises RundeckError:         on unexpected Rundeck error
         :returns:                     a dictionary containing the backend's response
         '''
         with NamedTemporaryFile() as jobs_file:
-            cmd = 'rd jobs list'
-            cmd += ' --project ' + self.project_id
-            cmd += ' --file ' + jobs_file.name
-            cmd += ' --format yaml'
+            cmd = ['rd', 'jobs', 'list', '--project', self.project_id,
+                   '--file', jobs_file.name, '--format', 'yaml']
             Rundeck._exec_cmd_raise_err_if_fails(
                 cmd, self.project_id)
-            jobs_properties = yaml.safe_load(jobs_file)
+            jobs_properties = yaml_load(jobs_file)
         if not jobs_properties:
             payload = {
                 'message': 'No jobs found in project ' +
@@ -952,6 +1299,71 @@ class Rundeck(Scheduler):
         return payload
 
     @dump_args
+    def get_job_runs(self, job_id, count):
+        '''
+        Get the next times a job runs at, from its metadata without calling Rundeck.
+        :param job_id:            the unique job identifier
+        :param count:             the number of runs
+        :raises JobNotFoundError: if the job doesn't exist
+        :raises RundeckError:     on unexpected Rundeck error
+        :returns:                 a dictionary, see job_runs
+        '''
+        job = self._get_job_fields(job_id)
+        return job_runs(job, count, job['seconds'])
+
+    @dump_args
+    def get_jobs_revision(self):
+        '''
+        Get the revision of the journal of the project, without starting it.
+        :returns: the revision, None if the journal is disabled or not started yet
+        '''
+        return JOURNAL.revision(self.project_id)
+
+    @dump_args
+    def iter_jobs(self):
+        '''
+        Get all job definitions in the current project one by one. The listing is parsed
+        one job at a time: Rundeck writes a YAML sequence, whose items start with a dash
+        in the first column.
+        :raises ProjectNotFoundError: if the project doesn't exist
+        :raises RundeckError:         on unexpected Rundeck error
+        :returns:                     an iterator over the job definitions
+        '''
+        with NamedTemporaryFile('r') as jobs_file:
+            cmd = ['rd', 'jobs', 'list', '--project', self.project_id,
+                   '--file', jobs_file.name, '--format', 'yaml']
+            Rundeck._exec_cmd_raise_err_if_fails(
+                cmd, self.project_id)
+            lines = []
+            for line in jobs_file:
+                if line.startswith('-') and not line.startswith('---') and lines:
+                    yield from yaml_load(''.join(lines)) or []
+                    lines = []
+                lines.append(line)
+            if lines:
+                yield from yaml_load(''.join(lines)) or []
+
+    @staticmethod
+    def summarize_job(job_properties):
+        '''
+        Extract the fields shown to the users from a Rundeck job definition.
+        The crontab schedule is stored as the first five words of the description.
+        :param job_properties: a job definition, as returned by get_job or get_jobs
+        :returns:              a dictionary with the name, schedule, target, command,
+                               description and enabled keys
+        '''
+        description = job_properties['description'].split(' ')
+        return {
+            'name': job_properties['name'],
+            'schedule': ' '.join(description[0:5]),
+            'target': job_properties['nodefilters']['filter'].replace('name: ', ''),
+            'command': job_properties['sequence']['commands'][0]['exec'],
+            'description': ' '.join(description[5:]),
+            'enabled': job_properties['scheduleEnabled'],
+        }
+
+    @dump_args
+    @locked(lambda self, *args, **kwargs: self.project_id)
     def modify_all_jobs_meta(self, meta):
         '''
         Modify meta of all jobs in a project, like if the jobs are active.
@@ -962,18 +1374,22 @@ class Rundeck(Scheduler):
         '''
         if 'enable' in meta:
             if meta.get('enable') == 'True':
-                cmd = 'rd jobs reschedulebulk'
+                cmd = ['rd', 'jobs', 'reschedulebulk']
                 payload = {'message': 'All jobs successfully enabled.'}
             else:
-                cmd = 'rd jobs unschedulebulk'
+                cmd = ['rd', 'jobs', 'unschedulebulk']
                 payload = {'message': 'All jobs successfully disabled.'}
-            cmd += ' --project ' + self.project_id
-            cmd += f' --idlist {self._get_job_ids(self.project_id)} --confirm'
+            cmd += ['--project', self.project_id,
+                    '--idlist', self._get_job_ids(self.project_id), '--confirm']
             Rundeck._exec_cmd_raise_err_if_fails(
                 cmd, self.project_id)
+            self._set_job_meta_enabled(meta.get('enable') == 'True')
+            self._journal(lambda: [(ACTION_UPDATE, job['name'], job)
+                                   for job in self._job_summaries()])
         return payload
 
     @dump_args
+    @locked(lambda self: self.project_id)
     def delete_jobs(self):
         '''
         Delete all jobs in the current project.
@@ -981,13 +1397,129 @@ class Rundeck(Scheduler):
         :raises RundeckError:         on unexpected Rundeck error
         :returns:                     a dictionary containing the backend's response
         '''
-        cmd = f'rd jobs purge --project {self.project_id}'
-        cmd += f' --idlist {self._get_job_ids(self.project_id)} --confirm'
+        job_ids = self._get_job_ids(self.project_id)
+        cmd = ['rd', 'jobs', 'purge', '--project', self.project_id,
+               '--idlist', job_ids, '--confirm']
         Rundeck._exec_cmd_raise_err_if_fails(
             cmd, self.project_id)
+        self._delete_job_meta()
+        # Rundeck identifiers are the project name and job name, joined with a dash
+        self._journal(lambda: [(ACTION_DELETE, job_id[len(self.project_id) + 1:], None)
+                               for job_id in job_ids.split(',') if job_id])
         payload = {'message': 'All jobs successfully deleted.'}
         return payload
 
+    @dump_args
+    @locked(lambda self: self.project_id)
+    def export_project(self):
+        '''
+        Export the jobs, shares and nodes of the current project in a single archive.
+        The jobs are listed at once, under the lock of the project so that the archive
+        is consistent.
+        :raises ProjectNotFoundError: if the project doesn't exist
+        :raises RundeckError:         on unexpected Rundeck error
+        :returns:                     the archive, see acron.server.snapshot
+        '''
+        if not self._project_exists(self.project_id, self.config):
+            raise ProjectNotFoundError
+        jobs = []
+        for job_properties in self.iter_jobs():
+            job = self.summarize_job(job_properties)
+            job['seconds'] = int(job_properties['schedule']['crontab'].split(' ')[0])
+            jobs.append(job)
+        shares = {}
+        path = self._get_shareable_path()
+        if os.path.exists(path):
+            with open(path, OpenModes.READ) as shareable_file:
+                shares = yaml_load(shareable_file) or {}
+        logging.info('Rundeck: exporting %d job(s) of %s.', len(jobs), self.project_id)
+        return build_snapshot(self.project_id, jobs, shares, self._get_node_names())
+
+    # pylint: disable=R0914
+    @dump_args
+    @locked(lambda self, *args, **kwargs: self.project_id)
+    def import_project(self, snapshot):
+        '''
+        Restore the jobs, shares and nodes of an archive in the current project, possibly
+        exported from another project or server. All the jobs are loaded in a single call
+        to Rundeck, replacing the jobs of the same name. The other jobs are left as they are.
+        The shares with users unknown to Rundeck are skipped.
+        :param snapshot:      the content of the archive, as returned by read_snapshot
+        :raises RundeckError: on unexpected Rundeck error
+        :returns:             a dictionary containing the backend's response
+        '''
+        self._ensure_project_exists(self.project_id)
+        # Rundeck identifiers are the project name and job name, joined with a dash
+        existing = {job_id[len(self.project_id) + 1:]
+                    for job_id in self._get_job_ids(self.project_id).split(',') if job_id}
+
+        jobs = []
+        for job in snapshot['jobs']:
+            job = dict(job)
+            job[JobFields.TARGET] = fqdnify(job[JobFields.TARGET])
+            if not job[JobFields.DESCRIPTION].strip():
+                job[JobFields.DESCRIPTION] = ' No description given'
+            job['definition'] = self._render_job(
+                job[JobFields.NAME], job[JobFields.SCHEDULE], job[JobFields.TARGET],
+                job[JobFields.COMMAND], job[JobFields.DESCRIPTION], job['seconds'])
+            jobs.append(job)
+
+        nodes = set(self._get_node_names())
+        added_nodes = sorted((set(snapshot['nodes']) |
+                              {job[JobFields.TARGET] for job in jobs}) - nodes)
+        for target in added_nodes:
+            self._add_target_to_project(target)
+
+        if jobs:
+            # Each definition is a YAML sequence of a single job, together a sequence of all
+            with NamedTemporaryFile('w') as jobs_file:
+                jobs_file.write('\n'.join(job['definition'] for job in jobs))
+                jobs_file.flush()
+                cmd = ['rd', 'jobs', 'load', '--project', self.project_id,
+                       '--file', jobs_file.name, '--format', 'yaml', '--duplicate', 'update']
+                Rundeck._exec_cmd_raise_err_if_fails(cmd)
+            disabled = [self.project_id + '-' + job[JobFields.NAME]
+                        for job in jobs if not job[JobFields.ENABLED]]
+            if disabled:
+                cmd = ['rd', 'jobs', 'unschedulebulk', '--project', self.project_id,
+                       '--idlist', ','.join(disabled), '--confirm']
+                Rundeck._exec_cmd_raise_err_if_fails(cmd, self.project_id)
+        for job in jobs:
+            definition = job.pop('definition')
+            job['digest'] = hashlib.sha256(definition.encode('utf-8')).hexdigest()
+            self._write_job_meta(job[JobFields.NAME], job)
+
+        # Jobs named by the server must not be given again to new jobs
+        numbers = [int(job[JobFields.NAME][len('job'):]) for job in jobs
+                   if re.fullmatch(r'job\d{6}', job[JobFields.NAME])]
+        if numbers:
+            self._ensure_config_file_exists(ConfigFilenames.MAX_JOB_ID, default_value='0')
+            path, _ = self._get_project_home_path(self.project_id, ConfigFilenames.MAX_JOB_ID)
+            with open(path, OpenModes.READ_WRITE) as max_job_id_file:
+                max_job_id = max([int(max_job_id_file.read() or 0)] + numbers)
+                max_job_id_file.seek(0)
+                max_job_id_file.truncate()
+                max_job_id_file.write(str(max_job_id))
+
+        shares = {user: perms for user, perms in snapshot['shares'].items()
+                  if user != self.project_id and self._user_exists(user, self.config)}
+        if shares:
+            self._ensure_config_file_exists(ConfigFilenames.SHAREABLE, default_value='')
+            with open(self._get_shareable_path(), OpenModes.READ) as shareable_file:
+                user_acl_list = [line for line in shareable_file
+                                 if line.split(':')[0] not in shares]
+            self._overwrite_project_acl(
+                user_acl_list + [f'{user}: {perms}\n' for user, perms in sorted(shares.items())])
+
+        self._journal(lambda: [(ACTION_UPDATE if job[JobFields.NAME] in existing else ACTION_CREATE,
+                                job[JobFields.NAME], {key: job[key] for key in JobFields.ALL})
+                               for job in jobs])
+        logging.info('Rundeck: imported %d job(s), %d share(s) and %d node(s) in %s.',
+                     len(jobs), len(shares), len(added_nodes), self.project_id)
+        return {'message': f'Imported {len(jobs)} job(s), {len(shares)} share(s) and '
+                           f'{len(added_nodes)} node(s).',
+                'jobs': len(jobs), 'shares': len(shares), 'nodes': len(added_nodes)}
+
     @dump_args
     def is_shareable(self, user):
         '''
@@ -1014,7 +1546,7 @@ class Rundeck(Scheduler):
             logging.debug(
                 f'Path {path} exists. Proceeding to read its contents...')
             with open(path, OpenModes.READ) as shareable_file:
-                shareable_people = yaml.safe_load(shareable_file)
+                shareable_people = yaml_load(shareable_file)
                 if not shareable_people:
                     logging.debug(
                         f'File {path} is empty, ' + not_shareable_msg)
@@ -35,6 +35,9 @@ class ConfigFilenames:
     '''
     MAX_JOB_ID = 'max_job_id'
     SHAREABLE = 'shareable'
+    JOBS_META = 'jobs_meta'
+    JOBS_META_COMPLETE = 'jobs_meta/.complete'
+    RESOURCES = 'etc/resources.yaml'
 
 
 # pylint: disable=too-few-public-methods
@@ -0,0 +1,299 @@
+#
+# (C) Copyright 2022 CERN
+#
+# This software is distributed under the terms of the GNU General Public Licence version 3
+# (GPL Version 3), copied verbatim in the file "COPYING" /copied verbatim below.
+#
+# In applying this licence, CERN does not waive the privileges and immunities granted to it
+# by virtue of its status as an Intergovernmental Organization or submit itself to any jurisdiction.
+#
+'''Bounded and instrumented execution of backend commands'''
+
+import errno
+import fcntl
+import logging
+import os
+import signal
+import threading
+from subprocess import Popen, PIPE, TimeoutExpired
+from time import monotonic, sleep
+from acron.exceptions import CommandTimeoutError, ExecutorBusyError
+
+__author__ = 'Rodrigo Bermudez Schettino (CERN)'
+__credits__ = ['Rodrigo Bermudez Schettino (CERN)', 'Ulrich Schwickerath (CERN)']
+__maintainer__ = 'Rodrigo Bermudez Schettino (CERN)'
+__email__ = 'rodrigo.bermudez.schettino@cern.ch'
+__status__ = 'Development'
+
+
+# Interval in seconds between two attempts to grab a host-wide slot
+SLOT_POLL_INTERVAL = 0.05
+
+
+def _command_name(argv):
+    '''
+    Derive a short name from an argument list, used as key for the timings.
+
+    Example:
+        ['rd', 'jobs', 'list', '--project', 'foo'] -> 'rd jobs list'
+
+    :param argv: the command as argument list
+    :returns:    the leading non-option words of the command, at most three
+    '''
+    words = []
+    for arg in argv:
+        if arg.startswith('-') or len(words) == 3:
+            break
+        words.append(os.path.basename(arg) if not words else arg)
+    return ' '.join(words)
+
+
+class CommandStats:
+    '''
+    Timings of all executions of one command.
+    '''
+
+    def __init__(self):
+        ''' initialise counters '''
+        self.calls = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.total_wait = 0.0
+
+    def record(self, duration, wait, returncode=None, timed_out=False):
+        '''
+        Account for one execution.
+
+        :param duration:   seconds the command was running
+        :param wait:       seconds the command waited for a free worker
+        :param returncode: exit code of the command, None if it did not complete
+        :param timed_out:  True if the command was killed after its deadline
+        '''
+        self.calls += 1
+        self.total_time += duration
+        self.max_time = max(self.max_time, duration)
+        self.total_wait += wait
+        if timed_out:
+            self.timeouts += 1
+        elif returncode != 0:
+            self.failures += 1
+
+    def to_dict(self):
+        '''
+        :returns: the counters as a dictionary
+        '''
+        return {
+            'calls': self.calls,
+            'failures': self.failures,
+            'timeouts': self.timeouts,
+            'total_time': round(self.total_time, 3),
+            'avg_time': round(self.total_time / self.calls, 3) if self.calls else 0.0,
+            'max_time': round(self.max_time, 3),
+            'avg_wait': round(self.total_wait / self.calls, 3) if self.calls else 0.0,
+        }
+
+
+class CommandExecutor:
+    '''
+    Runs external commands with a global concurrency cap, a queue with a bounded waiting
+    time and a deadline per call. Commands are always given as argument lists and never go
+    through a shell.
+
+    The cap is enforced per process with a semaphore and, if a slots directory is
+    configured, across all the server processes of the host with one lock file per slot.
+    '''
+
+    def __init__(self, max_workers=8, timeout=120, queue_timeout=30, slots_dir=None):
+        '''
+        Constructor
+
+        :param max_workers:   maximum number of commands running in parallel
+        :param timeout:       default deadline in seconds of a command
+        :param queue_timeout: maximum time in seconds to wait for a free worker
+        :param slots_dir:     directory of the host-wide slot lock files, optional
+        '''
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.queue_timeout = queue_timeout
+        self.slots_dir = slots_dir
+        self._semaphore = threading.BoundedSemaphore(max_workers)
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._running = 0
+        self._stats = {}
+
+    def configure(self, config):
+        '''
+        Apply the EXECUTOR section of the server configuration.
+
+        :param config: a dictionary containing the executor config values
+        '''
+        self.max_workers = int(config.get('MAX_WORKERS', self.max_workers))
+        self.timeout = config.get('TIMEOUT', self.timeout)
+        self.queue_timeout = config.get('QUEUE_TIMEOUT', self.queue_timeout)
+        self.slots_dir = config.get('SLOTS_DIR', self.slots_dir)
+        self._semaphore = threading.BoundedSemaphore(self.max_workers)
+        if self.slots_dir:
+            os.makedirs(self.slots_dir, 0o0750, exist_ok=True)
+        logging.info('Executor configured with %d workers, %ss timeout, %ss queue timeout.',
+                     self.max_workers, self.timeout, self.queue_timeout)
+
+    @property
+    def waiting(self):
+        '''
+        :returns: the number of commands waiting for a free worker in this process
+        '''
+        return self._waiting
+
+    @property
+    def running(self):
+        '''
+        :returns: the number of commands currently running in this process
+        '''
+        return self._running
+
+    def _acquire_slot(self, deadline):
+        '''
+        Grab one of the host-wide slots.
+
+        :param deadline:           monotonic time after which to give up
+        :raises ExecutorBusyError: if no slot was freed before the deadline
+        :returns:                  the open file descriptor holding the slot
+        '''
+        while True:
+            for slot in range(self.max_workers):
+                path = os.path.join(self.slots_dir, 'slot.{}'.format(slot))
+                slot_fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o0640)
+                try:
+                    fcntl.flock(slot_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    return slot_fd
+                except OSError as error:
+                    os.close(slot_fd)
+                    if error.errno not in (errno.EAGAIN, errno.EACCES):
+                        raise
+            if monotonic() >= deadline:
+                raise ExecutorBusyError('No free host-wide slot to run the command')
+            sleep(SLOT_POLL_INTERVAL)
+
+    def _acquire(self):
+        '''
+        Wait for a free worker, in this process and on the host.
+
+        :raises ExecutorBusyError: if no worker was freed within the queue timeout
+        :returns:                  the host-wide slot, None if not configured
+        '''
+        deadline = monotonic() + self.queue_timeout
+        with self._lock:
+            self._waiting += 1
+        try:
+            if not self._semaphore.acquire(timeout=self.queue_timeout):
+                raise ExecutorBusyError('No free worker to run the command')
+            try:
+                return self._acquire_slot(deadline) if self.slots_dir else None
+            except BaseException:
+                self._semaphore.release()
+                raise
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+    def _release(self, slot_fd):
+        '''
+        Give back the worker and the host-wide slot.
+
+        :param slot_fd: the host-wide slot, None if not configured
+        '''
+        if slot_fd is not None:
+            os.close(slot_fd)
+        self._semaphore.release()
+
+    def _record(self, name, duration, wait, returncode=None, timed_out=False):
+        '''
+        Store the timings of an execution.
+        '''
+        with self._lock:
+            self._stats.setdefault(name, CommandStats()).record(
+                duration, wait, returncode, timed_out)
+
+    @staticmethod
+    def _kill(process):
+        '''
+        Kill the process and all its children, e.g. the JVM started by the rd wrapper.
+
+        :param process: the Popen instance to kill
+        '''
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        except PermissionError:
+            process.kill()
+
+    # pylint: disable=too-many-arguments
+    def execute(self, argv, timeout=None, input_data=None, env=None, name=None):
+        '''
+        Execute a command and wait for its completion.
+
+        :param argv:                the command as argument list
+        :param timeout:             deadline in seconds, defaults to the configured one
+        :param input_data:          string to send to the standard input of the command
+        :param env:                 environment of the command, defaults to the current one
+        :param name:                key for the timings, derived from argv if not given
+        :raises ExecutorBusyError:  if the command could not be started in time
+        :raises CommandTimeoutError: if the command did not complete in time and was killed
+        :returns:                   tuple of return code, standard output and standard error
+        '''
+        if isinstance(argv, str):
+            raise TypeError('Commands must be given as argument lists')
+        name = name or _command_name(argv)
+        timeout = self.timeout if timeout is None else timeout
+
+        queued = monotonic()
+        slot_fd = self._acquire()
+        started = monotonic()
+        with self._lock:
+            self._running += 1
+        try:
+            with Popen(argv,
+                       universal_newlines=True,
+                       stdin=PIPE if input_data is not None else None,
+                       stdout=PIPE,
+                       stderr=PIPE,
+                       env=env,
+                       start_new_session=True) as process:
+                try:
+                    out, err = process.communicate(input_data, timeout=timeout)
+                except TimeoutExpired as error:
+                    self._kill(process)
+                    process.communicate()
+                    self._record(name, monotonic() - started,
+                                 started - queued, timed_out=True)
+                    logging.error('%s killed after %s seconds.', name, timeout)
+                    raise CommandTimeoutError(
+                        '{} did not complete within {} seconds'.format(name, timeout)) from error
+        finally:
+            with self._lock:
+                self._running -= 1
+            self._release(slot_fd)
+
+        self._record(name, monotonic() - started,
+                     started - queued, process.returncode)
+        return process.returncode, out, err
+
+    def stats(self):
+        '''
+        :returns: a dictionary with the current load and the timings per command
+        '''
+        with self._lock:
+            return {
+                'max_workers': self.max_workers,
+                'running': self._running,
+                'waiting': self._waiting,
+                'commands': {name: stats.to_dict() for name, stats in self._stats.items()},
+            }
+
+
+# Executor shared by all the backends of the server process
+EXECUTOR = CommandExecutor()
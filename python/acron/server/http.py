@@ -9,8 +9,22 @@
 #
 '''HTTP payload handler'''
 
-from flask import jsonify
-from acron.constants import ReturnCodes
+import gzip
+import hashlib
+import zlib
+from flask import current_app, jsonify, request, stream_with_context
+from acron.constants import MimeTypes, ReturnCodes
+from acron.serialization import json_dumps, json_loads
+from acron.utils import format_crontab_entry
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+try:
+    from flask.json.provider import DefaultJSONProvider
+except ImportError:
+    # Flask < 2.2 has no pluggable JSON provider
+    DefaultJSONProvider = None
 
 __author__ = 'Philippe Ganz (CERN)'
 __credits__ = ['Philippe Ganz (CERN)', 'Ulrich Schwickerath (CERN)']
@@ -18,6 +32,34 @@ __maintainer__ = 'Philippe Ganz (CERN)'
 __email__ = 'philippe.ganz@cern.ch'
 __status__ = 'Development'
 
+# Bodies smaller than this are not worth compressing
+GZIP_MIN_SIZE = 1024
+# Rows of a stream compressed together before being flushed to the client
+STREAM_FLUSH_ROWS = 50
+
+
+def use_fast_json(app):
+    '''
+    Serialize the jsonify payloads with the JSON implementation of acron.serialization.
+
+    :param app: the Flask application
+    '''
+    if DefaultJSONProvider is None:
+        return
+
+    class FastJSONProvider(DefaultJSONProvider):
+        '''
+        Flask JSON provider backed by acron.serialization.
+        '''
+
+        def dumps(self, obj, **kwargs):
+            return json_dumps(obj, sort_keys=kwargs.get('sort_keys', False)).decode('utf-8')
+
+        def loads(self, s, **kwargs):
+            return json_loads(s)
+
+    app.json = FastJSONProvider(app)
+
 
 def generate_http_payload(status_code, message=None):
     '''
@@ -35,12 +77,166 @@ def generate_http_payload(status_code, message=None):
     return response
 
 
-def http_response(error):
+def negotiate(crontab=False, ndjson=False):
+    '''
+    Choose the media type of the response from the Accept header of the request,
+    JSON if the client has no preference.
+
+    :param crontab: True if the payload is a list of job summaries, which can be rendered
+                    as crontab entries
+    :param ndjson:  True if the payload is a list which can be streamed
+    :returns:       the media type of MimeTypes to use
+    '''
+    offers = [MimeTypes.JSON]
+    if msgpack is not None:
+        offers.append(MimeTypes.MSGPACK)
+    if ndjson:
+        offers.append(MimeTypes.NDJSON)
+    if crontab:
+        offers.append(MimeTypes.CRONTAB)
+    return request.accept_mimetypes.best_match(offers, default=MimeTypes.JSON)
+
+
+def _serialize(payload, mimetype):
+    '''
+    :param payload:  the data to serialize, a list of job summaries for crontab entries
+    :param mimetype: the media type of MimeTypes to serialize to
+    :returns:        the serialized payload
+    '''
+    if mimetype == MimeTypes.MSGPACK:
+        return msgpack.packb(payload, use_bin_type=True)
+    if mimetype == MimeTypes.CRONTAB:
+        return ''.join(format_crontab_entry(job) for job in payload).encode('utf-8')
+    return json_dumps(payload, sort_keys=True)
+
+
+def negotiated_response(payload, mimetype=None):
+    '''
+    Generates an HTTP payload in the media type preferred by the client.
+
+    :param payload:  the data to serialize
+    :param mimetype: the media type of MimeTypes to use, negotiated if not given
+    :returns:        an HTTP payload that can be returned to the client
+    '''
+    mimetype = mimetype or negotiate()
+    response = current_app.response_class(_serialize(payload, mimetype), mimetype=mimetype)
+    response.vary.add('Accept')
+    return response
+
+
+def conditional_response(payload, mimetype=None):
+    '''
+    Generates an HTTP payload in the media type preferred by the client, with a strong ETag
+    computed from its content. A 304 Not Modified without body is returned if the client
+    already has this content.
+
+    :param payload:  the data to serialize
+    :param mimetype: the media type of MimeTypes to use, negotiated if not given
+    :returns:        an HTTP payload that can be returned to the client
+    '''
+    mimetype = mimetype or negotiate()
+    body = _serialize(payload, mimetype)
+    etag = hashlib.sha256(body).hexdigest()
+    compress = len(body) >= GZIP_MIN_SIZE and 'gzip' in request.accept_encodings
+    if compress:
+        body = gzip.compress(body, compresslevel=6)
+        # Each encoding is a different representation, with its own strong ETag
+        etag += '-gzip'
+    response = current_app.response_class(body, mimetype=mimetype)
+    response.set_etag(etag)
+    if compress:
+        response.headers['Content-Encoding'] = 'gzip'
+    response.vary.update(['Accept', 'Accept-Encoding'])
+    # Clients may keep the payload but have to revalidate it on every use
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
+
+
+def version_etag(version, mimetype):
+    '''
+    Computes a strong ETag for a payload streamed before it can be hashed, from the version
+    of the data it is built from, the URL of the request and the representation.
+
+    :param version:  the version of the data, e.g. the revision of the jobs of a project
+    :param mimetype: the media type of MimeTypes of the payload
+    :returns:        the ETag
+    '''
+    etag = hashlib.sha256('{} {} {}'.format(version, request.full_path, mimetype)
+                          .encode('utf-8')).hexdigest()
+    if 'gzip' in request.accept_encodings:
+        # Each encoding is a different representation, with its own strong ETag
+        etag += '-gzip'
+    return etag
+
+
+def not_modified_response(etag):
+    '''
+    Generates a 304 Not Modified without body, for a client which has the payload already.
+
+    :param etag: the ETag of the payload
+    :returns:    an HTTP payload that can be returned to the client
+    '''
+    response = current_app.response_class(status=304)
+    response.set_etag(etag)
+    response.vary.update(['Accept', 'Accept-Encoding'])
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def streamed_response(rows, mimetype, etag=None):
+    '''
+    Generates an HTTP payload streaming rows as newline-delimited JSON, or as crontab
+    entries, gzip-compressed if the client accepts it. The rows are only produced while
+    the body is sent, so any error of the backend must have been raised before calling
+    this function.
+
+    :param rows:     iterable of the data to serialize, job summaries for crontab entries
+    :param mimetype: MimeTypes.NDJSON or MimeTypes.CRONTAB
+    :param etag:     the ETag of the payload, see version_etag, None if it cannot be kept
+    :returns:        an HTTP payload that can be returned to the client
+    '''
+    compress = 'gzip' in request.accept_encodings
+    if mimetype == MimeTypes.CRONTAB:
+        def render(row):
+            return format_crontab_entry(row).encode('utf-8')
+    else:
+        def render(row):
+            return json_dumps(row, sort_keys=True) + b'\n'
+
+    def generate():
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS) if compress else None
+        batch = []
+        for row in rows:
+            batch.append(render(row))
+            if len(batch) >= STREAM_FLUSH_ROWS:
+                data = b''.join(batch)
+                batch = []
+                # Flush the compressor so the client can render the rows already sent
+                yield (compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+                       if compressor else data)
+        data = b''.join(batch)
+        yield compressor.compress(data) + compressor.flush() if compressor else data
+
+    response = current_app.response_class(stream_with_context(generate()), mimetype=mimetype)
+    if compress:
+        response.headers['Content-Encoding'] = 'gzip'
+    response.vary.update(['Accept', 'Accept-Encoding'])
+    if etag is None:
+        response.headers['Cache-Control'] = 'private, no-store'
+    else:
+        response.set_etag(etag)
+        # Clients may keep the payload but have to revalidate it on every use
+        response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def http_response(error, retry_after=None):
     '''
     Returns ready-to-use HTTP payloads matching the given Acron error.
 
-    :param error: an Acron error of Errors type
-    :returns:     an HTTP payload that can be returned to the client
+    :param error:       an Acron error of Errors type
+    :param retry_after: seconds after which the client may retry, sent as Retry-After header
+    :returns:           an HTTP payload that can be returned to the client
     '''
     payload = None
 
@@ -60,9 +256,18 @@ access rights to the requested resource could not be verified. Please try again'
     # Used for status code 404
     msg_not_found = '''The resource you requested could not be found, \
 please verify your path and try again.'''
+    # Used for status code 410
+    msg_revision_expired = '''The changes since the revision you specified are no longer \
+available, please fetch all the jobs again.'''
+    # Used for status code 429
+    msg_rate_limited = '''You sent too many requests in a short time, \
+please slow down and try again later.'''
     # Used for status code 500
     msg_backend_error = '''The server was not able to process your request. \
 Please try again or open a ticket towards the Acron service if it persists.'''
+    # Used for status code 503
+    msg_backend_busy = '''The server is currently overloaded. \
+Please try again later.'''
     # Used for status code 520
     msg_unknown_error = 'Unknown error!'
 
@@ -74,7 +279,10 @@ Please try again or open a ticket towards the Acron service if it persists.'''
         ReturnCodes.NOT_ALLOWED: [403, msg_not_allowed],
         ReturnCodes.LDAP_ERROR: [403, msg_ldap_error],
         ReturnCodes.NOT_FOUND: [404, msg_not_found],
-        ReturnCodes.BACKEND_ERROR: [500, msg_backend_error]
+        ReturnCodes.REVISION_EXPIRED: [410, msg_revision_expired],
+        ReturnCodes.RATE_LIMITED: [429, msg_rate_limited],
+        ReturnCodes.BACKEND_ERROR: [500, msg_backend_error],
+        ReturnCodes.BACKEND_BUSY: [503, msg_backend_busy]
     }
 
     status_code_and_message = error_switcher.get(
@@ -84,5 +292,7 @@ Please try again or open a ticket towards the Acron service if it persists.'''
     message = status_code_and_message[1]
 
     payload = generate_http_payload(status_code, message)
+    if retry_after is not None:
+        payload.headers['Retry-After'] = str(retry_after)
 
     return payload
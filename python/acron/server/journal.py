@@ -0,0 +1,332 @@
+#
+# (C) Copyright 2022 CERN
+#
+# This software is distributed under the terms of the GNU General Public Licence version 3
+# (GPL Version 3), copied verbatim in the file "COPYING" /copied verbatim below.
+#
+# In applying this licence, CERN does not waive the privileges and immunities granted to it
+# by virtue of its status as an Intergovernmental Organization or submit itself to any jurisdiction.
+#
+'''Append-only journal of the job changes of each project'''
+
+import logging
+import os
+import shutil
+from tempfile import NamedTemporaryFile
+from time import time
+from acron.exceptions import RevisionExpiredError
+from acron.serialization import json_dumps, json_loads
+from acron.server.locks import PROJECT_LOCKS
+
+__author__ = 'Rodrigo Bermudez Schettino (CERN)'
+__credits__ = ['Rodrigo Bermudez Schettino (CERN)', 'Ulrich Schwickerath (CERN)']
+__maintainer__ = 'Rodrigo Bermudez Schettino (CERN)'
+__email__ = 'rodrigo.bermudez.schettino@cern.ch'
+__status__ = 'Development'
+
+
+# Actions recorded in the journal
+ACTION_CREATE = 'create'
+ACTION_UPDATE = 'update'
+ACTION_DELETE = 'delete'
+
+# Snapshot of the jobs the journal was compacted into
+BASE_FILE = 'base.json'
+# Prefix of the segment files, followed by the revision of their first entry
+SEGMENT_PREFIX = 'segment-'
+
+
+class JobJournal:
+    '''
+    Records every job mutation of a project with a monotonically increasing revision, so
+    that clients mirroring the jobs only fetch what changed since the revision they have.
+
+    The journal of a project is a directory of append-only segments of JSON lines.
+    When there are too many segments, the oldest ones are compacted into a snapshot
+    holding the last state of each job. Clients behind the snapshot have to resync.
+    The journal is written while holding the lock of the project, so revisions follow
+    the order of the mutations on all the server nodes.
+    '''
+
+    def __init__(self, journal_home=None, segment_size=1000, max_segments=8):
+        '''
+        Constructor
+
+        :param journal_home: directory of the journals on the shared file system, optional
+        :param segment_size: number of entries per segment
+        :param max_segments: number of segments kept before compacting the oldest ones
+        '''
+        self.journal_home = journal_home
+        self.segment_size = segment_size
+        self.max_segments = max_segments
+
+    def configure(self, config):
+        '''
+        Apply the journal settings of the scheduler configuration.
+
+        :param config: a dictionary containing the scheduler config values
+        '''
+        self.segment_size = config.get('JOURNAL_SEGMENT_SIZE', self.segment_size)
+        self.max_segments = max(2, config.get('JOURNAL_MAX_SEGMENTS', self.max_segments))
+        self.journal_home = config.get('JOURNAL_HOME')
+        if not self.journal_home and config.get('PROJECTS_HOME'):
+            self.journal_home = os.path.join(config['PROJECTS_HOME'], '.journal')
+        if self.journal_home:
+            os.makedirs(self.journal_home, 0o0750, exist_ok=True)
+        logging.info('Job journals stored in %s.', self.journal_home)
+
+    @property
+    def enabled(self):
+        '''
+        :returns: True if the job changes are recorded
+        '''
+        return bool(self.journal_home)
+
+    def _path(self, project_id, filename=''):
+        '''
+        :param project_id: identifier of the project
+        :param filename:   file of the journal of the project
+        :returns:          the path of the file, or of the journal directory
+        '''
+        return os.path.join(self.journal_home, project_id, filename)
+
+    def _segments(self, project_id):
+        '''
+        :param project_id: identifier of the project
+        :returns:          list of tuples of the first revision and the path of the segments,
+                           oldest first
+        '''
+        segments = []
+        for filename in os.listdir(self._path(project_id)):
+            if filename.startswith(SEGMENT_PREFIX):
+                segments.append((int(filename[len(SEGMENT_PREFIX):-len('.jsonl')]),
+                                 self._path(project_id, filename)))
+        return sorted(segments)
+
+    @staticmethod
+    def _read_segment(path):
+        '''
+        :param path: path of the segment
+        :returns:    list of the entries of the segment
+        '''
+        with open(path, 'rb') as segment:
+            # The last line may still be being appended when read without the lock
+            return [json_loads(line) for line in segment
+                    if line.strip() and line.endswith(b'\n')]
+
+    def _read_base(self, project_id):
+        '''
+        :param project_id: identifier of the project
+        :returns:          the snapshot of the project, with its revision and jobs
+        '''
+        with open(self._path(project_id, BASE_FILE), 'rb') as base:
+            return json_loads(base.read())
+
+    def _write_base(self, project_id, base):
+        '''
+        Replace atomically the snapshot of the project.
+
+        :param project_id: identifier of the project
+        :param base:       the snapshot, with its revision and jobs
+        '''
+        with NamedTemporaryFile('wb', dir=self._path(project_id), delete=False) as tmp:
+            tmp.write(json_dumps(base))
+        os.replace(tmp.name, self._path(project_id, BASE_FILE))
+
+    def _head(self, project_id, segments):
+        '''
+        :param project_id: identifier of the project
+        :param segments:   the segments of the project
+        :returns:          tuple of the revision of the last entry and the number of
+                           entries in the last segment
+        '''
+        if not segments:
+            return self._read_base(project_id)['revision'], self.segment_size
+        entries = self._read_segment(segments[-1][1])
+        if not entries:
+            return segments[-1][0] - 1, 0
+        return entries[-1]['revision'], len(entries)
+
+    def _ensure_exists(self, project_id, snapshot):
+        '''
+        Start the journal of a project from the current state of its jobs.
+
+        :param project_id: identifier of the project
+        :param snapshot:   function returning the summaries of the jobs of the project
+        '''
+        if os.path.exists(self._path(project_id, BASE_FILE)):
+            return
+        # The snapshot may call the backend, the lock is only taken to write it. A change
+        # recorded meanwhile is either in the snapshot or appended after it.
+        jobs = {job['name']: job for job in snapshot()}
+        with PROJECT_LOCKS.lock(project_id):
+            if os.path.exists(self._path(project_id, BASE_FILE)):
+                return
+            os.makedirs(self._path(project_id), 0o0750, exist_ok=True)
+            # Revisions of a journal started again, e.g. for a project created again with the
+            # same name, must not overlap with the ones clients got from the previous journal
+            self._write_base(project_id, {'revision': int(time() * 1000), 'jobs': jobs})
+        logging.info('Job journal of project %s started with %d jobs.', project_id, len(jobs))
+
+    def _compact(self, project_id, segments):
+        '''
+        Fold the oldest segments into the snapshot, keeping the last state of each job.
+
+        :param project_id: identifier of the project
+        :param segments:   the segments of the project
+        '''
+        base = self._read_base(project_id)
+        compacted = segments[:len(segments) - self.max_segments // 2]
+        for _, path in compacted:
+            for entry in self._read_segment(path):
+                if entry['action'] == ACTION_DELETE:
+                    base['jobs'].pop(entry['job_id'], None)
+                else:
+                    base['jobs'][entry['job_id']] = entry['job']
+                base['revision'] = entry['revision']
+        self._write_base(project_id, base)
+        for _, path in compacted:
+            os.remove(path)
+        logging.info('Job journal of project %s compacted up to revision %d.',
+                     project_id, base['revision'])
+
+    def record(self, project_id, changes, snapshot):
+        '''
+        Append job changes to the journal of the project.
+        A journal which cannot be written does not fail the mutation, which already happened.
+
+        :param project_id: identifier of the project
+        :param changes:    list of tuples of the action, the job identifier and the summary
+                           of the job, None if deleted
+        :param snapshot:   function returning the summaries of the jobs of the project,
+                           used to start the journal
+        '''
+        if not self.enabled or not changes:
+            return
+        try:
+            with PROJECT_LOCKS.lock(project_id):
+                self._ensure_exists(project_id, snapshot)
+                segments = self._segments(project_id)
+                revision, length = self._head(project_id, segments)
+                now = int(time())
+                lines = []
+                for action, job_id, job in changes:
+                    revision += 1
+                    if length >= self.segment_size:
+                        # The entries so far complete the last segment, named after its first
+                        if lines:
+                            self._append(project_id, segments[-1][0], lines)
+                        lines, length = [], 0
+                        segments.append((revision, None))
+                    lines.append({'revision': revision, 'time': now, 'action': action,
+                                  'job_id': job_id, 'job': job})
+                    length += 1
+                self._append(project_id, segments[-1][0], lines)
+                if len(segments) > self.max_segments:
+                    self._compact(project_id, self._segments(project_id))
+        except (OSError, ValueError) as error:
+            logging.error('Job journal of project %s could not be written: %s',
+                          project_id, error)
+
+    def _append(self, project_id, first_revision, entries):
+        '''
+        Append entries to a segment.
+
+        :param project_id:     identifier of the project
+        :param first_revision: revision of the first entry of the segment
+        :param entries:        the entries to append
+        '''
+        if not entries:
+            return
+        path = self._path(project_id, '{}{:012d}.jsonl'.format(SEGMENT_PREFIX, first_revision))
+        with open(path, 'ab') as segment:
+            segment.write(b''.join(json_dumps(entry, sort_keys=True) + b'\n'
+                                   for entry in entries))
+            segment.flush()
+            os.fsync(segment.fileno())
+
+    def _read_changes(self, project_id, since):
+        '''
+        Read the job changes of the project after a revision.
+
+        :param project_id:           identifier of the project
+        :param since:                the last revision known by the client
+        :raises RevisionExpiredError: if the changes after the revision were compacted,
+                                     or if the revision is unknown
+        :raises FileNotFoundError:   if the journal was compacted while being read
+        :returns:                    a dictionary with the current revision and the changes
+        '''
+        base = self._read_base(project_id)
+        segments = self._segments(project_id)
+        if segments and segments[0][0] > base['revision'] + 1:
+            # The snapshot read is older than the segments left by a compaction
+            raise FileNotFoundError(self._path(project_id, BASE_FILE))
+        head, _ = self._head(project_id, segments)
+        if since > head or 0 < since < base['revision']:
+            raise RevisionExpiredError(
+                'Revision {} of project {} is not available'.format(since, project_id))
+
+        latest = {}
+        if since < base['revision']:
+            for job_id, job in base['jobs'].items():
+                latest[job_id] = {'revision': base['revision'], 'action': ACTION_CREATE,
+                                  'job_id': job_id, 'job': job}
+        for index, (_, path) in enumerate(segments):
+            next_revision = segments[index + 1][0] if index + 1 < len(segments) else None
+            if next_revision is not None and next_revision <= since + 1:
+                continue
+            for entry in self._read_segment(path):
+                if since < entry['revision'] <= head:
+                    latest[entry['job_id']] = entry
+        return {'revision': head,
+                'changes': sorted(latest.values(), key=lambda entry: entry['revision'])}
+
+    def changes(self, project_id, since, snapshot):
+        '''
+        Get the job changes of the project after a revision. Only the last change of each
+        job is returned, in revision order. Revision 0 returns all the jobs.
+        The journal is read without the lock of the project, and read again with it if it
+        was compacted meanwhile.
+
+        :param project_id:           identifier of the project
+        :param since:                the last revision known by the client
+        :param snapshot:             function returning the summaries of the jobs of the
+                                     project, used to start the journal
+        :raises RevisionExpiredError: if the changes after the revision were compacted,
+                                     or if the revision is unknown
+        :returns:                    a dictionary with the current revision and the changes
+        '''
+        self._ensure_exists(project_id, snapshot)
+        try:
+            return self._read_changes(project_id, since)
+        except FileNotFoundError:
+            with PROJECT_LOCKS.lock(project_id):
+                return self._read_changes(project_id, since)
+
+    def revision(self, project_id):
+        '''
+        Get the revision of the last job change of the project, read without the lock.
+        A change being appended meanwhile may be missing, never one that is not done yet.
+
+        :param project_id: identifier of the project
+        :returns:          the revision, None if the journal is disabled or not started yet
+        '''
+        if not self.enabled:
+            return None
+        try:
+            return self._head(project_id, self._segments(project_id))[0]
+        except (OSError, ValueError):
+            return None
+
+    def drop(self, project_id):
+        '''
+        Remove the journal of a deleted project.
+
+        :param project_id: identifier of the project
+        '''
+        if self.enabled:
+            shutil.rmtree(self._path(project_id), ignore_errors=True)
+
+
+# Job journal of the server process
+JOURNAL = JobJournal()
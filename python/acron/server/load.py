@@ -0,0 +1,144 @@
+#
+# (C) Copyright 2022 CERN
+#
+# This software is distributed under the terms of the GNU General Public Licence version 3
+# (GPL Version 3), copied verbatim in the file "COPYING" /copied verbatim below.
+#
+# In applying this licence, CERN does not waive the privileges and immunities granted to it
+# by virtue of its status as an Intergovernmental Organization or submit itself to any jurisdiction.
+#
+'''Load of the scheduler: the runs of all the jobs starting in each minute or second of a window'''
+
+from collections import Counter
+from datetime import datetime, timedelta
+import numpy
+from acron.constants import JobFields
+from acron.cron import parse_schedule
+
+__author__ = 'Rodrigo Bermudez Schettino (CERN)'
+__credits__ = ['Rodrigo Bermudez Schettino (CERN)', 'Ulrich Schwickerath (CERN)']
+__maintainer__ = 'Rodrigo Bermudez Schettino (CERN)'
+__email__ = 'rodrigo.bermudez.schettino@cern.ch'
+__status__ = 'Development'
+
+
+# Days of the windows the runs are counted in
+WINDOWS = {'day': 1, 'week': 7}
+# Seconds of the slots the runs are counted in
+RESOLUTIONS = {'minute': 60, 'second': 1}
+
+MINUTES = numpy.arange(60)
+HOURS = numpy.arange(24)
+
+
+def parse_day(value):
+    '''
+    Read the first day of a window, like date.fromisoformat which Python 3.6 lacks.
+
+    :param value:       the day, YYYY-MM-DD
+    :raises ValueError: if the day is malformed
+    :returns:           the date
+    '''
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def run_minutes(schedule, start, days):
+    '''
+    Expand a schedule over a window at once, as the product of the masks of its fields.
+
+    :param schedule:    the schedule, in crontab format
+    :param start:       midnight of the first day of the window
+    :param days:        the number of days of the window
+    :raises ValueError: if the schedule is invalid
+    :returns:           the sorted array of the minutes of the window the schedule runs in
+    '''
+    cron = parse_schedule(schedule)
+    minutes = (cron.minutes >> MINUTES & 1).astype(bool)
+    hours = (cron.hours >> HOURS & 1).astype(bool)
+    dates = [start + timedelta(days=day) for day in range(days)]
+    runs_on = numpy.array([bool(cron.months >> date.month & 1 and
+                                cron.days_of_month(date.year, date.month) >> date.day & 1)
+                           for date in dates])
+    mask = runs_on[:, None, None] & hours[None, :, None] & minutes[None, None, :]
+    return numpy.flatnonzero(mask)
+
+
+def load_histogram(jobs, start, window='day', resolution='minute', top=10):
+    '''
+    Count the runs of the jobs starting in each slot of a window, overall and per target.
+    The jobs sharing a schedule are expanded once.
+
+    :param jobs:       the enabled and disabled jobs, dictionaries with the schedule,
+                       target and enabled keys and the second of the minute they run at
+    :param start:      midnight of the first day of the window
+    :param window:     day or week
+    :param resolution: minute or second
+    :param top:        the number of slots and targets reported
+    :returns:          a dictionary with the busiest slots overall, the busiest slot of the
+                       busiest targets and the numbers of jobs, runs and invalid schedules
+    '''
+    days, step = WINDOWS[window], RESOLUTIONS[resolution]
+    slots = days * 86400 // step
+    groups = Counter()
+    for job in jobs:
+        if job[JobFields.ENABLED]:
+            seconds = job['seconds'] if step == 1 else 0
+            groups[(job[JobFields.SCHEDULE], seconds, job[JobFields.TARGET])] += 1
+    targets = sorted({target for _, _, target in groups})
+    target_index = {target: index for index, target in enumerate(targets)}
+
+    expanded, invalid = {}, 0
+    offsets, owners, weights = [], [], []
+    for (schedule, seconds, target), count in groups.items():
+        if schedule not in expanded:
+            try:
+                expanded[schedule] = run_minutes(schedule, start, days)
+            except ValueError:
+                # Stored before the schedules were checked like Quartz reads them
+                expanded[schedule] = numpy.empty(0, dtype=numpy.int64)
+                invalid += count
+        runs = expanded[schedule] * (60 // step) + seconds
+        offsets.append(runs)
+        owners.append(numpy.full(len(runs), target_index[target]))
+        weights.append(numpy.full(len(runs), count))
+    offsets = numpy.concatenate(offsets) if offsets else numpy.empty(0, dtype=numpy.int64)
+    owners = numpy.concatenate(owners) if owners else numpy.empty(0, dtype=numpy.int64)
+    weights = numpy.concatenate(weights) if weights else numpy.empty(0, dtype=numpy.int64)
+
+    def slot_time(slot):
+        return (start + timedelta(seconds=int(slot) * step)).isoformat()
+
+    # Busiest slots overall, the earliest first on a tie
+    per_slot = numpy.bincount(offsets, weights=weights, minlength=slots).astype(numpy.int64)
+    busiest = numpy.lexsort((numpy.arange(slots), -per_slot))[:top]
+    busiest_slots = [{'time': slot_time(slot), 'runs': int(per_slot[slot])}
+                     for slot in busiest if per_slot[slot]]
+
+    # Busiest slot of each target, from the slots in which the target has runs only
+    busiest_targets = []
+    if len(offsets):
+        keys, inverse = numpy.unique(owners * slots + offsets, return_inverse=True)
+        runs = numpy.bincount(inverse, weights=weights).astype(numpy.int64)
+        key_targets, key_slots = keys // slots, keys % slots
+        order = numpy.lexsort((key_slots, -runs, key_targets))
+        _, firsts = numpy.unique(key_targets[order], return_index=True)
+        peaks = order[firsts]
+        totals = numpy.bincount(owners, weights=weights, minlength=len(targets))
+        for peak in sorted(peaks, key=lambda peak: (-runs[peak], key_targets[peak]))[:top]:
+            busiest_targets.append({
+                JobFields.TARGET: targets[key_targets[peak]],
+                'time': slot_time(key_slots[peak]),
+                'runs': int(runs[peak]),
+                'total': int(totals[key_targets[peak]]),
+            })
+
+    return {
+        'start': start.isoformat(),
+        'window': window,
+        'resolution': resolution,
+        'jobs': sum(groups.values()),
+        'invalid': invalid,
+        'runs': int(weights.sum()),
+        'slots': busiest_slots,
+        'targets': busiest_targets,
+    }
@@ -0,0 +1,192 @@
+#
+# (C) Copyright 2022 CERN
+#
+# This software is distributed under the terms of the GNU General Public Licence version 3
+# (GPL Version 3), copied verbatim in the file "COPYING" /copied verbatim below.
+#
+# In applying this licence, CERN does not waive the privileges and immunities granted to it
+# by virtue of its status as an Intergovernmental Organization or submit itself to any jurisdiction.
+#
+'''Per-project locking of the mutations'''
+
+import errno
+import fcntl
+import functools
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from time import monotonic, sleep
+from acron.exceptions import LockTimeoutError
+
+__author__ = 'Rodrigo Bermudez Schettino (CERN)'
+__credits__ = ['Rodrigo Bermudez Schettino (CERN)', 'Ulrich Schwickerath (CERN)']
+__maintainer__ = 'Rodrigo Bermudez Schettino (CERN)'
+__email__ = 'rodrigo.bermudez.schettino@cern.ch'
+__status__ = 'Development'
+
+
+# Interval in seconds between two attempts to grab the lock file of a project
+LOCK_POLL_INTERVAL = 0.05
+
+
+class _ProjectLock:
+    '''
+    Lock of one project held by the threads of this process.
+    '''
+
+    def __init__(self):
+        ''' initialise a free lock '''
+        self.thread_lock = threading.RLock()
+        self.depth = 0
+        self.lock_fd = None
+
+
+class ProjectLockManager:
+    '''
+    Serializes the writers of a project, while different projects proceed in parallel.
+
+    Within a process the writers queue on a re-entrant lock per project, across processes
+    and server nodes they hold a POSIX lock on a file per project in a directory of the
+    shared file system. Waiting is bounded, so a stuck writer cannot block the others forever.
+    '''
+
+    def __init__(self, locks_home=None, timeout=30):
+        '''
+        Constructor
+
+        :param locks_home: directory of the lock files on the shared file system, optional
+        :param timeout:    maximum time in seconds to wait for a project lock
+        '''
+        self.locks_home = locks_home
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._locks = {}
+        self._stats = {'acquired': 0, 'timeouts': 0, 'total_wait': 0.0, 'max_wait': 0.0}
+
+    def configure(self, config):
+        '''
+        Apply the locking settings of the scheduler configuration.
+
+        :param config: a dictionary containing the scheduler config values
+        '''
+        self.timeout = config.get('LOCK_TIMEOUT', self.timeout)
+        self.locks_home = config.get('LOCKS_HOME')
+        if not self.locks_home and config.get('PROJECTS_HOME'):
+            self.locks_home = os.path.join(config['PROJECTS_HOME'], '.locks')
+        if self.locks_home:
+            os.makedirs(self.locks_home, 0o0750, exist_ok=True)
+        logging.info('Project locks stored in %s with %ss timeout.',
+                     self.locks_home, self.timeout)
+
+    def _get(self, project_id):
+        '''
+        :param project_id: identifier of the project
+        :returns:          the lock of the project in this process
+        '''
+        with self._lock:
+            return self._locks.setdefault(project_id, _ProjectLock())
+
+    def _lock_file(self, project_id, deadline):
+        '''
+        Grab the lock file of the project, shared by all processes and nodes.
+
+        :param project_id:        identifier of the project
+        :param deadline:          monotonic time after which to give up
+        :raises LockTimeoutError: if the lock was not released before the deadline
+        :returns:                 the open file descriptor holding the lock
+        '''
+        path = os.path.join(self.locks_home, project_id + '.lock')
+        lock_fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o0640)
+        while True:
+            try:
+                fcntl.lockf(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return lock_fd
+            except OSError as error:
+                if error.errno not in (errno.EAGAIN, errno.EACCES):
+                    os.close(lock_fd)
+                    raise
+            if monotonic() >= deadline:
+                os.close(lock_fd)
+                raise LockTimeoutError(
+                    'Project {} is locked by another process'.format(project_id))
+            sleep(LOCK_POLL_INTERVAL)
+
+    def _record(self, wait, timed_out=False):
+        '''
+        Store the time spent waiting for a lock.
+        '''
+        with self._lock:
+            if timed_out:
+                self._stats['timeouts'] += 1
+                return
+            self._stats['acquired'] += 1
+            self._stats['total_wait'] += wait
+            self._stats['max_wait'] = max(self._stats['max_wait'], wait)
+
+    @contextmanager
+    def lock(self, project_id):
+        '''
+        Hold the lock of the project for the duration of the context.
+        A thread already holding the lock can enter again.
+
+        :param project_id:        identifier of the project
+        :raises LockTimeoutError: if the lock could not be acquired within the timeout
+        '''
+        project_lock = self._get(project_id)
+        start = monotonic()
+        deadline = start + self.timeout
+        if not project_lock.thread_lock.acquire(timeout=self.timeout):
+            self._record(monotonic() - start, timed_out=True)
+            raise LockTimeoutError(
+                'Project {} is locked by another request'.format(project_id))
+        try:
+            if project_lock.depth == 0 and self.locks_home:
+                project_lock.lock_fd = self._lock_file(project_id, deadline)
+        except BaseException:
+            project_lock.thread_lock.release()
+            self._record(monotonic() - start, timed_out=True)
+            raise
+        project_lock.depth += 1
+        self._record(monotonic() - start)
+        try:
+            yield
+        finally:
+            project_lock.depth -= 1
+            if project_lock.depth == 0 and project_lock.lock_fd is not None:
+                os.close(project_lock.lock_fd)
+                project_lock.lock_fd = None
+            project_lock.thread_lock.release()
+
+    def stats(self):
+        '''
+        :returns: a dictionary with the lock wait timings of this process
+        '''
+        with self._lock:
+            acquired = self._stats['acquired']
+            return {
+                'acquired': acquired,
+                'timeouts': self._stats['timeouts'],
+                'avg_wait': round(self._stats['total_wait'] / acquired, 3) if acquired else 0.0,
+                'max_wait': round(self._stats['max_wait'], 3),
+            }
+
+
+# Project locks of the server process
+PROJECT_LOCKS = ProjectLockManager()
+
+
+def locked(project):
+    '''
+    Decorator running the function while holding the lock of a project.
+
+    :param project: function mapping the arguments of the call to the project identifier
+    :returns:       the decorator
+    '''
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with PROJECT_LOCKS.lock(project(*args, **kwargs)):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,68 @@
+#
+# (C) Copyright 2022 CERN
+#
+# This software is distributed under the terms of the GNU General Public Licence version 3
+# (GPL Version 3), copied verbatim in the file "COPYING" /copied verbatim below.
+#
+# In applying this licence, CERN does not waive the privileges and immunities granted to it
+# by virtue of its status as an Intergovernmental Organization or submit itself to any jurisdiction.
+#
+'''Second of the minute the jobs run at, spread to smooth the load of the scheduler and targets'''
+
+from collections import Counter
+import hashlib
+from acron.constants import JobFields
+from acron.cron import parse_schedule
+
+__author__ = 'Rodrigo Bermudez Schettino (CERN)'
+__credits__ = ['Rodrigo Bermudez Schettino (CERN)', 'Ulrich Schwickerath (CERN)']
+__maintainer__ = 'Rodrigo Bermudez Schettino (CERN)'
+__email__ = 'rodrigo.bermudez.schettino@cern.ch'
+__status__ = 'Development'
+
+
+def preferred_second(project_id, job_id):
+    '''
+    :param project_id: identifier of the project of the job
+    :param job_id:     the unique job identifier
+    :returns:          a second spread uniformly over the minute, the same for a given job.
+                       Jobs named alike in different projects get different seconds.
+    '''
+    digest = hashlib.sha256((project_id + '/' + job_id).encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % 60
+
+
+def share_minutes(schedule, other):
+    '''
+    :param schedule: a schedule, in crontab format
+    :param other:    another schedule
+    :returns:        True if the schedules may run in the same minute, their days not
+                     being compared
+    '''
+    try:
+        cron, other_cron = parse_schedule(schedule), parse_schedule(other)
+    except ValueError:
+        return False
+    return bool(cron.minutes & other_cron.minutes and cron.hours & other_cron.hours and
+                cron.months & other_cron.months)
+
+
+def place_job(project_id, job_id, schedule, target, jobs):
+    '''
+    Choose the second of the minute a job runs at: the one taken by the fewest jobs running
+    in the same minutes on the same target, searched from the preferred second of the job.
+    The same job placed among the same jobs always gets the same second.
+
+    :param project_id: identifier of the project of the job
+    :param job_id:     the unique job identifier
+    :param schedule:   the schedule of the job, in crontab format
+    :param target:     the node on which the job is executed, FQDN
+    :param jobs:       the other jobs, dictionaries with the name, schedule and target keys
+                       and the second of the minute they run at
+    :returns:          the second, 0 to 59
+    '''
+    taken = Counter(job['seconds'] for job in jobs
+                    if job[JobFields.TARGET] == target and job[JobFields.NAME] != job_id
+                    and share_minutes(schedule, job[JobFields.SCHEDULE]))
+    first = preferred_second(project_id, job_id)
+    return min(((first + offset) % 60 for offset in range(60)), key=lambda second: taken[second])
@@ -0,0 +1,309 @@
+#
+# (C) Copyright 2022 CERN
+#
+# This software is distributed under the terms of the GNU General Public Licence version 3
+# (GPL Version 3), copied verbatim in the file "COPYING" /copied verbatim below.
+#
+# In applying this licence, CERN does not waive the privileges and immunities granted to it
+# by virtue of its status as an Intergovernmental Organization or submit itself to any jurisdiction.
+#
+'''Capacity of the scheduler and targets: the executions of all the jobs simulated over a window'''
+
+from datetime import timedelta
+import heapq
+import re
+import numpy
+from acron.constants import JobFields
+from acron.utils import fqdnify
+from acron.server.load import WINDOWS, run_minutes
+from acron.server.placement import place_job
+
+__author__ = 'Rodrigo Bermudez Schettino (CERN)'
+__credits__ = ['Rodrigo Bermudez Schettino (CERN)', 'Ulrich Schwickerath (CERN)']
+__maintainer__ = 'Rodrigo Bermudez Schettino (CERN)'
+__email__ = 'rodrigo.bermudez.schettino@cern.ch'
+__status__ = 'Development'
+
+
+# Line of the executions log written by ssh_run, the user being the project
+EXECUTION = re.compile(r'^\S+ \S+ \S+\s+(?P<project>\S+) @ (?P<target>\S+) returned -?\d+ '
+                       r'after (?P<duration>[0-9.]+) seconds\. Command: (?P<command>.*)$')
+# Jobs are killed by Rundeck after an hour
+MAX_DURATION = 3600
+# Duration of the jobs never run, when the log is empty
+DEFAULT_DURATION = 60
+# Executions run at the same time by the scheduler, as the thread pool of Rundeck
+DEFAULT_WORKERS = 10
+# Project of the jobs added to the plan without one
+WHAT_IF_PROJECT = 'what-if'
+
+
+def read_durations(lines, percentile=50):
+    '''
+    Summarize the durations of the past executions, per project, target and command.
+
+    :param lines:      the lines of the executions log
+    :param percentile: the percentile of the durations taken, 50 for the median
+    :returns:          a dictionary of the durations in seconds, by project, target and command,
+                       and the same percentile over all the executions, None without any
+    '''
+    durations = {}
+    for line in lines:
+        execution = EXECUTION.match(line.rstrip('\n'))
+        if execution is not None:
+            key = (execution['project'], execution['target'], execution['command'])
+            durations.setdefault(key, []).append(float(execution['duration']))
+    if not durations:
+        return {}, None
+    overall = numpy.percentile(numpy.concatenate(
+        [numpy.array(values) for values in durations.values()]), percentile)
+    return ({key: float(numpy.percentile(values, percentile))
+             for key, values in durations.items()}, float(overall))
+
+
+def load_added_jobs(document, jobs, domain=None):
+    '''
+    Read the jobs added to the plan, in the format of jobs apply. Each job may also have the
+    project it is added to and its expected duration in seconds. The jobs are given the second
+    of the minute the server would place them at.
+
+    :param document:    the list of jobs, or a mapping with the list under the jobs key
+    :param jobs:        the existing jobs, with the project and the second of the minute
+    :param domain:      the domain appended to the targets that are not FQDNs
+    :raises ValueError: if a job is not well-formed
+    :returns:           the list of the added jobs, in the format of the existing ones
+    '''
+    if isinstance(document, dict):
+        document = document.get('jobs')
+    if not isinstance(document, list):
+        raise ValueError('The added jobs must be a list.')
+    by_project = {}
+    for job in jobs:
+        by_project.setdefault(job['project'], []).append(job)
+    added = []
+    for index, entry in enumerate(document):
+        if not isinstance(entry, dict) or not all(
+                entry.get(key) for key in ('job_id', JobFields.SCHEDULE, JobFields.TARGET)):
+            raise ValueError(f'Job number {index + 1} needs a job_id, a schedule and a target.')
+        target = str(entry[JobFields.TARGET])
+        if domain:
+            target = fqdnify(target, domain)
+        duration = entry.get('duration')
+        if duration is not None and (isinstance(duration, bool) or
+                                     not isinstance(duration, (int, float)) or duration <= 0):
+            raise ValueError(f'Job number {index + 1}: the duration must be a number of seconds.')
+        project_id = str(entry.get('project', WHAT_IF_PROJECT))
+        job = {
+            'project': project_id,
+            JobFields.NAME: str(entry['job_id']),
+            JobFields.SCHEDULE: str(entry[JobFields.SCHEDULE]),
+            JobFields.TARGET: target,
+            JobFields.COMMAND: str(entry.get(JobFields.COMMAND, '')),
+            JobFields.ENABLED: bool(entry.get(JobFields.ENABLED, True)),
+            'duration': duration,
+        }
+        neighbours = by_project.setdefault(project_id, [])
+        job['seconds'] = place_job(project_id, job[JobFields.NAME], job[JobFields.SCHEDULE],
+                                   target, neighbours)
+        neighbours.append(job)
+        added.append(job)
+    return added
+
+
+def peak_concurrency(starts, ends, owners, first, last):
+    '''
+    Sweep the starts and ends of the executions at once, per owner. An execution ending when
+    another starts does not overlap it.
+
+    :param starts: the start times of the executions, in seconds
+    :param ends:   their end times
+    :param owners: the index of the owner of each execution, e.g. its target
+    :param first:  the first second the peaks are searched in
+    :param last:   the second the peaks are searched until, excluded
+    :returns:      the owners with executions in the search window, their peak numbers of
+                   concurrent executions and the second each peak is first reached
+    '''
+    # A single key sorts by owner, then time, then the ends before the starts
+    span = int(ends.max()) + 1
+    keys = numpy.concatenate(((owners * span + starts) * 2 + 1, (owners * span + ends) * 2))
+    keys.sort()
+    steps = (keys & 1) * 2 - 1
+    # Every execution of an owner ends before the next owner, so the sum restarts from zero
+    running = numpy.cumsum(steps)
+    keys, running = keys[steps > 0] // 2, running[steps > 0]
+    key_owners, times = keys // span, keys % span
+    inside = (times >= first) & (times < last)
+    key_owners, times, running = key_owners[inside], times[inside], running[inside]
+    peaks = numpy.lexsort((times, -running, key_owners))
+    peak_owners, firsts = numpy.unique(key_owners[peaks], return_index=True)
+    return peak_owners, running[peaks[firsts]], times[peaks[firsts]]
+
+
+def queue_delays(starts, durations, workers):
+    '''
+    Delay of the executions queued first in, first out behind a limited number of workers.
+    Only the executions from the times all the workers get busy until the queue is empty again
+    are simulated one by one.
+
+    :param starts:    the sorted start times of the executions, in seconds
+    :param durations: their durations
+    :param workers:   the number of executions run at the same time
+    :returns:         the delay of each execution, in seconds
+    '''
+    delays = numpy.zeros(len(starts), dtype=numpy.int64)
+    ends = starts + durations
+    # Executions running when each one starts, if none were delayed
+    running = (numpy.arange(1, len(starts) + 1) -
+               numpy.searchsorted(numpy.sort(ends), starts, side='right'))
+    congested = numpy.flatnonzero(running > workers)
+    start_list, duration_list, count = starts.tolist(), durations.tolist(), len(starts)
+    replace = heapq.heapreplace
+    index, idle = (int(congested[0]) if len(congested) else count), 0
+    while index < count:
+        # The workers are all busy with executions run since the queue was last empty,
+        # none of them delayed
+        previous = ends[idle:index]
+        busy = previous[previous > starts[index]].tolist()
+        latest = max(busy)
+        busy += [0] * (workers - len(busy))
+        heapq.heapify(busy)
+        first, waits = index, []
+        while index < count and start_list[index] < latest:
+            start = start_list[index]
+            begin = busy[0]
+            if begin < start:
+                begin = start
+            end = begin + duration_list[index]
+            replace(busy, end)
+            if end > latest:
+                latest = end
+            waits.append(begin - start)
+            index += 1
+        delays[first:index] = waits
+        # The queue is empty, nothing is delayed until the workers are all busy again
+        idle = index
+        later = numpy.searchsorted(congested, index)
+        index = int(congested[later]) if later < len(congested) else count
+    return delays
+
+
+def plan_capacity(jobs, start, window='day', durations=None, default_duration=None,
+                  workers=(DEFAULT_WORKERS,), top=10):
+    '''
+    Simulate the executions of the enabled jobs over a window, overall on the scheduler and per
+    target. The runs of the previous day still running when the window starts are included.
+    The jobs sharing a schedule are expanded once.
+
+    :param jobs:             the jobs, dictionaries with the project, schedule, target, command
+                             and enabled keys, the second of the minute they run at and
+                             optionally their duration
+    :param start:            midnight of the first day of the window
+    :param window:           day or week
+    :param durations:        the durations of the past executions, by project, target and
+                             command
+    :param default_duration: the duration of the jobs that never ran
+    :param workers:          the numbers of workers of the scheduler the queueing is simulated
+                             for, the delays being averaged over the delayed runs
+    :param top:              the number of targets reported
+    :returns:                a dictionary with the peak of concurrent executions of the
+                             scheduler, the delays for each number of workers, the busiest
+                             targets and the numbers of jobs, runs and invalid schedules
+    '''
+    durations = durations or {}
+    if default_duration is None:
+        default_duration = DEFAULT_DURATION
+    days = WINDOWS[window]
+    first, last = 86400, (days + 1) * 86400
+    origin = start - timedelta(days=1)
+
+    targets, target_index = [], {}
+    expanded, invalid, count, estimated = {}, 0, 0, 0
+    offsets, lengths, owners = [], [], []
+    for job in jobs:
+        if not job[JobFields.ENABLED]:
+            continue
+        count += 1
+        schedule, target = job[JobFields.SCHEDULE], job[JobFields.TARGET]
+        if schedule not in expanded:
+            try:
+                expanded[schedule] = run_minutes(schedule, origin, days + 1) * 60
+            except ValueError:
+                # Stored before the schedules were checked like Quartz reads them
+                expanded[schedule] = None
+        if expanded[schedule] is None:
+            invalid += 1
+            continue
+        duration = job.get('duration')
+        if duration is None:
+            duration = durations.get((job['project'], target, job[JobFields.COMMAND]))
+        if duration is None:
+            duration = default_duration
+            estimated += 1
+        if target not in target_index:
+            target_index[target] = len(targets)
+            targets.append(target)
+        runs = expanded[schedule] + job['seconds']
+        offsets.append(runs)
+        lengths.append(numpy.full(len(runs), min(max(int(numpy.ceil(duration)), 1),
+                                                 MAX_DURATION)))
+        owners.append(numpy.full(len(runs), target_index[target]))
+    starts = numpy.concatenate(offsets) if offsets else numpy.empty(0, dtype=numpy.int64)
+    lengths = numpy.concatenate(lengths) if lengths else numpy.empty(0, dtype=numpy.int64)
+    owners = numpy.concatenate(owners) if owners else numpy.empty(0, dtype=numpy.int64)
+
+    # Runs of the previous day ending before the window starts play no part
+    kept = starts + lengths > first
+    starts, lengths, owners = starts[kept], lengths[kept], owners[kept]
+    order = numpy.argsort(starts, kind='stable')
+    starts, lengths, owners = starts[order], lengths[order], owners[order]
+    ends = starts + lengths
+    inside = starts >= first
+
+    def slot_time(second):
+        return (origin + timedelta(seconds=int(second))).isoformat()
+
+    scheduler = {'peak': 0, 'time': None, 'busy': int(lengths[inside].sum())}
+    if inside.any():
+        _, peak, when = peak_concurrency(starts, ends, numpy.zeros(len(starts),
+                                                                   dtype=numpy.int64),
+                                         first, last)
+        scheduler.update(peak=int(peak[0]), time=slot_time(when[0]))
+
+    queues = []
+    for limit in workers:
+        delays = queue_delays(starts, lengths, limit)[inside]
+        delayed = delays[delays > 0]
+        queues.append({
+            'workers': limit,
+            'delayed': len(delayed),
+            'max_delay': int(delayed.max()) if len(delayed) else 0,
+            'mean_delay': round(float(delayed.mean()), 1) if len(delayed) else 0.0,
+        })
+
+    busiest_targets = []
+    if inside.any():
+        peak_owners, peaks, times = peak_concurrency(starts, ends, owners, first, last)
+        totals = numpy.bincount(owners[inside], minlength=len(targets))
+        busy = numpy.bincount(owners[inside], weights=lengths[inside], minlength=len(targets))
+        for index in sorted(range(len(peak_owners)),
+                            key=lambda index: (-peaks[index], targets[peak_owners[index]]))[:top]:
+            owner = peak_owners[index]
+            busiest_targets.append({
+                JobFields.TARGET: targets[owner],
+                'peak': int(peaks[index]),
+                'time': slot_time(times[index]),
+                'runs': int(totals[owner]),
+                'busy': int(busy[owner]),
+            })
+
+    return {
+        'start': start.isoformat(),
+        'window': window,
+        'jobs': count,
+        'invalid': invalid,
+        'estimated': estimated,
+        'runs': int(inside.sum()),
+        'scheduler': scheduler,
+        'queues': queues,
+        'targets': busiest_targets,
+    }
@@ -0,0 +1,186 @@
+#
+# (C) Copyright 2022 CERN
+#
+# This software is distributed under the terms of the GNU General Public Licence version 3
+# (GPL Version 3), copied verbatim in the file "COPYING" /copied verbatim below.
+#
+# In applying this licence, CERN does not waive the privileges and immunities granted to it
+# by virtue of its status as an Intergovernmental Organization or submit itself to any jurisdiction.
+#
+'''Rate limiting and backpressure in front of the backends'''
+
+import logging
+import math
+import threading
+from collections import OrderedDict
+from time import monotonic
+from flask import request
+from acron.constants import ReturnCodes
+from acron.server.executor import EXECUTOR
+from acron.server.http import http_response
+
+__author__ = 'Rodrigo Bermudez Schettino (CERN)'
+__credits__ = ['Rodrigo Bermudez Schettino (CERN)', 'Ulrich Schwickerath (CERN)']
+__maintainer__ = 'Rodrigo Bermudez Schettino (CERN)'
+__email__ = 'rodrigo.bermudez.schettino@cern.ch'
+__status__ = 'Development'
+
+
+# Blueprints whose requests reach the backends
+LIMITED_BLUEPRINTS = ['creds', 'jobs', 'project', 'projects']
+
+
+class TokenBucket:
+    '''
+    Allows bursts of up to capacity requests, refilled at rate requests per second.
+    '''
+
+    def __init__(self, rate, capacity):
+        '''
+        Constructor
+
+        :param rate:     number of tokens added per second
+        :param capacity: maximum number of tokens
+        '''
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = monotonic()
+
+    def _refill(self, now):
+        '''
+        Add the tokens earned since the last update.
+
+        :param now: the current monotonic time
+        '''
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now):
+        '''
+        :param now: the current monotonic time
+        :returns:   seconds until a token is available, 0 if one is available now
+        '''
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        '''
+        Consume a token, which must be available.
+        '''
+        self.tokens -= 1
+
+
+class RateLimiter:
+    '''
+    Token buckets per user and for the whole server process. The user buckets are kept in
+    a bounded LRU, forgetting a user only resets their bucket to full.
+    '''
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, user_rate=2, user_burst=20, global_rate=50, global_burst=200,
+                 max_users=10000):
+        '''
+        Constructor
+
+        :param user_rate:    sustained requests per second allowed for one user
+        :param user_burst:   requests one user can send at once
+        :param global_rate:  sustained requests per second allowed for all users
+        :param global_burst: requests all users can send at once
+        :param max_users:    maximum number of user buckets kept in memory
+        '''
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.max_users = max_users
+        self._global = TokenBucket(global_rate, global_burst)
+        self._users = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _user_bucket(self, user):
+        '''
+        :param user: the user sending the request
+        :returns:    the bucket of the user, created full if unknown
+        '''
+        bucket = self._users.pop(user, None)
+        if bucket is None:
+            bucket = TokenBucket(self.user_rate, self.user_burst)
+            if len(self._users) >= self.max_users:
+                self._users.popitem(last=False)
+        self._users[user] = bucket
+        return bucket
+
+    def acquire(self, user):
+        '''
+        Account for a request of the user, if both the user and the server have budget left.
+
+        :param user: the user sending the request
+        :returns:    0 if the request is allowed, the seconds to wait before retrying otherwise
+        '''
+        with self._lock:
+            now = monotonic()
+            user_bucket = self._user_bucket(user)
+            wait = max(user_bucket.wait_time(now), self._global.wait_time(now))
+            if wait:
+                return wait
+            user_bucket.take()
+            self._global.take()
+            return 0
+
+
+class Throttle:
+    '''
+    Rejects the requests of the backend blueprints with 429 when a user or the server sends
+    too many of them, and with 503 when the backend commands queue up in the executor.
+    '''
+
+    def __init__(self):
+        ''' initialise a disabled throttle '''
+        self.limiter = None
+        self.max_queue = None
+        self.retry_after = 5
+
+    def init_app(self, app):
+        '''
+        Read the RATE_LIMIT section of the configuration and hook into the application.
+
+        :param app: the Flask application
+        '''
+        config = app.config.get('RATE_LIMIT', {})
+        if config.get('ENABLED', True):
+            self.limiter = RateLimiter(user_rate=config.get('USER_RATE', 2),
+                                       user_burst=config.get('USER_BURST', 20),
+                                       global_rate=config.get('GLOBAL_RATE', 50),
+                                       global_burst=config.get('GLOBAL_BURST', 200),
+                                       max_users=config.get('MAX_USERS', 10000))
+        self.max_queue = config.get('MAX_QUEUE')
+        self.retry_after = config.get('RETRY_AFTER', self.retry_after)
+        app.before_request(self.check)
+
+    def check(self):
+        '''
+        Flask before_request hook.
+
+        :returns: None to let the request through, an HTTP payload to reject it
+        '''
+        if request.blueprint not in LIMITED_BLUEPRINTS:
+            return None
+
+        if self.max_queue is not None and EXECUTOR.waiting >= self.max_queue:
+            logging.warning('%s on %s: rejected, %d backend commands queued.',
+                            request.remote_user, request.path, EXECUTOR.waiting)
+            return http_response(ReturnCodes.BACKEND_BUSY, retry_after=self.retry_after)
+
+        if self.limiter is not None:
+            wait = self.limiter.acquire(request.remote_user)
+            if wait:
+                logging.warning('%s on %s: rate limited for %.1f seconds.',
+                                request.remote_user, request.path, wait)
+                return http_response(ReturnCodes.RATE_LIMITED, retry_after=math.ceil(wait))
+
+        return None
+
+
+# Throttle of the server process
+THROTTLE = Throttle()
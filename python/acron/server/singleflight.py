@@ -0,0 +1,122 @@
+#
+# (C) Copyright 2022 CERN
+#
+# This software is distributed under the terms of the GNU General Public Licence version 3
+# (GPL Version 3), copied verbatim in the file "COPYING" /copied verbatim below.
+#
+# In applying this licence, CERN does not waive the privileges and immunities granted to it
+# by virtue of its status as an Intergovernmental Organization or submit itself to any jurisdiction.
+#
+'''Coalescing of identical concurrent backend reads'''
+
+import copy
+import functools
+import logging
+import threading
+
+__author__ = 'Rodrigo Bermudez Schettino (CERN)'
+__credits__ = ['Rodrigo Bermudez Schettino (CERN)', 'Ulrich Schwickerath (CERN)']
+__maintainer__ = 'Rodrigo Bermudez Schettino (CERN)'
+__email__ = 'rodrigo.bermudez.schettino@cern.ch'
+__status__ = 'Development'
+
+
+class _Call:
+    '''
+    A backend call in flight, shared by all the callers asking for the same key.
+    '''
+
+    def __init__(self):
+        ''' initialise an empty call '''
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+
+
+def _copy_error(error):
+    '''
+    :param error: the exception raised by a call
+    :returns:     a copy of the exception without its traceback, the exception itself if it
+                  cannot be copied
+    '''
+    try:
+        return copy.copy(error)
+    except Exception:  # pylint: disable=broad-except
+        return error
+
+
+class SingleFlight:
+    '''
+    Makes sure that only one call per key is in flight at any time. Callers arriving
+    while the call is running wait for it and get a copy of its result, or its exception.
+    '''
+
+    def __init__(self):
+        ''' initialise the table of calls in flight '''
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func, *args, **kwargs):
+        '''
+        Execute func unless a call with the same key is already in flight.
+
+        :param key:  hashable identifying the call
+        :param func: the function to call
+        :returns:    the result of the call, copied for the callers that joined it
+        :raises:     the exception raised by the call
+        '''
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.followers += 1
+
+        if not leader:
+            logging.debug('Joining backend call in flight for %s.', key)
+            call.done.wait()
+            if call.error is not None:
+                # Each caller raises its own exception, the traceback stays with the leader
+                raise _copy_error(call.error) from None
+            return copy.deepcopy(call.result)
+
+        result = None
+        try:
+            result = func(*args, **kwargs)
+            return result
+        except Exception as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            if call.followers and call.error is None:
+                # Copied before the leader gets the result, which its caller may modify
+                call.result = copy.deepcopy(result)
+            call.done.set()
+            if call.followers:
+                logging.debug('Backend call for %s shared with %d callers.',
+                              key, call.followers)
+
+
+# Calls in flight of the server process
+FLIGHTS = SingleFlight()
+
+
+def coalesce(key):
+    '''
+    Decorator sharing one backend call between identical concurrent callers.
+
+    :param key: function mapping the arguments of the call to the part of the key
+                that identifies it, the name of the decorated function is prepended
+    :returns:   the decorator
+    '''
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            flight_key = (func.__qualname__, key(*args, **kwargs))
+            return FLIGHTS.do(flight_key, func, *args, **kwargs)
+        return wrapper
+    return decorator
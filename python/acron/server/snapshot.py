@@ -0,0 +1,105 @@
+#
+# (C) Copyright 2022 CERN
+#
+# This software is distributed under the terms of the GNU General Public Licence version 3
+# (GPL Version 3), copied verbatim in the file "COPYING" /copied verbatim below.
+#
+# In applying this licence, CERN does not waive the privileges and immunities granted to it
+# by virtue of its status as an Intergovernmental Organization or submit itself to any jurisdiction.
+#
+'''Archives of the jobs, shares and nodes of a project, to back it up or move it'''
+
+import gzip
+import zlib
+from io import BytesIO
+from time import time
+from acron.constants import JobFields, ProjectPerms
+from acron.exceptions import ArgsMalformedError
+from acron.serialization import json_dumps, json_loads
+from acron.utils import (check_command, check_description, check_job_id, check_schedule,
+                         check_target, check_user_id)
+
+__author__ = 'Rodrigo Bermudez Schettino (CERN)'
+__credits__ = ['Rodrigo Bermudez Schettino (CERN)', 'Ulrich Schwickerath (CERN)']
+__maintainer__ = 'Rodrigo Bermudez Schettino (CERN)'
+__email__ = 'rodrigo.bermudez.schettino@cern.ch'
+__status__ = 'Development'
+
+
+# Version of the format of the archives, increased on incompatible changes
+SNAPSHOT_VERSION = 1
+# Largest archive accepted once decompressed, in bytes
+MAX_SNAPSHOT_SIZE = 64 * 1024 * 1024
+
+
+def build_snapshot(project_id, jobs, shares, nodes):
+    '''
+    Build the archive of a project: a single gzip-compressed JSON document.
+
+    :param project_id: identifier of the project
+    :param jobs:       the job summaries, with the second of the minute they run at
+    :param shares:     a dictionary of the permissions of the users the project is shared with
+    :param nodes:      the names of the nodes in the registry of the project
+    :returns:          the archive
+    '''
+    document = {
+        'version': SNAPSHOT_VERSION,
+        'project': project_id,
+        'created': int(time()),
+        'jobs': [{key: job[key] for key in JobFields.ALL + ['seconds']} for job in jobs],
+        'shares': shares,
+        'nodes': sorted(nodes),
+    }
+    # gzip.compress only takes the mtime from Python 3.8, a fixed one keeps archives comparable
+    archive = BytesIO()
+    with gzip.GzipFile(fileobj=archive, mode='wb', compresslevel=6, mtime=0) as gzip_file:
+        gzip_file.write(json_dumps(document))
+    return archive.getvalue()
+
+
+def _check_job(job):
+    '''
+    Validate a job of an archive like the arguments of a job creation.
+
+    :param job:             the job
+    :raises AssertionError: if a field is missing or has a wrong value
+    '''
+    check_job_id(job[JobFields.NAME])
+    check_schedule(job[JobFields.SCHEDULE])
+    check_target(job[JobFields.TARGET])
+    check_command(job[JobFields.COMMAND])
+    if job[JobFields.DESCRIPTION].strip():
+        check_description(job[JobFields.DESCRIPTION])
+    assert isinstance(job[JobFields.ENABLED], bool)
+    assert isinstance(job['seconds'], int) and 0 <= job['seconds'] < 60
+
+
+def read_snapshot(data):
+    '''
+    Decompress and validate an archive built by build_snapshot.
+
+    :param data:                the archive
+    :raises ArgsMalformedError: if it is not an archive, too large or has invalid content
+    :returns:                   a dictionary with the project, jobs, shares and nodes keys
+    '''
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    try:
+        document = decompressor.decompress(data, MAX_SNAPSHOT_SIZE)
+    except zlib.error as error:
+        raise ArgsMalformedError('not a project archive') from error
+    if decompressor.unconsumed_tail:
+        raise ArgsMalformedError('project archive too large')
+    try:
+        snapshot = json_loads(document)
+        assert snapshot['version'] == SNAPSHOT_VERSION
+        for job in snapshot['jobs']:
+            _check_job(job)
+        assert len({job[JobFields.NAME] for job in snapshot['jobs']}) == len(snapshot['jobs'])
+        for user, perms in snapshot['shares'].items():
+            check_user_id(user)
+            assert perms in ProjectPerms.ALL
+        for node in snapshot['nodes']:
+            check_target(node)
+    except (AssertionError, AttributeError, KeyError, TypeError, ValueError) as error:
+        raise ArgsMalformedError('invalid project archive') from error
+    return snapshot
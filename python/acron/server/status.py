@@ -0,0 +1,134 @@
+#
+# (C) Copyright 2022 CERN
+#
+# This software is distributed under the terms of the GNU General Public Licence version 3
+# (GPL Version 3), copied verbatim in the file "COPYING" /copied verbatim below.
+#
+# In applying this licence, CERN does not waive the privileges and immunities granted to it
+# by virtue of its status as an Intergovernmental Organization or submit itself to any jurisdiction.
+#
+'''Background probing of the backend status'''
+
+import logging
+import threading
+from time import monotonic
+from acron.exceptions import SchedulerError
+
+__author__ = 'Rodrigo Bermudez Schettino (CERN)'
+__credits__ = ['Rodrigo Bermudez Schettino (CERN)', 'Ulrich Schwickerath (CERN)']
+__maintainer__ = 'Rodrigo Bermudez Schettino (CERN)'
+__email__ = 'rodrigo.bermudez.schettino@cern.ch'
+__status__ = 'Development'
+
+
+class StatusProber:
+    '''
+    Keeps the last backend status in memory, refreshed by a background thread at a fixed
+    interval, so that the health checks polling the server do not reach the backend.
+    '''
+
+    def __init__(self, interval=30, max_age=90):
+        '''
+        Constructor
+
+        :param interval: seconds between two probes of the backend
+        :param max_age:  seconds after which a cached status is not served anymore
+        '''
+        self.interval = interval
+        self.max_age = max_age
+        self._app = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sample = None
+
+    def init_app(self, app):
+        '''
+        Read the STATUS section of the configuration.
+        The prober thread is only started on first use, so that it runs in the process
+        serving the requests even if the application is created before forking.
+
+        :param app: the Flask application
+        '''
+        config = app.config.get('STATUS', {})
+        self.interval = config.get('PROBE_INTERVAL', self.interval)
+        self.max_age = config.get('MAX_AGE', 3 * self.interval)
+        self._app = app
+
+    def refresh(self):
+        '''
+        Fetch the status from the backend and store it.
+
+        :raises SchedulerError: if the backend could not tell its status
+        :returns:               the status of the backend
+        '''
+        # pylint: disable=import-outside-toplevel
+        from acron.server.api.utils import get_scheduler_class
+        try:
+            status = get_scheduler_class().backend_status(self._app.config)
+        except SchedulerError as error:
+            self.store(None, error)
+            raise
+        self.store(status)
+        return status
+
+    def _run(self):
+        '''
+        Main loop of the prober thread.
+        '''
+        logging.info('Backend status prober started, probing every %s seconds.', self.interval)
+        with self._app.app_context():
+            while not self._stop.is_set():
+                try:
+                    self.refresh()
+                except SchedulerError as error:
+                    logging.error('Backend status probe failed: %s', error)
+                except Exception:  # pylint: disable=broad-except
+                    logging.exception('Backend status probe crashed.')
+                self._stop.wait(self.interval)
+
+    def _ensure_started(self):
+        '''
+        Start the prober thread if it is not running in this process.
+        '''
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='acron-status-prober',
+                                                daemon=True)
+                self._thread.start()
+
+    def store(self, status, error=None):
+        '''
+        Remember the outcome of a probe.
+
+        :param status: the status of the backend, None if the probe failed
+        :param error:  the error raised by the probe, if any
+        '''
+        with self._lock:
+            self._sample = (status, error, monotonic())
+
+    def get(self):
+        '''
+        :returns: tuple of the last status, the error of the last probe and the age in seconds
+                  of the sample, or None if no fresh enough sample is available
+        '''
+        if self._app is not None:
+            self._ensure_started()
+        with self._lock:
+            if self._sample is None:
+                return None
+            status, error, timestamp = self._sample
+        age = monotonic() - timestamp
+        if age > self.max_age:
+            return None
+        return status, error, age
+
+    def stop(self):
+        '''
+        Stop the prober thread.
+        '''
+        self._stop.set()
+
+
+# Prober of the server process
+STATUS_PROBER = StatusProber()
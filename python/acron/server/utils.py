@@ -14,18 +14,16 @@ import inspect
 import logging
 import os
 import re
-from random import randint
-from subprocess import Popen, PIPE
 from socket import gethostbyaddr
 from flask import current_app, request
 import ldap3
 
 from acron.constants import ReturnCodes
-from acron.exceptions import KdestroyError, KinitError
+from acron.cron import parse_schedule
+from acron.exceptions import CredsError, ExecutorError, KdestroyError, KinitError
 from acron.utils import fqdnify as ext_fqdnify
-from acron.utils import krb_init_keytab as ext_krb_init_keytab
-from acron.utils import krb_destroy as ext_krb_destroy
 from acron.server.constants import ConfigFilenames
+from acron.server.executor import EXECUTOR
 
 __author__ = 'Philippe Ganz (CERN)'
 __credits__ = ['Philippe Ganz (CERN)', 'Ulrich Schwickerath (CERN)',
@@ -173,12 +171,15 @@ def krb_init_keytab(keytab, principal):
     :param principal:   the principal to use with the keytab
     :returns:           OK if the initialization succeeded
     :raises KinitError: raises an exception if the initialization failed
+    :raises CredsError: raises an exception if kinit could not be run to completion
     '''
     try:
-        ext_krb_init_keytab(keytab, principal)
-    except KinitError as error:
-        logging.debug('Kerberos initialization with keytab failed. %s', error)
-        raise KinitError from error
+        returncode, _, err = _execute_command(['kinit', '-kt', keytab, principal])
+    except ExecutorError as error:
+        raise CredsError(error) from error
+    if returncode != 0:
+        logging.debug('Kerberos initialization with keytab failed. %s', err)
+        raise KinitError(err)
     return ReturnCodes.OK
 
 
@@ -189,11 +190,16 @@ def krb_destroy(cachefile):
 
     :raises KdestroyError: raises an exception if the destruction failed
     '''
+    cmd = ['kdestroy', '-q']
+    if cachefile:
+        cmd += ['-c', cachefile]
     try:
-        ext_krb_destroy(cachefile)
-    except KdestroyError as error:
-        logging.debug('Kerberos destruction failed. %s', error)
-        raise KdestroyError from error
+        returncode, _, err = _execute_command(cmd)
+    except ExecutorError as error:
+        raise KdestroyError(error) from error
+    if returncode != 0:
+        logging.debug('Kerberos destruction failed. %s', err)
+        raise KdestroyError(err)
     return ReturnCodes.OK
 
 
@@ -211,48 +217,38 @@ def create_parent(path):
 
 
 @dump_args
-def _cron2quartz(schedule):
+def _cron2quartz(schedule, seconds):
     '''
     Convert cron schedule to quartz
 
     :param schedule: Schedule in cron format
+    :param seconds:  Second of the minute to run at, see acron.server.placement
     :returns: Schedule in quartz format
     '''
-    fields = re.split(r'\s+', schedule)
-    if fields[2] == '*':
-        if fields[4] == '*':
-            # flaw: if both all monthdays and all weekdays are specified, weekday should be?
-            fields[4] = '?'
-        else:
-            if fields[4] != '?':
-                fields[2] = '?'
-
-    # we fix the year to be '*' and the second to be random between 10s
-    return ' '.join([str(randint(0, 10))] + fields + ['*'])
+    # we fix the year to be '*', and exactly one of the day of month and day of week to be '?'
+    return parse_schedule(schedule).to_quartz(seconds)
 
 
 @dump_args
-def _execute_command(cmd):
+def _execute_command(cmd, timeout=None, input_data=None, name=None):
     '''
-    Open subprocess and execute command
-
-    :param cmd: Command to execute as string
-    :returns: Tuple of return code and error message, if any
+    Execute a command through the bounded executor of the server
+
+    :param cmd:                 Command to execute as list of arguments
+    :param timeout:             Deadline in seconds, defaults to the configured one
+    :param input_data:          String to send to the standard input of the command
+    :param name:                Key of the command in the metrics, derived from cmd if not given
+    :raises ExecutorError:      If the command could not be run to completion
+    :returns: Tuple of return code, output and error message, if any
     '''
-    logging.debug('Popen: %s', cmd)
-    cmdargs = cmd.split()
-    with Popen(cmdargs,
-               universal_newlines=True,
-               stdout=PIPE,
-               stderr=PIPE,
-               shell=False) as process:
-        out, err = process.communicate()
-        logging.debug(out.rstrip('\n'))
-
-    if process.returncode != 0:
+    logging.debug('Executing: %s', cmd)
+    returncode, out, err = EXECUTOR.execute(cmd, timeout=timeout, input_data=input_data, name=name)
+    logging.debug(out.rstrip('\n'))
+
+    if returncode != 0:
         logging.error(err)
 
-    return process.returncode, out, err
+    return returncode, out, err
 
 
 @dump_args
@@ -14,6 +14,8 @@ import getpass
 import re
 import logging
 from subprocess import Popen, PIPE
+from acron.constants import JobFields
+from acron.cron import parse_schedule
 from acron.exceptions import GPGError, KdestroyError, KlistError, KinitError, KTUtilError
 
 __author__ = 'Philippe Ganz (CERN)'
@@ -440,35 +442,13 @@ def replace_in_file(pattern, replace, source, destination=None):
 
 
 def check_schedule(schedule):
-    """ check the format of the given schedule """
+    """ check the format of the given schedule, compiled once by acron.cron """
     sched_fields = schedule.split(' ')
     assert len(sched_fields) == 5
-    months = ["JAN", "FEB", "MAR", "APR", "MAI", "JUN",
-              "JUL", "AUG", "SEP", "OCT", "NOV", "DEC"]
-    weekdays = ["SUN", "MON", "TUE", "WED", "THU", "FRI", "SAT"]
-
-    minutes = r"[0-5]?\d"
-    hours = r"[0-1]?\d|2[0-3]"
-    day_of_month = r"[LW]|\?|0?[1-9]|[1-2][0-9]|3[0-1]|"+"|".join(weekdays)
-    month = r"0?[0-9]|1[0,1]|"+"|".join(months)
-    day_of_week = r"[LW]|\?|[1-7](#[1-7])?|"+"|".join(weekdays)
-    basicfield = r"(\*|((%s)(-(%s))?))(\/(0\d|[1-9]\d?))?"
-    field = r"(%s)(,(%s))*" % (basicfield, basicfield)
-    total = []
-    # Let's add an additional syntax check here, or even fix it.
-    if day_of_month != '*':
-        if day_of_week == '*':
-            day_of_week = '?'
-            logging.info('WARNING: replacing * by ? for day of week')
-    if day_of_week not in ['*', '?']:
-        if day_of_month == '*':
-            day_of_month = '?'
-            logging.info('WARNING: replacing * by ? for day of month')
-    for term in minutes, hours, day_of_month, month, day_of_week:
-        total.append(field % (term, term, term, term))
-    valid_chars = re.compile(r"^"+r'\s'.join(total)+"$",
-                             re.IGNORECASE)  # pylint: disable=no-member
-    assert valid_chars.match(schedule)
+    try:
+        parse_schedule(schedule)
+    except ValueError as error:
+        raise AssertionError(str(error)) from error
 
 
 def check_target(target):
@@ -508,3 +488,17 @@ def check_job_id(job_id):
     valid_chars = re.compile(
         r'^[a-zA-Z0-9\-]+$', flags=re.A)  # pylint: disable=no-member
     assert valid_chars.match(job_id)
+
+
+def format_crontab_entry(job):
+    '''
+    Render a job the way it is shown to the users, close to a crontab entry: the description
+    as a comment, then the name, schedule, target and command, commented out if disabled.
+
+    :param job: the summary of the job, with the fields of JobFields
+    :returns:   the two lines of the entry
+    '''
+    return ('#' + job[JobFields.DESCRIPTION] + '\n' +
+            ('#' if not job[JobFields.ENABLED] else '') + job[JobFields.NAME] + ': ' +
+            job[JobFields.SCHEDULE] + ' ' + job[JobFields.TARGET] + ' ' +
+            job[JobFields.COMMAND] + '\n')
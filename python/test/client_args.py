@@ -0,0 +1,64 @@
+# (C) Copyright 2022 CERN
+#
+# This software is distributed under the terms of the GNU General Public Licence version 3
+# (GPL Version 3), copied verbatim in the file "COPYING" /copied verbatim below.
+#
+# In applying this licence, CERN does not waive the privileges and immunities granted to it
+# by virtue of its status as an Intergovernmental Organization or submit itself to any jurisdiction.
+#
+"""
+  Checking the sanity checks of the client on the parsed command lines, options given several
+  values included
+"""
+
+__author__ = 'Rodrigo Bermudez Schettino (CERN)'
+__credits__ = ['Rodrigo Bermudez Schettino (CERN)', 'Ulrich Schwickerath (CERN)']
+__maintainer__ = 'Rodrigo Bermudez Schettino (CERN)'
+__email__ = 'rodrigo.bermudez.schettino@cern.ch'
+__status__ = 'Development'
+
+import contextlib
+import io
+import sys
+from acron.client import build_parser, sanity_checks  # pylint: disable=import-error
+from acron.constants import ReturnCodes  # pylint: disable=import-error
+
+# Command line, and the exit code of the sanity checks and the value reported, None if they pass
+COMMAND_LINES = [
+    (['jobs', 'show', '-j', 'job000001'], None, None),
+    (['jobs', 'show', '-j', 'a', 'b'], None, None),
+    (['jobs', 'show', '-j', 'a', 'b_c'], ReturnCodes.BAD_ARGS, 'b_c'),
+    (['jobs', 'show', '-j', 'a;b'], ReturnCodes.BAD_ARGS, 'a;b'),
+    (['jobs', 'delete', '-j', 'job000001'], None, None),
+    (['jobs', 'create', '-s', '* * * * *', '-t', 'host', '-c', 'ls'], None, None),
+    (['jobs', 'create', '-s', '* * * *', '-t', 'host', '-c', 'ls'], ReturnCodes.BAD_ARGS,
+     '* * * *'),
+]
+
+
+def check_args():
+    """ Runs the sanity checks on several command lines """
+    failed = 0
+    for argv, expected, value in COMMAND_LINES:
+        print("Checking  acron %s" % ' '.join(argv))
+        stderr = io.StringIO()
+        try:
+            with contextlib.redirect_stderr(stderr):
+                sanity_checks(build_parser().parse_args(argv))
+            code = None
+        except SystemExit as error:
+            code = error.code
+        # pylint: disable=broad-except
+        except Exception as error:
+            code = repr(error)
+        if code != expected:
+            print("ERROR: got %s instead of %s %s" % (code, expected, stderr.getvalue()))
+            failed += 1
+        elif value is not None and value not in stderr.getvalue():
+            print("ERROR: the wrong value is not reported: %s" % stderr.getvalue())
+            failed += 1
+    return failed
+
+
+if __name__ == '__main__':
+    sys.exit(1 if check_args() else 0)
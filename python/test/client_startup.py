@@ -0,0 +1,77 @@
+# (C) Copyright 2022 CERN
+#
+# This software is distributed under the terms of the GNU General Public Licence version 3
+# (GPL Version 3), copied verbatim in the file "COPYING" /copied verbatim below.
+#
+# In applying this licence, CERN does not waive the privileges and immunities granted to it
+# by virtue of its status as an Intergovernmental Organization or submit itself to any jurisdiction.
+#
+"""
+  Checking the start-up of the client: parsing the command line must neither import the
+  subcommand modules nor the HTTP and Kerberos libraries, and must fit in the time budget
+"""
+
+__author__ = 'Rodrigo Bermudez Schettino (CERN)'
+__credits__ = ['Rodrigo Bermudez Schettino (CERN)', 'Ulrich Schwickerath (CERN)']
+__maintainer__ = 'Rodrigo Bermudez Schettino (CERN)'
+__email__ = 'rodrigo.bermudez.schettino@cern.ch'
+__status__ = 'Development'
+
+import json
+import os
+import subprocess
+import sys
+
+# Seconds allowed to import acron.client and parse a command line, interpreter start excluded
+BUDGET = float(os.environ.get('ACRON_STARTUP_BUDGET', '0.15'))
+
+# Modules only the subcommands need
+LAZY_MODULES = ['requests', 'requests_gssapi', 'gssapi', 'pkg_resources', 'yaml',
+                'acron.client.auth', 'acron.client.config', 'acron.client.creds',
+                'acron.client.jobs', 'acron.client.projects', 'acron.client.apply',
+                'acron.client.completion']
+
+PROBE = '''
+import json, sys, time
+start = time.perf_counter()
+import acron.client
+args = acron.client.build_parser().parse_args(sys.argv[1:])
+elapsed = time.perf_counter() - start
+print(json.dumps({'elapsed': elapsed, 'modules': sorted(sys.modules), 'func': args.func.__name__}))
+'''
+
+
+def probe(argv):
+    """ Parses a command line in a fresh interpreter, returns the time taken and the modules """
+    output = subprocess.run([sys.executable, '-c', PROBE] + argv, check=True,
+                            stdout=subprocess.PIPE, universal_newlines=True,
+                            env=dict(os.environ, PYTHONPATH=os.getcwd())).stdout
+    return json.loads(output)
+
+
+def check_startup():
+    """ Checks the imports and the time of several command lines """
+    failed = 0
+    for argv in [['jobs', 'show'], ['jobs', 'create', '-s', '* * * * *', '-t', 'host',
+                                    '-c', 'ls'], ['creds', 'status'], ['projects', 'show'],
+                 ['completion', 'refresh']]:
+        timings = []
+        for _ in range(5):
+            result = probe(argv)
+            timings.append(result['elapsed'])
+        timings.sort()
+        median = timings[len(timings) // 2]
+        loaded = [module for module in LAZY_MODULES if module in result['modules']]
+        print("Checking  acron %s: %.1f ms, runs %s" % (' '.join(argv), median * 1000,
+                                                       result['func']))
+        if loaded:
+            print("Imported too early: %s" % ', '.join(loaded))
+            failed += 1
+        if median > BUDGET:
+            print("Over the budget of %.1f ms" % (BUDGET * 1000))
+            failed += 1
+    return failed
+
+
+if __name__ == '__main__':
+    sys.exit(1 if check_startup() else 0)
@@ -0,0 +1,81 @@
+# (C) Copyright 2022 CERN
+#
+# This software is distributed under the terms of the GNU General Public Licence version 3
+# (GPL Version 3), copied verbatim in the file "COPYING" /copied verbatim below.
+#
+# In applying this licence, CERN does not waive the privileges and immunities granted to it
+# by virtue of its status as an Intergovernmental Organization or submit itself to any jurisdiction.
+#
+"""
+  Checking the next runs computed from the schedules, and their conversion for Quartz
+"""
+
+__author__ = 'Rodrigo Bermudez Schettino (CERN)'
+__credits__ = ['Rodrigo Bermudez Schettino (CERN)', 'Ulrich Schwickerath (CERN)']
+__maintainer__ = 'Rodrigo Bermudez Schettino (CERN)'
+__email__ = 'rodrigo.bermudez.schettino@cern.ch'
+__status__ = 'Development'
+
+import sys
+from datetime import datetime
+from acron.cron import parse_schedule  # pylint: disable=import-error
+
+# Thursday, 15th of September 2022, 10:30:20
+START = datetime(2022, 9, 15, 10, 30, 20)
+
+# Schedule, second of the minute and the expected next runs after START
+RUNS = [
+    ('* * * * *', 30, ['2022-09-15 10:30:30', '2022-09-15 10:31:30']),
+    ('* * * * *', 0, ['2022-09-15 10:31:00', '2022-09-15 10:32:00']),
+    ('*/20 9-11 * * *', 5, ['2022-09-15 10:40:05', '2022-09-15 11:00:05',
+                            '2022-09-15 11:20:05', '2022-09-15 11:40:05',
+                            '2022-09-16 09:00:05']),
+    ('0 22-2/2 * * ?', 0, ['2022-09-15 22:00:00', '2022-09-16 00:00:00',
+                           '2022-09-16 02:00:00']),
+    ('15 3 1,15 * *', 0, ['2022-10-01 03:15:00', '2022-10-15 03:15:00']),
+    ('0 0 ? * MON-WED', 0, ['2022-09-19 00:00:00', '2022-09-20 00:00:00',
+                            '2022-09-21 00:00:00', '2022-09-26 00:00:00']),
+    ('0 0 ? * 1', 0, ['2022-09-18 00:00:00', '2022-09-25 00:00:00']),
+    ('0 8 ? * 2#1', 0, ['2022-10-03 08:00:00', '2022-11-07 08:00:00']),
+    ('0 8 ? * 6L', 0, ['2022-09-30 08:00:00', '2022-10-28 08:00:00']),
+    ('0 0 L * ?', 0, ['2022-09-30 00:00:00', '2022-10-31 00:00:00',
+                      '2022-11-30 00:00:00']),
+    ('0 0 LW * ?', 0, ['2022-09-30 00:00:00', '2022-10-31 00:00:00',
+                       '2022-11-30 00:00:00', '2022-12-30 00:00:00']),
+    ('0 0 1W * ?', 0, ['2022-10-03 00:00:00', '2022-11-01 00:00:00']),
+    ('0 0 29 FEB ?', 0, ['2024-02-29 00:00:00', '2028-02-29 00:00:00']),
+    ('0 0 30 2 ?', 0, []),
+]
+
+# Schedule in crontab format, and converted for Quartz with the runs at second 7
+QUARTZ = [
+    ('* * * * *', '7 * * * * ? *'),
+    ('0 3 1 * *', '7 0 3 1 * ? *'),
+    ('0 3 * * MON', '7 0 3 ? * MON *'),
+    ('0 3 ? * 2#1', '7 0 3 ? * 2#1 *'),
+    ('0 3 ? * ?', '7 0 3 * * ? *'),
+    ('0 3 * MAI *', '7 0 3 * MAY ? *'),
+]
+
+
+def check_runs():
+    """ Compares the next runs of several schedules with the expected ones """
+    failed = 0
+    for schedule, seconds, expected in RUNS:
+        print("Checking  runs of %s" % schedule)
+        runs = [run.strftime('%Y-%m-%d %H:%M:%S') for run in
+                parse_schedule(schedule).next_runs(START, len(expected) or 1, seconds)]
+        if runs != expected:
+            print("ERROR: got %s" % ', '.join(runs))
+            failed += 1
+    for schedule, expected in QUARTZ:
+        print("Checking  conversion of %s" % schedule)
+        quartz = parse_schedule(schedule).to_quartz(7)
+        if quartz != expected:
+            print("ERROR: got %s" % quartz)
+            failed += 1
+    return failed
+
+
+if __name__ == '__main__':
+    sys.exit(1 if check_runs() else 0)
@@ -0,0 +1,137 @@
+# (C) Copyright 2022 CERN
+#
+# This software is distributed under the terms of the GNU General Public Licence version 3
+# (GPL Version 3), copied verbatim in the file "COPYING" /copied verbatim below.
+#
+# In applying this licence, CERN does not waive the privileges and immunities granted to it
+# by virtue of its status as an Intergovernmental Organization or submit itself to any jurisdiction.
+#
+"""
+  Checking the segments of the job journal, batches of changes crossing their size and
+  compactions included, and the changes read back from them
+"""
+
+__author__ = 'Rodrigo Bermudez Schettino (CERN)'
+__credits__ = ['Rodrigo Bermudez Schettino (CERN)', 'Ulrich Schwickerath (CERN)']
+__maintainer__ = 'Rodrigo Bermudez Schettino (CERN)'
+__email__ = 'rodrigo.bermudez.schettino@cern.ch'
+__status__ = 'Development'
+
+import json
+import os
+import sys
+from tempfile import TemporaryDirectory
+# pylint: disable=import-error
+from acron.server.journal import (ACTION_CREATE, ACTION_DELETE, ACTION_UPDATE, BASE_FILE,
+                                  SEGMENT_PREFIX, JobJournal)
+
+PROJECT = 'project'
+SEGMENT_SIZE = 3
+MAX_SEGMENTS = 4
+
+# Batches of changes recorded, of (action, job number)
+BATCHES = [
+    [(ACTION_CREATE, 1), (ACTION_CREATE, 2)],
+    [(ACTION_CREATE, 3), (ACTION_UPDATE, 1), (ACTION_CREATE, 4), (ACTION_CREATE, 5)],
+    [(ACTION_DELETE, 2)],
+    [(ACTION_UPDATE, 3), (ACTION_UPDATE, 4), (ACTION_UPDATE, 5), (ACTION_CREATE, 6),
+     (ACTION_CREATE, 7), (ACTION_UPDATE, 6), (ACTION_CREATE, 8)],
+    [(ACTION_DELETE, 1), (ACTION_UPDATE, 8), (ACTION_CREATE, 9), (ACTION_CREATE, 10),
+     (ACTION_UPDATE, 9), (ACTION_CREATE, 11), (ACTION_UPDATE, 11)],
+]
+
+
+def job(number, version):
+    """ Summary of a job """
+    return {'name': 'job%d' % number, 'schedule': '* * * * *', 'version': version}
+
+
+def read_journal(home):
+    """ Reads the snapshot and the segments of the journal """
+    directory = os.path.join(home, PROJECT)
+    with open(os.path.join(directory, BASE_FILE)) as base_file:
+        base = json.load(base_file)
+    segments = []
+    for filename in sorted(os.listdir(directory)):
+        if filename.startswith(SEGMENT_PREFIX):
+            with open(os.path.join(directory, filename)) as segment:
+                segments.append((int(filename[len(SEGMENT_PREFIX):-len('.jsonl')]),
+                                 [json.loads(line) for line in segment]))
+    return base, segments
+
+
+def check_files(base, segments, last_revision):
+    """ Checks each segment holds the entries following the previous one, from its name """
+    failed = 0
+    expected = base['revision'] + 1
+    for first_revision, entries in segments:
+        revisions = [entry['revision'] for entry in entries]
+        if first_revision != expected or revisions != list(range(expected,
+                                                                 expected + len(entries))):
+            print("ERROR: segment %d holds revisions %s, %d expected first" %
+                  (first_revision, revisions, expected))
+            failed += 1
+        if not 0 < len(entries) <= SEGMENT_SIZE:
+            print("ERROR: segment %d holds %d entries" % (first_revision, len(entries)))
+            failed += 1
+        expected += len(entries)
+    if expected - 1 != last_revision:
+        print("ERROR: last revision %d, %d expected" % (expected - 1, last_revision))
+        failed += 1
+    if len(segments) > MAX_SEGMENTS:
+        print("ERROR: %d segments kept" % len(segments))
+        failed += 1
+    return failed
+
+
+def check_journal():
+    """ Records the batches and checks the files and the changes after each of them """
+    failed = 0
+    with TemporaryDirectory() as home:
+        journal = JobJournal(home, SEGMENT_SIZE, MAX_SEGMENTS)
+        jobs, revisions, compacted = {}, [], False
+        if journal.revision(PROJECT) is not None:
+            print("ERROR: revision of a journal not started yet")
+            failed += 1
+        for batch in BATCHES:
+            changes = []
+            for action, number in batch:
+                if action == ACTION_DELETE:
+                    jobs.pop(number)
+                    changes.append((action, 'job%d' % number, None))
+                else:
+                    jobs[number] = job(number, len(revisions))
+                    changes.append((action, 'job%d' % number, jobs[number]))
+            journal.record(PROJECT, changes, list)
+            base, segments = read_journal(home)
+            print("Checking  %d segment(s) after %d change(s)" % (len(segments), len(changes)))
+            if not revisions:
+                revisions.append(base['revision'])
+            revisions.extend(range(revisions[-1] + 1, revisions[-1] + len(changes) + 1))
+            compacted = compacted or bool(base['jobs'])
+            failed += check_files(base, segments, revisions[-1])
+            if journal.revision(PROJECT) != revisions[-1]:
+                print("ERROR: revision %s, %d expected" % (journal.revision(PROJECT),
+                                                           revisions[-1]))
+                failed += 1
+
+            current = journal.changes(PROJECT, 0, list)
+            names = {entry['job_id']: entry['job'] for entry in current['changes']
+                     if entry['action'] != ACTION_DELETE}
+            if current['revision'] != revisions[-1] or names != {
+                    'job%d' % number: summary for number, summary in jobs.items()}:
+                print("ERROR: all the jobs differ at revision %d" % current['revision'])
+                failed += 1
+            latest = journal.changes(PROJECT, revisions[-2], list)
+            if [entry['job_id'] for entry in latest['changes']] != [
+                    changes[-1][1]]:
+                print("ERROR: last change %s" % latest['changes'])
+                failed += 1
+        if not compacted:
+            print("ERROR: the journal was never compacted")
+            failed += 1
+    return failed
+
+
+if __name__ == '__main__':
+    sys.exit(1 if check_journal() else 0)
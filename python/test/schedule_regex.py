@@ -32,8 +32,9 @@ def check_expressions():
         '*/10 * * * *',
         '2-8,*/10 * * * *',
         '0 0 * * FRI',
-        '* * * 0 *',
+        '* * * 12 *',
         '* * * DEC *',
+        '0 22-2 L * ?',
         '* * * * ?',
         '2 7 ? * 2#1',
         '*/50 * * OCT Mon']
@@ -53,6 +54,8 @@ def check_expressions():
                          '* * * 13 *',
                          '*/0 * * * *',
                          '* * 0 * *',
+                         '* * * 0 *',
+                         '0 0 1 * MON',
                          '* * * Okt Mon']
     for my_expr in wrong_expressions:
         print("Checking  %s" % my_expr)
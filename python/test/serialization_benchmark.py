@@ -0,0 +1,90 @@
+# (C) Copyright 2022 CERN
+#
+# This software is distributed under the terms of the GNU General Public Licence version 3
+# (GPL Version 3), copied verbatim in the file "COPYING" /copied verbatim below.
+#
+# In applying this licence, CERN does not waive the privileges and immunities granted to it
+# by virtue of its status as an Intergovernmental Organization or submit itself to any jurisdiction.
+#
+"""
+  Benchmark of acron.serialization against the pure Python yaml and json modules,
+  on a job listing as written by rd jobs list
+"""
+
+__author__ = 'Rodrigo Bermudez Schettino (CERN)'
+__credits__ = ['Rodrigo Bermudez Schettino (CERN)', 'Ulrich Schwickerath (CERN)']
+__maintainer__ = 'Rodrigo Bermudez Schettino (CERN)'
+__email__ = 'rodrigo.bermudez.schettino@cern.ch'
+__status__ = 'Development'
+
+import json
+import sys
+import timeit
+import yaml
+# pylint: disable=import-error
+from acron.serialization import LIBYAML, json_dumps, orjson, yaml_dump, yaml_load
+
+
+def job(project, index):
+    """ A job definition, as stored by the Rundeck backend """
+    name = 'job{:06d}'.format(index)
+    return {
+        'defaultTab': 'output',
+        'description': '{} * * * * Nightly cleanup of the scratch area number {}'.format(
+            index % 60, index),
+        'executionEnabled': True,
+        'id': project + '-' + name,
+        'uuid': project + '-' + name,
+        'loglevel': 'INFO',
+        'loglimit': '1MB',
+        'loglimitAction': 'halt',
+        'loglimitStatus': 'failed',
+        'multipleExecutions': True,
+        'name': name,
+        'nodeFilterEditable': False,
+        'nodefilters': {
+            'dispatch': {'excludePrecedence': True, 'keepgoing': False,
+                         'rankOrder': 'ascending', 'successOnEmptyNodeFilter': False,
+                         'threadcount': '1'},
+            'filter': 'name: lxplus{:03d}.example.com'.format(index % 1000)},
+        'nodesSelectedByDefault': True,
+        'schedule': {'crontab': '0 {} * ? * * *'.format(index % 60)},
+        'scheduleEnabled': index % 7 != 0,
+        'sequence': {'commands': [{'exec': '/usr/bin/find /tmp/scratch{} -mtime +7 -delete'
+                                           .format(index)}],
+                     'keepgoing': False, 'strategy': 'node-first'},
+        'timeout': '1h',
+    }
+
+
+def measure(label, baseline, optimized, number):
+    """ Prints the best time of both implementations and the speedup """
+    base = min(timeit.repeat(baseline, number=number, repeat=3)) / number
+    fast = min(timeit.repeat(optimized, number=number, repeat=3)) / number
+    print('{:<12} {:>10.1f} ms {:>10.1f} ms {:>8.1f}x'.format(
+        label, base * 1000, fast * 1000, base / fast))
+    return base / fast
+
+
+def main(jobs_count=2000):
+    """ Runs the benchmark """
+    jobs = [job('acronuser', index) for index in range(jobs_count)]
+    listing = yaml.safe_dump(jobs, default_flow_style=False)
+    print('{} jobs, {:.1f} MB of YAML, libyaml: {}, orjson: {}'.format(
+        jobs_count, len(listing) / 1e6, LIBYAML, orjson is not None))
+    print('{:<12} {:>13} {:>13} {:>9}'.format('', 'pure Python', 'acron', 'speedup'))
+
+    speedups = [
+        measure('YAML load', lambda: yaml.safe_load(listing), lambda: yaml_load(listing), 1),
+        measure('YAML dump', lambda: yaml.safe_dump(jobs), lambda: yaml_dump(jobs), 1),
+        measure('JSON dump',
+                lambda: json.dumps(jobs, sort_keys=True, separators=(',', ':')).encode('utf-8'),
+                lambda: json_dumps(jobs, sort_keys=True), 5),
+    ]
+    assert yaml_load(listing) == jobs
+    assert json.loads(json_dumps(jobs, sort_keys=True)) == jobs
+    return 0 if min(speedups) >= 1 or not (LIBYAML and orjson) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000))
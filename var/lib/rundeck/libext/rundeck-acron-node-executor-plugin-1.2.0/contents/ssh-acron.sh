@@ -34,7 +34,4 @@ HOST=$1
 shift
 CMD=$*
 
-# random delay (0..1s) to make it work with parallel exec
-sleep "$(bc <<<"scale=2; $(printf '0.%02d' $((RANDOM % 100)))")"
-
 sudo -u acron /usr/libexec/acron/ssh_run "$JOB_ID" "$USER" "$HOST" "$CMD"